@@ -7,7 +7,7 @@ Just copy this single file and start using AI in your code.
 Configuration:
 - Edit OLLAMA_URL if your Ollama server is on a different machine
 - Edit DEFAULT_MODEL to your preferred model
-- Edit the system prompts in the helper functions as needed
+- Edit the system prompts (the _*_SYSTEM constants) as needed
 
 Usage in your project:
     from ai_helper import ask, code, analyze, summarize
@@ -23,11 +23,38 @@ Usage in your project:
     
     # Summarize text
     summary = summarize(long_text)
+    
+    # Async (needs httpx) - every helper has an *_async twin
+    answer = await ask_async("What is the capital of France?")
 """
 
 import requests
 import json
-from typing import Optional, Generator
+import time
+import asyncio
+import hashlib
+import functools
+from collections import OrderedDict
+from typing import Optional, Generator, AsyncGenerator
+from requests.adapters import HTTPAdapter
+
+try:
+    import httpx  # Optional: only needed for the *_async helpers
+except ImportError:
+    httpx = None
+
+# Caught as a tuple so the except clause still evaluates when httpx is missing
+_ASYNC_CONNECT_ERRORS = (httpx.ConnectError,) if httpx else ()
+
+try:
+    import orjson  # Optional: faster encoding/parsing of request and response bodies
+    _json_loads = orjson.loads
+    _json_dumps = orjson.dumps
+except ImportError:
+    _json_loads = json.loads
+    
+    def _json_dumps(obj) -> bytes:
+        return json.dumps(obj).encode("utf-8")
 
 # ============================================================================
 # CONFIGURATION - EDIT THESE FOR YOUR SETUP
@@ -36,31 +63,84 @@ from typing import Optional, Generator
 OLLAMA_URL = "http://localhost:11434"  # Change if Ollama is on another machine
 DEFAULT_MODEL = "qwen2.5-coder:14b"    # Change to your preferred model
 DEFAULT_TIMEOUT = 120                   # Seconds
+CACHE_MAX_SIZE = 1024                   # Cached responses kept in memory
+PROBE_CACHE_TTL = 10                    # Seconds to reuse is_available/list_models (async) results
+
+
+# ============================================================================
+# HTTP SESSION - Shared connection pool (keep-alive between calls)
+# ============================================================================
+
+_SESSION = requests.Session()
+_ADAPTER = HTTPAdapter(pool_connections=10, pool_maxsize=20, max_retries=0)
+_SESSION.mount("http://", _ADAPTER)
+_SESSION.mount("https://", _ADAPTER)
+_SESSION.headers.update({"Connection": "keep-alive", "Accept-Encoding": "gzip, deflate", "Content-Type": "application/json"})
+
+
+# ============================================================================
+# RESPONSE CACHE - Exact-match LRU for deterministic calls
+# ============================================================================
+#
+# By default only temperature=0 calls are cached (their output is
+# deterministic). Pass cache=True to any helper to cache regardless of
+# temperature, or cache=False to always hit the model.
+
+_CACHE: "OrderedDict[str, str]" = OrderedDict()
+
+
+def _cache_key(prompt: str, system: Optional[str], model: str, temperature: float, max_tokens: int) -> str:
+    raw = json.dumps(
+        {"m": model, "s": system, "p": prompt, "t": temperature, "n": max_tokens},
+        sort_keys=True,
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _use_cache(cache: Optional[bool], temperature: float) -> bool:
+    return temperature == 0.0 if cache is None else cache
+
+
+def _cache_get(key: str) -> Optional[str]:
+    value = _CACHE.get(key)
+    if value is not None:
+        _CACHE.move_to_end(key)
+    return value
+
+
+def _cache_put(key: str, value: str):
+    _CACHE[key] = value
+    _CACHE.move_to_end(key)
+    if len(_CACHE) > CACHE_MAX_SIZE:
+        _CACHE.popitem(last=False)
+
+
+def clear_cache():
+    """Drop all cached responses."""
+    _CACHE.clear()
 
 
 # ============================================================================
 # CORE FUNCTION - Everything else uses this
 # ============================================================================
 
-def _call_llm(
+def _build_payload(
     prompt: str,
-    system: Optional[str] = None,
-    model: str = DEFAULT_MODEL,
-    temperature: float = 0.7,
-    max_tokens: int = 2048,
-    stream: bool = False,
-) -> str | Generator[str, None, None]:
+    system: Optional[str],
+    model: str,
+    temperature: float,
+    max_tokens: int,
+    stream: bool,
+) -> dict:
     """
-    Internal function to call Ollama API.
+    Build the Ollama /api/chat request body.
     """
-    url = f"{OLLAMA_URL}/api/chat"
-    
     messages = []
     if system:
         messages.append({"role": "system", "content": system})
     messages.append({"role": "user", "content": prompt})
     
-    payload = {
+    return {
         "model": model,
         "messages": messages,
         "stream": stream,
@@ -69,52 +149,162 @@ def _call_llm(
             "temperature": temperature,
         }
     }
+
+
+def _call_llm(
+    prompt: str,
+    system: Optional[str] = None,
+    model: str = DEFAULT_MODEL,
+    temperature: float = 0.7,
+    max_tokens: int = 2048,
+    cache: Optional[bool] = None,
+) -> str:
+    """
+    Internal function to call Ollama API.
+    """
+    key = None
+    if _use_cache(cache, temperature):
+        key = _cache_key(prompt, system, model, temperature, max_tokens)
+        cached = _cache_get(key)
+        if cached is not None:
+            return cached
+    
+    url = f"{OLLAMA_URL}/api/chat"
+    payload = _build_payload(prompt, system, model, temperature, max_tokens, False)
     
     try:
-        if stream:
-            def generate():
-                with requests.post(url, json=payload, stream=True, timeout=DEFAULT_TIMEOUT) as resp:
-                    resp.raise_for_status()
-                    for line in resp.iter_lines():
-                        if line:
-                            data = json.loads(line)
-                            if "message" in data and "content" in data["message"]:
-                                yield data["message"]["content"]
-            return generate()
-        else:
-            response = requests.post(url, json=payload, timeout=DEFAULT_TIMEOUT)
-            response.raise_for_status()
-            return response.json().get("message", {}).get("content", "")
+        response = _SESSION.post(url, data=_json_dumps(payload), timeout=DEFAULT_TIMEOUT)
+        response.raise_for_status()
+        content = _json_loads(response.content).get("message", {}).get("content", "")
+        if key is not None:
+            _cache_put(key, content)
+        return content
     except requests.exceptions.ConnectionError:
         return f"Error: Cannot connect to Ollama at {OLLAMA_URL}. Is it running?"
     except Exception as e:
         return f"Error: {str(e)}"
 
 
+def _stream_llm(
+    prompt: str,
+    system: Optional[str] = None,
+    model: str = DEFAULT_MODEL,
+    temperature: float = 0.7,
+    max_tokens: int = 2048,
+) -> Generator[str, None, None]:
+    """
+    Internal generator streaming Ollama chat chunks.
+    """
+    url = f"{OLLAMA_URL}/api/chat"
+    payload = _build_payload(prompt, system, model, temperature, max_tokens, True)
+    
+    with _SESSION.post(url, data=_json_dumps(payload), stream=True, timeout=DEFAULT_TIMEOUT) as resp:
+        resp.raise_for_status()
+        for line in resp.iter_lines(chunk_size=65536, decode_unicode=False):
+            if line:
+                msg = _json_loads(line).get("message")
+                if msg:
+                    content = msg.get("content")
+                    if content:
+                        yield content
+
+
 # ============================================================================
 # HELPER FUNCTIONS - Use these in your code
 # ============================================================================
 
-def ask(question: str, context: str = "") -> str:
-    """
-    Ask a general question.
-    
-    Example:
-        answer = ask("What is recursion?")
-        answer = ask("Explain this error", context=error_message)
-    """
+# System prompts are built once at import; edit them here
+_ASK_SYSTEM = "You are a helpful assistant. Be concise and accurate."
+_CODE_SYSTEM = (
+    "You are an expert {language} programmer. Write clean, efficient, well-documented code. "
+    "Only output code unless explanation is specifically requested."
+)
+_CODE_SYSTEMS = {
+    language: _CODE_SYSTEM.format(language=language)
+    for language in ("python", "javascript", "typescript", "java", "go", "rust", "c++", "sql", "bash")
+}
+_ANALYZE_SYSTEM = "You are a data analyst. Provide clear, actionable insights."
+_SUMMARIZE_SYSTEM = "You are a summarization expert. Be concise and capture key points."
+_SUMMARY_LENGTHS = {
+    "short": "1-2 sentences",
+    "medium": "1 paragraph",
+    "long": "2-3 paragraphs",
+}
+_REVIEW_SYSTEM = "You are a senior code reviewer. Be specific and constructive."
+_TRANSLATE_SYSTEM = "You are a professional translator. Provide accurate, natural translations."
+
+
+def _ask_args(question: str, context: str = "") -> dict:
     prompt = question
     if context:
         prompt = f"Context:\n{context}\n\nQuestion: {question}"
     
-    return _call_llm(
+    return dict(
         prompt=prompt,
-        system="You are a helpful assistant. Be concise and accurate.",
+        system=_ASK_SYSTEM,
         temperature=0.7,
     )
 
 
-def code(request: str, language: str = "python") -> str:
+def _code_args(request: str, language: str = "python") -> dict:
+    return dict(
+        prompt=request,
+        system=_CODE_SYSTEMS.get(language) or _CODE_SYSTEM.format(language=language),
+        temperature=0.3,
+        max_tokens=4096,
+    )
+
+
+def _analyze_args(data: str, focus: str = "") -> dict:
+    prompt = f"Analyze this:\n{data}"
+    if focus:
+        prompt += f"\n\nFocus on: {focus}"
+    
+    return dict(
+        prompt=prompt,
+        system=_ANALYZE_SYSTEM,
+        temperature=0.4,
+    )
+
+
+def _summarize_args(text: str, max_length: str = "medium") -> dict:
+    length = _SUMMARY_LENGTHS.get(max_length, _SUMMARY_LENGTHS["medium"])
+    return dict(
+        prompt=f"Summarize this in {length}:\n\n{text}",
+        system=_SUMMARIZE_SYSTEM,
+        temperature=0.3,
+    )
+
+
+def _review_code_args(code_snippet: str) -> dict:
+    return dict(
+        prompt=f"Review this code for bugs, security issues, and improvements:\n\n```\n{code_snippet}\n```",
+        system=_REVIEW_SYSTEM,
+        temperature=0.3,
+    )
+
+
+def _translate_args(text: str, target_language: str) -> dict:
+    return dict(
+        prompt=f"Translate to {target_language}:\n\n{text}",
+        system=_TRANSLATE_SYSTEM,
+        temperature=0.3,
+    )
+
+
+def ask(question: str, context: str = "", cache: Optional[bool] = None) -> str:
+    """
+    Ask a general question.
+    
+    Example:
+        answer = ask("What is recursion?")
+        answer = ask("Explain this error", context=error_message)
+        answer = ask("What is recursion?", cache=True)  # reuse identical answers
+    """
+    return _call_llm(**_ask_args(question, context), cache=cache)
+
+
+def code(request: str, language: str = "python", cache: Optional[bool] = None) -> str:
     """
     Generate or explain code.
     
@@ -122,15 +312,10 @@ def code(request: str, language: str = "python") -> str:
         snippet = code("Write a function to validate emails")
         explanation = code("Explain what this does: def foo(): pass")
     """
-    return _call_llm(
-        prompt=request,
-        system=f"You are an expert {language} programmer. Write clean, efficient, well-documented code. Only output code unless explanation is specifically requested.",
-        temperature=0.3,
-        max_tokens=4096,
-    )
+    return _call_llm(**_code_args(request, language), cache=cache)
 
 
-def analyze(data: str, focus: str = "") -> str:
+def analyze(data: str, focus: str = "", cache: Optional[bool] = None) -> str:
     """
     Analyze data, logs, or text.
     
@@ -138,18 +323,10 @@ def analyze(data: str, focus: str = "") -> str:
         result = analyze(error_log)
         result = analyze(sales_data, focus="trends")
     """
-    prompt = f"Analyze this:\n{data}"
-    if focus:
-        prompt += f"\n\nFocus on: {focus}"
-    
-    return _call_llm(
-        prompt=prompt,
-        system="You are a data analyst. Provide clear, actionable insights.",
-        temperature=0.4,
-    )
+    return _call_llm(**_analyze_args(data, focus), cache=cache)
 
 
-def summarize(text: str, max_length: str = "medium") -> str:
+def summarize(text: str, max_length: str = "medium", cache: Optional[bool] = None) -> str:
     """
     Summarize text.
     
@@ -157,45 +334,27 @@ def summarize(text: str, max_length: str = "medium") -> str:
         summary = summarize(long_article)
         summary = summarize(document, max_length="short")
     """
-    length_guide = {
-        "short": "1-2 sentences",
-        "medium": "1 paragraph",
-        "long": "2-3 paragraphs",
-    }
-    
-    return _call_llm(
-        prompt=f"Summarize this in {length_guide.get(max_length, 'medium')}:\n\n{text}",
-        system="You are a summarization expert. Be concise and capture key points.",
-        temperature=0.3,
-    )
+    return _call_llm(**_summarize_args(text, max_length), cache=cache)
 
 
-def review_code(code_snippet: str) -> str:
+def review_code(code_snippet: str, cache: Optional[bool] = None) -> str:
     """
     Review code for issues.
     
     Example:
         feedback = review_code(my_function_code)
     """
-    return _call_llm(
-        prompt=f"Review this code for bugs, security issues, and improvements:\n\n```\n{code_snippet}\n```",
-        system="You are a senior code reviewer. Be specific and constructive.",
-        temperature=0.3,
-    )
+    return _call_llm(**_review_code_args(code_snippet), cache=cache)
 
 
-def translate(text: str, target_language: str) -> str:
+def translate(text: str, target_language: str, cache: Optional[bool] = None) -> str:
     """
     Translate text to another language.
     
     Example:
         spanish = translate("Hello world", "Spanish")
     """
-    return _call_llm(
-        prompt=f"Translate to {target_language}:\n\n{text}",
-        system="You are a professional translator. Provide accurate, natural translations.",
-        temperature=0.3,
-    )
+    return _call_llm(**_translate_args(text, target_language), cache=cache)
 
 
 def chat_stream(message: str, system: str = "You are a helpful assistant.") -> Generator[str, None, None]:
@@ -206,17 +365,13 @@ def chat_stream(message: str, system: str = "You are a helpful assistant.") -> G
         for chunk in chat_stream("Tell me a story"):
             print(chunk, end="", flush=True)
     """
-    return _call_llm(
-        prompt=message,
-        system=system,
-        stream=True,
-    )
+    return _stream_llm(prompt=message, system=system)
 
 
 def is_available() -> bool:
     """Check if Ollama is running."""
     try:
-        response = requests.get(f"{OLLAMA_URL}/api/tags", timeout=5)
+        response = _SESSION.get(f"{OLLAMA_URL}/api/tags", timeout=5)
         return response.status_code == 200
     except:
         return False
@@ -225,13 +380,198 @@ def is_available() -> bool:
 def list_models() -> list:
     """List available models."""
     try:
-        response = requests.get(f"{OLLAMA_URL}/api/tags", timeout=5)
+        response = _SESSION.get(f"{OLLAMA_URL}/api/tags", timeout=5)
         response.raise_for_status()
-        return [m.get("name") for m in response.json().get("models", [])]
+        return [m.get("name") for m in _json_loads(response.content).get("models", [])]
     except:
         return []
 
 
+# ============================================================================
+# ASYNC API - Non-blocking variants for asyncio apps (requires httpx)
+# ============================================================================
+#
+#   answers = await asyncio.gather(ask_async("Q1"), ask_async("Q2"))
+#
+# All async calls on one event loop share one httpx.AsyncClient (HTTP/2 when
+# `h2` is installed), so concurrent requests are multiplexed over kept-alive
+# connections. Its pool is bound to that loop, so a new loop (e.g. a second
+# asyncio.run()) gets a new client.
+
+_ASYNC_CLIENT = None
+_ASYNC_CLIENT_LOOP = None
+
+
+def _get_async_client():
+    """Create the shared AsyncClient on first use in the running event loop."""
+    global _ASYNC_CLIENT, _ASYNC_CLIENT_LOOP
+    if httpx is None:
+        raise ImportError("Async helpers require httpx: pip install 'httpx[http2]'")
+    loop = asyncio.get_running_loop()
+    if _ASYNC_CLIENT is None or _ASYNC_CLIENT.is_closed or _ASYNC_CLIENT_LOOP is not loop:
+        # A client left over from a finished loop cannot be closed from this
+        # one; dropping it lets its connections be garbage collected
+        try:
+            import h2  # noqa: F401
+            http2 = True
+        except ImportError:
+            http2 = False
+        _ASYNC_CLIENT = httpx.AsyncClient(
+            http2=http2,
+            headers={"Accept-Encoding": "gzip, deflate", "Content-Type": "application/json"},
+            timeout=httpx.Timeout(DEFAULT_TIMEOUT, connect=10.0),
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=40, keepalive_expiry=30),
+        )
+        _ASYNC_CLIENT_LOOP = loop
+    return _ASYNC_CLIENT
+
+
+async def aclose():
+    """Close the shared AsyncClient (call on app shutdown)."""
+    global _ASYNC_CLIENT, _ASYNC_CLIENT_LOOP
+    if _ASYNC_CLIENT is not None:
+        await _ASYNC_CLIENT.aclose()
+        _ASYNC_CLIENT = None
+        _ASYNC_CLIENT_LOOP = None
+
+
+async def _call_llm_async(
+    prompt: str,
+    system: Optional[str] = None,
+    model: str = DEFAULT_MODEL,
+    temperature: float = 0.7,
+    max_tokens: int = 2048,
+    cache: Optional[bool] = None,
+) -> str:
+    """
+    Internal async function to call Ollama API.
+    """
+    key = None
+    if _use_cache(cache, temperature):
+        key = _cache_key(prompt, system, model, temperature, max_tokens)
+        cached = _cache_get(key)
+        if cached is not None:
+            return cached
+    
+    url = f"{OLLAMA_URL}/api/chat"
+    payload = _build_payload(prompt, system, model, temperature, max_tokens, False)
+    
+    try:
+        response = await _get_async_client().post(url, content=_json_dumps(payload))
+        response.raise_for_status()
+        content = _json_loads(response.content).get("message", {}).get("content", "")
+        if key is not None:
+            _cache_put(key, content)
+        return content
+    except _ASYNC_CONNECT_ERRORS:
+        return f"Error: Cannot connect to Ollama at {OLLAMA_URL}. Is it running?"
+    except Exception as e:
+        return f"Error: {str(e)}"
+
+
+async def _stream_llm_async(
+    prompt: str,
+    system: Optional[str] = None,
+    model: str = DEFAULT_MODEL,
+    temperature: float = 0.7,
+    max_tokens: int = 2048,
+) -> AsyncGenerator[str, None]:
+    """
+    Internal async generator streaming Ollama chat chunks.
+    """
+    url = f"{OLLAMA_URL}/api/chat"
+    payload = _build_payload(prompt, system, model, temperature, max_tokens, True)
+    
+    async with _get_async_client().stream("POST", url, content=_json_dumps(payload)) as resp:
+        resp.raise_for_status()
+        async for line in resp.aiter_lines():
+            if line:
+                msg = _json_loads(line).get("message")
+                if msg:
+                    content = msg.get("content")
+                    if content:
+                        yield content
+
+
+async def ask_async(question: str, context: str = "", cache: Optional[bool] = None) -> str:
+    """Async version of ask()."""
+    return await _call_llm_async(**_ask_args(question, context), cache=cache)
+
+
+async def code_async(request: str, language: str = "python", cache: Optional[bool] = None) -> str:
+    """Async version of code()."""
+    return await _call_llm_async(**_code_args(request, language), cache=cache)
+
+
+async def analyze_async(data: str, focus: str = "", cache: Optional[bool] = None) -> str:
+    """Async version of analyze()."""
+    return await _call_llm_async(**_analyze_args(data, focus), cache=cache)
+
+
+async def summarize_async(text: str, max_length: str = "medium", cache: Optional[bool] = None) -> str:
+    """Async version of summarize()."""
+    return await _call_llm_async(**_summarize_args(text, max_length), cache=cache)
+
+
+async def review_code_async(code_snippet: str, cache: Optional[bool] = None) -> str:
+    """Async version of review_code()."""
+    return await _call_llm_async(**_review_code_args(code_snippet), cache=cache)
+
+
+async def translate_async(text: str, target_language: str, cache: Optional[bool] = None) -> str:
+    """Async version of translate()."""
+    return await _call_llm_async(**_translate_args(text, target_language), cache=cache)
+
+
+def chat_stream_async(message: str, system: str = "You are a helpful assistant.") -> AsyncGenerator[str, None]:
+    """
+    Async version of chat_stream().
+    
+    Example:
+        async for chunk in chat_stream_async("Tell me a story"):
+            print(chunk, end="", flush=True)
+    """
+    return _stream_llm_async(prompt=message, system=system)
+
+
+def _async_ttl_cache(ttl: float):
+    """Cache the result of a no-argument coroutine for `ttl` seconds."""
+    def decorator(func):
+        state = {"value": None, "expires": 0.0}
+        
+        @functools.wraps(func)
+        async def wrapper():
+            now = time.monotonic()
+            if now >= state["expires"]:
+                state["value"] = await func()
+                state["expires"] = now + ttl
+            return state["value"]
+        
+        return wrapper
+    return decorator
+
+
+@_async_ttl_cache(PROBE_CACHE_TTL)
+async def is_available_async() -> bool:
+    """Async version of is_available() (result cached for PROBE_CACHE_TTL s)."""
+    try:
+        response = await _get_async_client().get(f"{OLLAMA_URL}/api/tags", timeout=5)
+        return response.status_code == 200
+    except Exception:
+        return False
+
+
+@_async_ttl_cache(PROBE_CACHE_TTL)
+async def list_models_async() -> list:
+    """Async version of list_models() (result cached for PROBE_CACHE_TTL s)."""
+    try:
+        response = await _get_async_client().get(f"{OLLAMA_URL}/api/tags", timeout=5)
+        response.raise_for_status()
+        return [m.get("name") for m in _json_loads(response.content).get("models", [])]
+    except Exception:
+        return []
+
+
 # ============================================================================
 # TEST
 # ============================================================================
@@ -1,35 +1,96 @@
 """
 API Key authentication middleware for FastAPI.
 """
-from typing import List
-from fastapi import HTTPException, Security, status
-from fastapi.security import APIKeyHeader
+from fastapi import FastAPI, status
 from app.config import settings
+from app.responses import ORJSONResponse
 
-# API Key header scheme
-api_key_header = APIKeyHeader(name="X-API-Key", auto_error=True)
+# Endpoints reachable without an API key
+PUBLIC_PATHS = frozenset({"/", "/health", "/docs", "/docs/oauth2-redirect", "/redoc", "/openapi.json", "/metrics"})
 
+# OpenAPI security scheme for the X-API-Key header
+API_KEY_SCHEME = {"type": "apiKey", "in": "header", "name": "X-API-Key"}
 
-async def verify_api_key(api_key: str = Security(api_key_header)) -> str:
+
+def document_api_key(app: FastAPI):
     """
-    Verify API key from request header.
+    Mark every non-public route as requiring X-API-Key in the OpenAPI schema.
+    
+    APIKeyMiddleware checks keys before routing, so routes carry no auth
+    dependency for FastAPI to resolve per request; this keeps /docs
+    showing which endpoints need a key (and its Authorize button) anyway.
     
     Args:
-        api_key: API key from X-API-Key header
-        
-    Returns:
-        The validated API key
-        
-    Raises:
-        HTTPException: If API key is invalid
+        app: FastAPI application using APIKeyMiddleware
+    """
+    build_openapi = app.openapi
+    
+    def openapi():
+        if app.openapi_schema is None:
+            schema = build_openapi()
+            schema.setdefault("components", {}).setdefault("securitySchemes", {})["APIKeyHeader"] = API_KEY_SCHEME
+            for path, operations in schema.get("paths", {}).items():
+                if path not in PUBLIC_PATHS:
+                    for operation in operations.values():
+                        operation["security"] = [{"APIKeyHeader": []}]
+        return app.openapi_schema
+    
+    app.openapi = openapi
+
+
+class APIKeyMiddleware:
+    """
+    ASGI middleware that rejects unauthenticated requests up front.
+    
+    Added inside CORS but outside rate limiting and metrics, so requests
+    without a valid key are turned away before they touch limiter state or
+    allocate Prometheus labels.
     """
-    valid_keys = settings.api_keys_list
     
-    if api_key not in valid_keys:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid API key",
-            headers={"WWW-Authenticate": "ApiKey"},
-        )
+    def __init__(self, app):
+        """
+        Initialize middleware.
+        
+        Args:
+            app: ASGI application
+        """
+        self.app = app
     
-    return api_key
+    async def __call__(self, scope, receive, send):
+        """
+        Check the X-API-Key header and pass valid requests through.
+        
+        Args:
+            scope: ASGI connection scope
+            receive: ASGI receive callable
+            send: ASGI send callable
+        """
+        if scope["type"] != "http" or scope["method"] == "OPTIONS" or scope["path"] in PUBLIC_PATHS:
+            await self.app(scope, receive, send)
+            return
+        
+        # ASGI header names arrive lower-cased; compare the raw value bytes
+        # with the pre-encoded keys instead of decoding every header
+        api_key = None
+        for name, value in scope["headers"]:
+            if name == b"x-api-key":
+                api_key = value
+                break
+        
+        if api_key is None:
+            # Same status and message as FastAPI's APIKeyHeader(auto_error=True)
+            response = ORJSONResponse(
+                status_code=status.HTTP_403_FORBIDDEN,
+                content={"error": "Not authenticated", "status_code": status.HTTP_403_FORBIDDEN}
+            )
+        elif api_key not in settings.api_keys_bytes:
+            response = ORJSONResponse(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                content={"error": "Invalid API key", "status_code": status.HTTP_401_UNAUTHORIZED},
+                headers={"WWW-Authenticate": "ApiKey"}
+            )
+        else:
+            await self.app(scope, receive, send)
+            return
+        
+        await response(scope, receive, send)
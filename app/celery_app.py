@@ -9,15 +9,16 @@ celery_app = Celery(
     "llm_inference",
     broker=settings.redis_url,
     backend=settings.redis_url,
-    include=["app.tasks.inference", "app.tasks.ollama_inference"]
+    include=["app.tasks.inference", "app.tasks.ollama_inference", "app.tasks.vllm_inference"]
 )
 
 # Celery configuration
 celery_app.conf.update(
-    # Task settings
-    task_serializer="json",
-    accept_content=["json"],
-    result_serializer="json",
+    # Task settings (msgpack is smaller and faster than JSON for prompt/result payloads)
+    task_serializer="msgpack",
+    accept_content=["msgpack", "json"],
+    result_serializer="msgpack",
+    result_accept_content=["msgpack", "json"],
     timezone="UTC",
     enable_utc=True,
     
@@ -37,13 +38,44 @@ celery_app.conf.update(
     # Retry settings
     task_acks_late=True,  # Acknowledge task after completion
     task_reject_on_worker_lost=True,
+    
+    # Redis transport settings
+    broker_transport_options={
+        "socket_keepalive": True,
+        "health_check_interval": 30,
+        "visibility_timeout": 3600,  # Must exceed task_time_limit since acks are late
+    },
+    # The result backend reads its connection settings from redis_* options;
+    # result_backend_transport_options only carries retry/sentinel settings
+    redis_retry_on_timeout=True,
+    redis_socket_keepalive=True,
+    redis_backend_health_check_interval=30,
 )
 
 # Optional: Configure task routes
 celery_app.conf.task_routes = {
     "app.tasks.inference.*": {"queue": "celery"},
     "app.tasks.ollama_inference.*": {"queue": "celery"},
+    "app.tasks.vllm_inference.*": {"queue": "celery"},
 }
 
+def forks_pool_processes(consumer) -> bool:
+    """
+    Check whether a worker runs its tasks in forked prefork child processes.
+    
+    Model warm-up hooks on worker_ready run in the worker's main process,
+    which under prefork never executes a task, so they use this to skip.
+    
+    Args:
+        consumer: Consumer sent as the worker_ready signal's sender
+        
+    Returns:
+        True if the worker uses the prefork pool
+    """
+    from celery.concurrency.prefork import TaskPool as PreforkPool
+    
+    return isinstance(getattr(consumer, "pool", None), PreforkPool)
+
+
 if __name__ == "__main__":
     celery_app.start()
@@ -4,8 +4,9 @@ Loads settings from environment variables with sensible defaults.
 """
 import os
 import logging
+from functools import cached_property
 from pathlib import Path
-from typing import List
+from typing import FrozenSet, List, Optional
 from pydantic_settings import BaseSettings
 from pydantic import Field
 
@@ -17,41 +18,80 @@ class Settings(BaseSettings):
     redis_host: str = Field(default="localhost", env="REDIS_HOST")
     redis_port: int = Field(default=6379, env="REDIS_PORT")
     redis_db: int = Field(default=0, env="REDIS_DB")
+    redis_max_connections: int = Field(default=32, env="REDIS_MAX_CONNECTIONS")  # API's async pool, shared by all requests
     
-    @property
+    @cached_property
     def redis_url(self) -> str:
-        """Construct Redis URL from components."""
+        """Construct Redis URL from components (built once)."""
         return f"redis://{self.redis_host}:{self.redis_port}/{self.redis_db}"
     
     # API Configuration
     api_keys: str = Field(default="dev-key-12345", env="API_KEYS")
     fastapi_host: str = Field(default="0.0.0.0", env="FASTAPI_HOST")
     fastapi_port: int = Field(default=8000, env="FASTAPI_PORT")
+    cors_origins: str = Field(default="*", env="CORS_ORIGINS")  # Comma-separated; set explicit origins in production
+    rate_limit_backend: str = Field(default="memory", env="RATE_LIMIT_BACKEND")  # "memory" (per process) or "redis" (shared)
     
-    @property
-    def api_keys_list(self) -> List[str]:
-        """Parse comma-separated API keys."""
-        return [key.strip() for key in self.api_keys.split(",") if key.strip()]
+    @cached_property
+    def api_keys_set(self) -> FrozenSet[str]:
+        """Parse comma-separated API keys once into a set for O(1) lookups."""
+        return frozenset(key.strip() for key in self.api_keys.split(",") if key.strip())
+    
+    @cached_property
+    def api_keys_bytes(self) -> FrozenSet[bytes]:
+        """API keys encoded once, for comparing with raw ASGI header values."""
+        return frozenset(key.encode() for key in self.api_keys_set)
+    
+    @cached_property
+    def cors_origins_list(self) -> List[str]:
+        """Parse comma-separated CORS origins."""
+        return [origin.strip() for origin in self.cors_origins.split(",") if origin.strip()]
     
     # Model Configuration
-    model_backend: str = Field(default="transformers", env="MODEL_BACKEND")  # "transformers" or "ollama"
+    model_backend: str = Field(default="transformers", env="MODEL_BACKEND")  # "transformers", "vllm" or "ollama"
     model_name: str = Field(default="gpt2", env="MODEL_NAME")
     model_device: str = Field(default="cuda", env="MODEL_DEVICE")
     use_quantization: bool = Field(default=False, env="USE_QUANTIZATION")
+    quantization_mode: str = Field(default="", env="QUANTIZATION_MODE")  # "nf4", "int8", "awq" or "fp16"; defaults from USE_QUANTIZATION
+    torch_compile: bool = Field(default=False, env="TORCH_COMPILE")  # CUDA only: static KV cache + CUDA graphs
+    model_warmup: bool = Field(default=True, env="MODEL_WARMUP")  # Load the model when a worker starts
+    draft_model_name: str = Field(default="", env="DRAFT_MODEL_NAME")  # Optional speculative-decoding draft model
+    num_assistant_tokens: int = Field(default=5, env="NUM_ASSISTANT_TOKENS")  # Tokens the draft proposes per step
+    max_prompt_tokens: Optional[int] = Field(default=None, env="MAX_PROMPT_TOKENS")  # Truncate longer prompts; defaults to the tokenizer limit
     max_new_tokens: int = Field(default=512, env="MAX_NEW_TOKENS")
     temperature: float = Field(default=0.7, env="TEMPERATURE")
     
+    @cached_property
+    def quantization(self) -> str:
+        """Resolve the weight format, keeping USE_QUANTIZATION as the nf4 shorthand."""
+        if self.quantization_mode:
+            return self.quantization_mode.lower()
+        return "nf4" if self.use_quantization else "fp16"
+    
+    # vLLM Configuration (continuous batching; run the worker with --pool=threads)
+    vllm_max_num_seqs: int = Field(default=64, env="VLLM_MAX_NUM_SEQS")  # Sequences decoded together per step
+    vllm_max_num_batched_tokens: int = Field(default=8192, env="VLLM_MAX_NUM_BATCHED_TOKENS")  # Token budget per step
+    
     # Ollama Configuration
     ollama_base_url: str = Field(default="http://localhost:11434", env="OLLAMA_BASE_URL")
     ollama_model: str = Field(default="llama2", env="OLLAMA_MODEL")
+    ollama_warmup: bool = Field(default=True, env="OLLAMA_WARMUP")  # Load the model when a worker starts
+    response_cache_ttl: int = Field(default=3600, env="RESPONSE_CACHE_TTL")  # Seconds to reuse responses to repeated prompts; 0 disables
+    response_cache_max_temperature: float = Field(default=0.2, env="RESPONSE_CACHE_MAX_TEMPERATURE")  # Only (near-)deterministic requests are cached
     
     # Task Configuration
     task_time_limit: int = Field(default=120, env="TASK_TIME_LIMIT")
     celery_concurrency: int = Field(default=1, env="CELERY_CONCURRENCY")
+    worker_numa_node: Optional[int] = Field(default=None, env="WORKER_NUMA_NODE")  # Pin transformers workers to one NUMA node's CPUs (Linux)
+    health_check_interval: int = Field(default=15, env="HEALTH_CHECK_INTERVAL")  # Seconds between worker probes
     
     # Logging Configuration
     log_level: str = Field(default="INFO", env="LOG_LEVEL")
     log_dir: str = Field(default="logs", env="LOG_DIR")
+    log_format: str = Field(default="text", env="LOG_FORMAT")  # "text" (llm_requests.log) or "binary" (llm_requests.bin)
+    log_flush_interval: float = Field(default=0.1, env="LOG_FLUSH_INTERVAL")  # Max seconds log entries stay buffered
+    log_sample_rate: int = Field(default=1, env="LOG_SAMPLE_RATE")  # Log 1 in N successful requests (errors are always logged)
+    log_slow_threshold: float = Field(default=10.0, env="LOG_SLOW_THRESHOLD")  # Successes slower than this (seconds) are always logged
     
     class Config:
         env_file = ".env"
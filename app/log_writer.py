@@ -0,0 +1,266 @@
+"""
+Background writer for the request and error log files.
+Tasks hand log entries to a queue; one thread appends them through
+long-lived buffered file handles, so a task never pays for open/write/close.
+Entries accumulate in each file's 64 KB buffer and reach the kernel as one
+write() per flush, which already gives the one-syscall-per-batch behaviour
+an io_uring submission queue would, without a liburing dependency.
+"""
+import queue
+import atexit
+import random
+import logging
+import struct
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, IO, Iterator, Optional, Tuple, Union
+
+from celery.signals import worker_shutdown
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Entries waiting to be written; once this many are queued new entries are
+# dropped (and counted) rather than making tasks wait on the disk
+QUEUE_SIZE = 10000
+
+# Most entries taken off the queue per wake-up of the writer thread
+BATCH_SIZE = 256
+
+# Default maximum time an entry sits in a file buffer before it is flushed
+FLUSH_INTERVAL = 0.1
+
+# Write buffer per log file
+BUFFER_SIZE = 1 << 16
+
+# Log files, resolved once per process
+REQUEST_LOG = Path(settings.log_dir) / "llm_requests.log"
+REQUEST_BINARY_LOG = Path(settings.log_dir) / "llm_requests.bin"
+ERROR_LOG = Path(settings.log_dir) / "errors.log"
+
+# Binary request record (LOG_FORMAT=binary): task_id (UUID bytes), status
+# (1 = success, 0 = error), backend (index into BACKENDS), enqueue/start/end
+# times, prompt/completion tokens, and the error message truncated to 64 bytes
+REQUEST_RECORD = struct.Struct("<16sBBddd II 64s")
+
+# Backends as numbered in request records
+BACKENDS = ("transformers", "ollama", "vllm")
+
+
+class LogWriter:
+    """
+    Append log entries to files from a single background thread.
+    
+    The thread starts on the first write() and is stopped (with a final
+    flush) at worker shutdown or interpreter exit.
+    
+    Args:
+        flush_interval: Maximum seconds an entry waits in a file buffer
+    """
+    
+    def __init__(self, flush_interval: float = FLUSH_INTERVAL):
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue[Optional[Tuple[Path, Union[str, bytes]]]]" = queue.Queue(maxsize=QUEUE_SIZE)
+        self._files: Dict[Path, IO] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.dropped = 0
+    
+    def write(self, path: Path, entry: Union[str, bytes]):
+        """
+        Queue an entry to be appended to a log file.
+        
+        Args:
+            path: Log file to append to
+            entry: Text (including its trailing newline) or a binary record;
+                a file only ever receives one of the two
+        """
+        if self._thread is None:
+            self._start()
+        try:
+            self._queue.put_nowait((path, entry))
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped % 1000 == 1:
+                logger.warning(f"Log queue full, {self.dropped} entries dropped so far")
+    
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+                self._thread.start()
+                atexit.register(self.stop)
+    
+    def _run(self):
+        last_flush = time.monotonic()
+        
+        stopping = False
+        
+        while not stopping:
+            try:
+                batch = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                batch = []
+            
+            # Take whatever else is already queued in the same wake-up
+            while batch and len(batch) < BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            
+            for item in batch:
+                if item is None:
+                    stopping = True
+                    continue
+                path, entry = item
+                try:
+                    self._file(path, isinstance(entry, bytes)).write(entry)
+                except Exception as e:
+                    logger.error(f"Failed to write to {path}: {str(e)}")
+            
+            # Flush when idle, and at least every flush_interval under load
+            now = time.monotonic()
+            if not batch or now - last_flush >= self.flush_interval:
+                self._flush()
+                last_flush = now
+        
+        self._flush()
+    
+    def _file(self, path: Path, binary: bool) -> IO:
+        f = self._files.get(path)
+        if f is None:
+            if binary:
+                f = open(path, "ab", buffering=BUFFER_SIZE)
+            else:
+                f = open(path, "a", encoding="utf-8", buffering=BUFFER_SIZE)
+            self._files[path] = f
+        return f
+    
+    def _flush(self):
+        for path, f in self._files.items():
+            try:
+                f.flush()
+            except Exception as e:
+                logger.error(f"Failed to flush {path}: {str(e)}")
+    
+    def stop(self, timeout: float = 5.0):
+        """Write out everything still queued and stop the thread."""
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join(timeout)
+        for f in self._files.values():
+            f.close()
+        self._files.clear()
+        self._thread = None
+
+
+# (epoch second, formatted text) of the last timestamp; one tuple so threads
+# never see a second paired with another second's text
+_timestamp_cache: Tuple[int, str] = (-1, "")
+
+
+def format_timestamp(epoch: float) -> str:
+    """
+    Format an epoch time as 'YYYY-MM-DD HH:MM:SS' local time.
+    
+    Log entries written within the same second share one formatted
+    string, so the text logs only pay for strftime once per second.
+    """
+    global _timestamp_cache
+    second = int(epoch)
+    cached_second, text = _timestamp_cache
+    if second != cached_second:
+        text = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(second))
+        _timestamp_cache = (second, text)
+    return text
+
+
+def sample_request_log(processing_time: float) -> bool:
+    """
+    Decide whether to log a successful request's metrics.
+    
+    Callers always log errors. Successes slower than LOG_SLOW_THRESHOLD
+    are always kept; the rest are kept one in LOG_SAMPLE_RATE.
+    """
+    rate = settings.log_sample_rate
+    return rate <= 1 or processing_time > settings.log_slow_threshold or random.randrange(rate) == 0
+
+
+def pack_request_record(
+    task_id: str,
+    status: str,
+    enqueue_time: float,
+    start_time: float,
+    end_time: float,
+    prompt_tokens: Optional[int] = None,
+    completion_tokens: Optional[int] = None,
+    error_message: Optional[str] = None,
+    backend: str = "transformers"
+) -> bytes:
+    """
+    Pack request metrics into a fixed-size binary record.
+    
+    Missing token counts are stored as 0 and the error message is
+    truncated to 64 bytes. See decode_log.py for turning records back
+    into text.
+    
+    Returns:
+        REQUEST_RECORD.size bytes
+    """
+    try:
+        task_bytes = uuid.UUID(task_id).bytes
+    except ValueError:
+        task_bytes = task_id.encode()[:16]
+    
+    return REQUEST_RECORD.pack(
+        task_bytes,
+        1 if status == "success" else 0,
+        BACKENDS.index(backend),
+        enqueue_time,
+        start_time,
+        end_time,
+        prompt_tokens or 0,
+        completion_tokens or 0,
+        (error_message or "").encode("utf-8")[:64]
+    )
+
+
+def iter_request_records(data: bytes) -> Iterator[Dict]:
+    """
+    Decode binary request records.
+    
+    Args:
+        data: Contents of a binary request log (a bytes-like object or mmap)
+    
+    Yields:
+        Dict per record with the fields passed to pack_request_record
+    """
+    # Ignore a partially written trailing record
+    usable = len(data) - len(data) % REQUEST_RECORD.size
+    for task_bytes, status, backend, enqueue_time, start_time, end_time, prompt_tokens, completion_tokens, error in REQUEST_RECORD.iter_unpack(memoryview(data)[:usable]):
+        yield {
+            "task_id": str(uuid.UUID(bytes=task_bytes)),
+            "status": "success" if status else "error",
+            "backend": BACKENDS[backend],
+            "enqueue_time": enqueue_time,
+            "start_time": start_time,
+            "end_time": end_time,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "error_message": error.rstrip(b"\0").decode("utf-8", errors="replace"),
+        }
+
+
+# Shared by all tasks in the worker process
+log_writer = LogWriter(settings.log_flush_interval)
+
+
+@worker_shutdown.connect
+def _flush_on_worker_shutdown(**kwargs):
+    """Write out queued entries before the worker exits."""
+    log_writer.stop()
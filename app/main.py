@@ -3,33 +3,38 @@ FastAPI application for LLM inference system.
 Provides REST API endpoints for queued text generation.
 """
 import time
+import asyncio
 import logging
+from contextlib import asynccontextmanager
 from typing import Dict, Any
 
-from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi import FastAPI, HTTPException, Query, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, StreamingResponse, Response
-from celery.result import AsyncResult
-import redis
+from fastapi.responses import StreamingResponse, Response
+from celery import group, states
+import orjson
+import redis.asyncio as aioredis
 
 from app.config import settings, logger
 from app.models import (
     GenerateRequest,
+    BatchGenerateRequest,
     TaskResponse,
+    BatchTaskResponse,
     ResultResponse,
     ErrorResponse,
     StatusResponse,
+    BatchStatusResponse,
     HealthResponse,
     TaskMetrics
 )
-from app.auth import verify_api_key
+from app.auth import APIKeyMiddleware, document_api_key
 from app.celery_app import celery_app
-from app.tasks.inference import generate_text, health_check
-from app.tasks.ollama_inference import generate_text_ollama, health_check_ollama
 
 # Optional enhancements
-from app.streaming import stream_task_progress
+from app.streaming import read_task_meta, read_task_metas, stream_tokens, wait_for_any_task_meta, wait_for_task_meta
 from app.rate_limit import RateLimitMiddleware
+from app.responses import ORJSONResponse
 from app.metrics import (
     PrometheusMiddleware,
     record_task_submitted,
@@ -39,44 +44,197 @@ from app.metrics import (
     CONTENT_TYPE_LATEST
 )
 
+# (inference task, health check task) per backend. Tasks are queued by name,
+# so the API process never imports the worker modules (torch/transformers,
+# vLLM) just to reference them; that import took most of the API's startup.
+_TASK_NAMES = {
+    "transformers": ("app.tasks.inference.generate_text", "app.tasks.inference.health_check"),
+    "ollama": ("app.tasks.ollama_inference.generate_text_ollama", "app.tasks.ollama_inference.health_check_ollama"),
+    "vllm": ("app.tasks.vllm_inference.generate_text_vllm", "app.tasks.vllm_inference.health_check_vllm"),
+}
+
+
+def _backend_tasks():
+    """Return the (inference, health check) task names for the configured backend."""
+    return _TASK_NAMES.get(settings.model_backend, _TASK_NAMES["transformers"])
+
+# Worker health, refreshed in the background so /health never waits on Celery
+_worker_health: Dict[str, Any] = {
+    "model_loaded": False,
+    "backend_info": {},
+    "timestamp": None
+}
+
+# Encoded /health bodies keyed by Redis reachability; cleared whenever the
+# worker health is refreshed, so most probes only ping Redis
+_health_bodies: Dict[bool, bytes] = {}
+
+
+async def _run_health_check() -> Dict[str, Any]:
+    """
+    Run the backend's worker health check task and wait up to 5s for its result.
+    
+    Waits on the result-backend channel rather than blocking a thread in
+    AsyncResult.get(), so the refresher can be cancelled at any time and
+    shutdown never waits for an unanswered probe.
+    
+    Raises:
+        TimeoutError: If no worker answered in time
+    """
+    # Publish off the event loop and without retries: if the broker is down
+    # the probe should fail now rather than hold up requests while kombu
+    # reconnects
+    signature = celery_app.signature(_backend_tasks()[1])
+    task_id = (await asyncio.to_thread(signature.apply_async, retry=False)).id
+    meta = await wait_for_task_meta(task_id, redis_client, 5)
+    if meta["status"] != states.SUCCESS:
+        raise TimeoutError(f"Health check task {task_id} is {meta['status']}")
+    return meta["result"]
+
+
+async def _probe_worker() -> Dict[str, Any]:
+    """
+    Run the worker health check task and wait for its reply.
+    
+    Returns:
+        Dict with model_loaded flag and backend info
+    """
+    worker_response = await _run_health_check()
+    
+    if settings.model_backend == "ollama":
+        return {
+            "model_loaded": worker_response.get("ollama_connected", False),
+            "backend_info": {
+                "backend": "ollama",
+                "model": settings.ollama_model,
+                "available_models": worker_response.get("available_models", [])
+            }
+        }
+    
+    return {
+        "model_loaded": worker_response.get("model_loaded", False),
+        "backend_info": {
+            "backend": settings.model_backend,
+            "model": settings.model_name
+        }
+    }
+
+
+async def _refresh_worker_health():
+    """Periodically refresh the cached worker health."""
+    while True:
+        try:
+            _worker_health.update(await _probe_worker())
+        except Exception as e:
+            logger.warning(f"Worker health check failed: {str(e)}")
+            _worker_health.update(model_loaded=False, backend_info={})
+        _worker_health["timestamp"] = time.time()
+        _health_bodies.clear()
+        
+        await asyncio.sleep(settings.health_check_interval)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start background tasks on startup and stop them on shutdown."""
+    health_refresher = asyncio.create_task(_refresh_worker_health())
+    yield
+    health_refresher.cancel()
+    # Let the probe release its Pub/Sub connection before the pool closes
+    await asyncio.gather(health_refresher, return_exceptions=True)
+    await redis_client.aclose()
+
+
 # Initialize FastAPI app
 app = FastAPI(
     title="LLM Inference System",
     description="Queue-based LLM inference API with comprehensive logging and monitoring",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
-# Configure CORS
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # Configure appropriately for production
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+# Redis client for task state, health checks and shared rate limiting. One
+# pool of keep-alive connections serves every request; a request borrows a
+# connection for its command and returns it, instead of connecting anew.
+redis_client = aioredis.Redis(
+    host=settings.redis_host,
+    port=settings.redis_port,
+    db=settings.redis_db,
+    decode_responses=False,  # Result-backend messages are binary (msgpack)
+    max_connections=settings.redis_max_connections,
+    socket_keepalive=True
 )
 
+# Middleware runs outermost-first in reverse order of registration:
+# CORS -> API key -> rate limit -> metrics -> route. Rejecting bad keys
+# before the rate limiter and metrics keeps abusive traffic from writing
+# limiter state or creating Prometheus label sets.
+
+# Add Prometheus metrics middleware
+app.add_middleware(PrometheusMiddleware)
+
 # Add rate limiting middleware (60 requests per minute per API key)
 app.add_middleware(
     RateLimitMiddleware,
     requests_per_minute=60,
-    burst_size=10
+    burst_size=10,
+    redis_client=redis_client if settings.rate_limit_backend == "redis" else None
 )
 
-# Add Prometheus metrics middleware
-app.add_middleware(PrometheusMiddleware)
+# Reject missing/invalid API keys before any other work is done
+app.add_middleware(APIKeyMiddleware)
+document_api_key(app)
 
-# Redis client for health checks
-redis_client = redis.Redis(
-    host=settings.redis_host,
-    port=settings.redis_port,
-    db=settings.redis_db,
-    decode_responses=True
+# Configure CORS
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=settings.cors_origins_list,  # Set CORS_ORIGINS for production
+    allow_credentials=True,
+    allow_methods=["GET", "POST"],
+    allow_headers=["X-API-Key", "Content-Type"],
+    max_age=600,  # Let browsers cache preflight responses for 10 minutes
 )
 
 
-@app.get("/", response_model=Dict[str, str])
+def _inference_task():
+    """Return a signature of the inference task for the configured model backend."""
+    return celery_app.signature(_backend_tasks()[0])
+
+
+def _task_kwargs(request: GenerateRequest, enqueue_time: float) -> Dict[str, Any]:
+    """Build inference task kwargs from a generation request."""
+    return {
+        "prompt": request.prompt,
+        "max_tokens": request.max_tokens,
+        "temperature": request.temperature,
+        "top_p": request.top_p,
+        "enqueue_time": enqueue_time
+    }
+
+
+async def _get_task_meta(task_id: str) -> Dict[str, Any]:
+    """
+    Fetch task state and result from the Celery result backend.
+    
+    One async GET on the shared pool, decoded by the backend itself, so
+    neither a worker thread nor a new connection is needed. A single read
+    serves both state and result.
+    
+    Args:
+        task_id: Unique task identifier
+        
+    Returns:
+        Task meta dict with 'status' and 'result' keys
+    """
+    return await read_task_meta(task_id, redis_client)
+
+
+# root and health build plain dicts that ORJSONResponse encodes directly;
+# without response_model FastAPI skips validating them into a model first
+@app.get("/")
 async def root():
     """Root endpoint with API information."""
     return {
@@ -87,63 +245,47 @@ async def root():
     }
 
 
-@app.get("/health", response_model=HealthResponse)
+def _health_body(redis_connected: bool) -> bytes:
+    """Encode the /health response for a Redis state and the current worker health."""
+    response_data = {
+        "status": "healthy" if redis_connected else "degraded",
+        "redis_connected": redis_connected,
+        "model_loaded": _worker_health["model_loaded"],
+        "version": "1.0.0"
+    }
+    response_data.update(_worker_health["backend_info"])
+    return orjson.dumps(response_data)
+
+
+@app.get("/health", responses={200: {"model": HealthResponse}})
 async def health():
     """
     Health check endpoint.
-    Verifies Redis connection and worker status.
+    Verifies Redis connection and reports the cached worker status,
+    including the backend fields (backend, model, ...) the worker reported.
+    The body is encoded once per Redis state and worker health refresh.
     """
     # Check Redis connection
     try:
-        redis_client.ping()
+        await redis_client.ping()
         redis_connected = True
     except Exception as e:
         logger.error(f"Redis health check failed: {str(e)}")
         redis_connected = False
     
-    # Check if worker is available and model is loaded
-    model_loaded = False
-    backend_info = {}
-    try:
-        # Check based on configured backend
-        if settings.model_backend == "ollama":
-            result = health_check_ollama.apply_async()
-            worker_response = result.get(timeout=5)
-            model_loaded = worker_response.get("ollama_connected", False)
-            backend_info = {
-                "backend": "ollama",
-                "model": settings.ollama_model,
-                "available_models": worker_response.get("available_models", [])
-            }
-        else:
-            result = health_check.apply_async()
-            worker_response = result.get(timeout=5)
-            model_loaded = worker_response.get("model_loaded", False)
-            backend_info = {
-                "backend": "transformers",
-                "model": settings.model_name
-            }
-    except Exception as e:
-        logger.warning(f"Worker health check failed: {str(e)}")
+    # Worker status is refreshed every HEALTH_CHECK_INTERVAL seconds
+    update_system_metrics(redis_connected, _worker_health["model_loaded"])
     
-    # Update Prometheus metrics
-    update_system_metrics(redis_connected, model_loaded)
+    body = _health_bodies.get(redis_connected)
+    if body is None:
+        body = _health_bodies[redis_connected] = _health_body(redis_connected)
     
-    response_data = {
-        "status": "healthy" if redis_connected else "degraded",
-        "redis_connected": redis_connected,
-        "model_loaded": model_loaded,
-        "version": "1.0.0"
-    }
-    response_data.update(backend_info)
-    
-    return response_data
+    return Response(content=body, media_type="application/json")
 
 
 @app.post("/generate", response_model=TaskResponse, status_code=status.HTTP_202_ACCEPTED)
 async def generate(
-    request: GenerateRequest,
-    api_key: str = Depends(verify_api_key)
+    request: GenerateRequest
 ):
     """
     Submit a text generation request.
@@ -153,7 +295,6 @@ async def generate(
     
     Args:
         request: Generation request with prompt and parameters
-        api_key: API key for authentication
         
     Returns:
         TaskResponse with task_id and status
@@ -170,26 +311,7 @@ async def generate(
         logger.info(f"Using backend: {settings.model_backend}")
         
         # Submit task to Celery based on configured backend
-        if settings.model_backend == "ollama":
-            task = generate_text_ollama.apply_async(
-                kwargs={
-                    "prompt": request.prompt,
-                    "max_tokens": request.max_tokens,
-                    "temperature": request.temperature,
-                    "top_p": request.top_p,
-                    "enqueue_time": enqueue_time
-                }
-            )
-        else:
-            task = generate_text.apply_async(
-                kwargs={
-                    "prompt": request.prompt,
-                    "max_tokens": request.max_tokens,
-                    "temperature": request.temperature,
-                    "top_p": request.top_p,
-                    "enqueue_time": enqueue_time
-                }
-            )
+        task = _inference_task().apply_async(kwargs=_task_kwargs(request, enqueue_time))
         
         logger.info(f"Task queued with ID: {task.id}")
         
@@ -210,17 +332,149 @@ async def generate(
         )
 
 
+@app.post("/generate/batch", response_model=BatchTaskResponse, status_code=status.HTTP_202_ACCEPTED)
+async def generate_batch(
+    batch: BatchGenerateRequest
+):
+    """
+    Submit several text generation requests in one call.
+    
+    All requests are queued together as a Celery group, so the broker is
+    hit once per batch instead of once per prompt. Each request still runs
+    as its own task; use the returned task_ids with /status and /result.
+    
+    Args:
+        batch: Batch of generation requests
+        
+    Returns:
+        BatchTaskResponse with group_id and task_ids (in request order)
+        
+    Raises:
+        HTTPException: If the batch could not be queued
+    """
+    try:
+        enqueue_time = time.time()
+        
+        logger.info(f"Received batch of {len(batch.requests)} generation requests")
+        logger.info(f"Using backend: {settings.model_backend}")
+        
+        # apply_async blocks on the broker while it publishes every task in
+        # the group, so run it off the event loop as _run_health_check does
+        task = _inference_task()
+        signature = group(
+            task.clone(kwargs=_task_kwargs(request, enqueue_time)) for request in batch.requests
+        )
+        job = await asyncio.to_thread(signature.apply_async)
+        
+        task_ids = [result.id for result in job.results]
+        logger.info(f"Batch queued with group ID: {job.id} ({len(task_ids)} tasks)")
+        
+        for request in batch.requests:
+            record_task_submitted(request.user_id or "anonymous")
+        
+        return BatchTaskResponse(
+            status="queued",
+            group_id=job.id,
+            task_ids=task_ids,
+            message="Your requests are being processed. Use the task_ids to check status."
+        )
+        
+    except Exception as e:
+        logger.error(f"Failed to queue batch: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to queue batch: {str(e)}"
+        )
+
+
+# Most task_ids accepted by /status/batch
+MAX_BATCH_STATUS_IDS = 100
+
+
+def _task_status(task_id: str, state: str) -> StatusResponse:
+    """Map a Celery task state to the API's status response."""
+    if state == "PENDING":
+        task_status = "queued"
+        message = "Task is waiting in queue"
+    elif state == "STARTED":
+        task_status = "processing"
+        message = "Task is currently being processed"
+    elif state == "SUCCESS":
+        task_status = "completed"
+        message = "Task completed successfully"
+    elif state == "FAILURE":
+        task_status = "failed"
+        message = "Task failed during processing"
+    else:
+        task_status = state.lower()
+        message = f"Task state: {state}"
+    
+    return StatusResponse(
+        status=task_status,
+        task_id=task_id,
+        message=message
+    )
+
+
+# Declared before /status/{task_id}, which would otherwise match "batch"
+@app.get("/status/batch", response_model=BatchStatusResponse)
+async def get_status_batch(
+    ids: str = Query(..., description="Comma-separated task IDs (at most 100)"),
+    wait: float = Query(default=0, ge=0, le=60, description="Seconds to hold the request open until one of the tasks finishes")
+):
+    """
+    Check the status of several tasks at once.
+    
+    All states are read in one Redis round trip. With wait > 0 this is a
+    long poll: if none of the tasks has finished, the request is held
+    until one does or wait seconds pass. Clients tracking many tasks make
+    one call at a time, dropping finished task_ids from the next one.
+    
+    Args:
+        ids: Comma-separated task identifiers
+        wait: Maximum seconds to wait for one of the tasks to finish
+        
+    Returns:
+        BatchStatusResponse with one status per task_id, in request order
+        
+    Raises:
+        HTTPException: If ids is empty or lists too many tasks
+    """
+    task_ids = [task_id for task_id in (part.strip() for part in ids.split(",")) if task_id]
+    
+    if not task_ids or len(task_ids) > MAX_BATCH_STATUS_IDS:
+        raise HTTPException(
+            status_code=422,
+            detail=f"ids must list between 1 and {MAX_BATCH_STATUS_IDS} task IDs"
+        )
+    
+    try:
+        if wait:
+            metas = await wait_for_any_task_meta(task_ids, redis_client, wait)
+        else:
+            metas = await read_task_metas(task_ids, redis_client)
+        
+        return BatchStatusResponse(
+            statuses=[_task_status(task_id, meta["status"]) for task_id, meta in zip(task_ids, metas)]
+        )
+        
+    except Exception as e:
+        logger.error(f"Failed to get status for {len(task_ids)} tasks: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to retrieve task statuses: {str(e)}"
+        )
+
+
 @app.get("/status/{task_id}", response_model=StatusResponse)
 async def get_status(
-    task_id: str,
-    api_key: str = Depends(verify_api_key)
+    task_id: str
 ):
     """
     Check the status of a task.
     
     Args:
         task_id: Unique task identifier
-        api_key: API key for authentication
         
     Returns:
         StatusResponse with current task status
@@ -229,31 +483,10 @@ async def get_status(
         HTTPException: If task_id is invalid
     """
     try:
-        # Get task result
-        result = AsyncResult(task_id, app=celery_app)
-        
-        # Map Celery states to our status
-        if result.state == "PENDING":
-            task_status = "queued"
-            message = "Task is waiting in queue"
-        elif result.state == "STARTED":
-            task_status = "processing"
-            message = "Task is currently being processed"
-        elif result.state == "SUCCESS":
-            task_status = "completed"
-            message = "Task completed successfully"
-        elif result.state == "FAILURE":
-            task_status = "failed"
-            message = "Task failed during processing"
-        else:
-            task_status = result.state.lower()
-            message = f"Task state: {result.state}"
+        # Get task state
+        state = (await _get_task_meta(task_id))["status"]
         
-        return StatusResponse(
-            status=task_status,
-            task_id=task_id,
-            message=message
-        )
+        return _task_status(task_id, state)
         
     except Exception as e:
         logger.error(f"Failed to get status for task {task_id}: {str(e)}")
@@ -266,14 +499,17 @@ async def get_status(
 @app.get("/result/{task_id}")
 async def get_result(
     task_id: str,
-    api_key: str = Depends(verify_api_key)
+    wait: float = Query(default=0, ge=0, le=60, description="Seconds to hold the request open until the task finishes")
 ):
     """
     Retrieve the result of a completed task.
     
+    With wait > 0 this is a long poll: an unfinished task is held until it
+    completes or wait seconds pass, replacing repeated client polling.
+    
     Args:
         task_id: Unique task identifier
-        api_key: API key for authentication
+        wait: Maximum seconds to wait for the task to finish
         
     Returns:
         ResultResponse if successful, ErrorResponse if failed, or status if still processing
@@ -282,14 +518,19 @@ async def get_result(
         HTTPException: If task not found or other errors
     """
     try:
-        # Get task result
-        result = AsyncResult(task_id, app=celery_app)
+        # Get task state and result in one backend read
+        meta = await _get_task_meta(task_id)
+        
+        if wait and meta["status"] not in states.READY_STATES:
+            meta = await wait_for_task_meta(task_id, redis_client, wait)
+        
+        state = meta["status"]
         
         # Check if task is ready
-        if not result.ready():
+        if state not in states.READY_STATES:
             # Task still processing or queued
-            if result.state == "PENDING":
-                return JSONResponse(
+            if state == "PENDING":
+                return ORJSONResponse(
                     status_code=status.HTTP_202_ACCEPTED,
                     content={
                         "status": "queued",
@@ -297,8 +538,8 @@ async def get_result(
                         "message": "Task is still in queue"
                     }
                 )
-            elif result.state == "STARTED":
-                return JSONResponse(
+            elif state == "STARTED":
+                return ORJSONResponse(
                     status_code=status.HTTP_202_ACCEPTED,
                     content={
                         "status": "processing",
@@ -307,17 +548,25 @@ async def get_result(
                     }
                 )
             else:
-                return JSONResponse(
+                return ORJSONResponse(
                     status_code=status.HTTP_202_ACCEPTED,
                     content={
-                        "status": result.state.lower(),
+                        "status": state.lower(),
                         "task_id": task_id,
-                        "message": f"Task state: {result.state}"
+                        "message": f"Task state: {state}"
                     }
                 )
         
-        # Task is ready, get the result
-        task_result = result.get()
+        task_result = meta["result"]
+        
+        # Task raised (or was revoked) instead of returning a result dict
+        if state != states.SUCCESS:
+            return ErrorResponse(
+                status="error",
+                task_id=task_id,
+                error_message=str(task_result) or "Task failed",
+                error_type=type(task_result).__name__ if task_result is not None else "TaskFailure"
+            )
         
         # Check if task succeeded or failed
         if task_result.get("status") == "completed":
@@ -349,18 +598,17 @@ async def get_result(
 
 @app.get("/stream/{task_id}")
 async def stream_result(
-    task_id: str,
-    api_key: str = Depends(verify_api_key)
+    task_id: str
 ):
     """
     Stream task progress and result using Server-Sent Events (SSE).
     
-    This endpoint provides real-time updates as the task progresses.
+    This endpoint provides real-time updates as the task progresses,
+    including generated tokens as they are produced.
     Useful for showing live status in web applications.
     
     Args:
         task_id: Unique task identifier
-        api_key: API key for authentication
         
     Returns:
         StreamingResponse with SSE events
@@ -375,7 +623,7 @@ async def stream_result(
         ```
     """
     return StreamingResponse(
-        stream_task_progress(task_id),
+        stream_tokens(task_id, redis_client),
         media_type="text/event-stream",
         headers={
             "Cache-Control": "no-cache",
@@ -410,7 +658,7 @@ async def metrics():
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request, exc):
     """Custom exception handler for HTTP exceptions."""
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=exc.status_code,
         content={
             "error": exc.detail,
@@ -423,7 +671,7 @@ async def http_exception_handler(request, exc):
 async def general_exception_handler(request, exc):
     """Custom exception handler for unexpected errors."""
     logger.error(f"Unexpected error: {str(exc)}")
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
         content={
             "error": "Internal server error",
@@ -4,7 +4,7 @@ Tracks API requests, task processing, and system performance.
 """
 import time
 import logging
-from typing import Callable
+from typing import Callable, Dict, Tuple
 from prometheus_client import Counter, Histogram, Gauge, generate_latest, CONTENT_TYPE_LATEST
 from fastapi import Request, Response
 from starlette.middleware.base import BaseHTTPMiddleware
@@ -80,6 +80,11 @@ model_loaded = Gauge(
 )
 
 
+# Label-bound metric children, reused across requests
+_request_counters: Dict[Tuple[str, str, int], Counter] = {}
+_request_timers: Dict[Tuple[str, str], Histogram] = {}
+
+
 class PrometheusMiddleware(BaseHTTPMiddleware):
     """
     FastAPI middleware for Prometheus metrics collection.
@@ -100,9 +105,7 @@ class PrometheusMiddleware(BaseHTTPMiddleware):
         if request.url.path == "/metrics":
             return await call_next(request)
         
-        # Record request
         method = request.method
-        endpoint = request.url.path
         
         # Time the request
         start_time = time.time()
@@ -117,16 +120,21 @@ class PrometheusMiddleware(BaseHTTPMiddleware):
             # Record metrics
             duration = time.time() - start_time
             
-            http_requests_total.labels(
-                method=method,
-                endpoint=endpoint,
-                status=status
-            ).inc()
+            # Label by route template (/status/{task_id}) to bound cardinality
+            route = request.scope.get("route")
+            endpoint = route.path if route else request.url.path
+            
+            counter_key = (method, endpoint, status)
+            counter = _request_counters.get(counter_key)
+            if counter is None:
+                counter = _request_counters[counter_key] = http_requests_total.labels(*counter_key)
+            counter.inc()
             
-            http_request_duration_seconds.labels(
-                method=method,
-                endpoint=endpoint
-            ).observe(duration)
+            timer_key = (method, endpoint)
+            timer = _request_timers.get(timer_key)
+            if timer is None:
+                timer = _request_timers[timer_key] = http_request_duration_seconds.labels(*timer_key)
+            timer.observe(duration)
         
         return response
 
@@ -1,27 +1,53 @@
 """
 Pydantic models for request/response validation.
 """
-from typing import Optional, Dict, Any
-from pydantic import BaseModel, Field
+from typing import Annotated, Optional, Dict, Any, List
+from pydantic import BaseModel, ConfigDict, Field, StringConstraints
 
+# Prompt text; the length bounds are enforced inside pydantic-core's str validator
+PromptStr = Annotated[str, StringConstraints(min_length=1, max_length=10000)]
 
-class GenerateRequest(BaseModel):
+
+class APIModel(BaseModel):
+    """
+    Base for all request/response models.
+    
+    Models are immutable once validated, so pydantic can skip assignment
+    checks; unknown fields are ignored.
+    """
+    model_config = ConfigDict(extra="ignore", frozen=True, defer_build=False)
+
+
+class GenerateRequest(APIModel):
     """Request model for text generation."""
-    prompt: str = Field(..., min_length=1, max_length=10000, description="Input prompt for generation")
+    prompt: PromptStr = Field(..., description="Input prompt for generation")
     max_tokens: Optional[int] = Field(default=512, ge=1, le=2048, description="Maximum tokens to generate")
     temperature: Optional[float] = Field(default=0.7, ge=0.0, le=2.0, description="Sampling temperature")
     top_p: Optional[float] = Field(default=0.9, ge=0.0, le=1.0, description="Nucleus sampling parameter")
     user_id: Optional[str] = Field(default=None, description="Optional user identifier")
 
 
-class TaskResponse(BaseModel):
+class BatchGenerateRequest(APIModel):
+    """Request model for submitting several generations at once."""
+    requests: List[GenerateRequest] = Field(..., min_length=1, max_length=100, description="Generation requests to queue")
+
+
+class TaskResponse(APIModel):
     """Response model for queued tasks."""
     status: str = Field(..., description="Task status: 'queued'")
     task_id: str = Field(..., description="Unique task identifier")
     message: str = Field(..., description="Human-readable message")
 
 
-class TaskMetrics(BaseModel):
+class BatchTaskResponse(APIModel):
+    """Response model for queued batches."""
+    status: str = Field(..., description="Batch status: 'queued'")
+    group_id: str = Field(..., description="Celery group identifier")
+    task_ids: List[str] = Field(..., description="Task identifiers, in request order")
+    message: str = Field(..., description="Human-readable message")
+
+
+class TaskMetrics(APIModel):
     """Performance metrics for completed tasks."""
     queue_wait_time: float = Field(..., description="Time spent waiting in queue (seconds)")
     processing_time: float = Field(..., description="Time spent processing (seconds)")
@@ -29,9 +55,10 @@ class TaskMetrics(BaseModel):
     prompt_tokens: Optional[int] = Field(default=None, description="Number of tokens in prompt")
     completion_tokens: Optional[int] = Field(default=None, description="Number of tokens in completion")
     tokens_per_second: Optional[float] = Field(default=None, description="Generation speed")
+    cache_hit: bool = Field(default=False, description="Served from the response cache instead of the model")
 
 
-class ResultResponse(BaseModel):
+class ResultResponse(APIModel):
     """Response model for completed tasks."""
     status: str = Field(..., description="Task status: 'completed'")
     task_id: str = Field(..., description="Unique task identifier")
@@ -39,7 +66,7 @@ class ResultResponse(BaseModel):
     metrics: Optional[TaskMetrics] = Field(default=None, description="Performance metrics")
 
 
-class ErrorResponse(BaseModel):
+class ErrorResponse(APIModel):
     """Response model for failed tasks."""
     status: str = Field(default="error", description="Task status: 'error'")
     task_id: str = Field(..., description="Unique task identifier")
@@ -47,7 +74,7 @@ class ErrorResponse(BaseModel):
     error_type: Optional[str] = Field(default=None, description="Exception type")
 
 
-class StatusResponse(BaseModel):
+class StatusResponse(APIModel):
     """Response model for task status checks."""
     status: str = Field(..., description="Task status: 'queued', 'processing', 'completed', 'failed'")
     task_id: str = Field(..., description="Unique task identifier")
@@ -55,9 +82,25 @@ class StatusResponse(BaseModel):
     progress: Optional[float] = Field(default=None, ge=0.0, le=1.0, description="Task progress (0-1)")
 
 
-class HealthResponse(BaseModel):
+class BatchStatusResponse(APIModel):
+    """Response model for checking several tasks at once."""
+    statuses: List[StatusResponse] = Field(..., description="One status per requested task_id, in request order")
+
+
+class HealthResponse(APIModel):
     """Response model for health check."""
     status: str = Field(default="healthy", description="Service status")
     redis_connected: bool = Field(..., description="Redis connection status")
     model_loaded: bool = Field(default=False, description="Whether model is loaded in worker")
     version: str = Field(default="1.0.0", description="API version")
+
+
+# Build every model's core validator/serializer at import time instead of on
+# first use. model_rebuild() is a no-op for models pydantic already built
+# eagerly, and only does work for one it had to defer.
+for _model in (
+    GenerateRequest, BatchGenerateRequest, TaskResponse, BatchTaskResponse, TaskMetrics,
+    ResultResponse, ErrorResponse, StatusResponse, BatchStatusResponse, HealthResponse
+):
+    _model.model_rebuild()
+del _model
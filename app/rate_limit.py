@@ -1,35 +1,50 @@
 """
 Rate limiting middleware for API endpoints.
-Implements token bucket algorithm for request throttling.
+Implements token bucket algorithm for request throttling, with an optional
+Redis-backed limiter shared by all API processes.
 """
 import time
 import logging
-from typing import Dict, Tuple
-from collections import defaultdict
-from fastapi import HTTPException, Request, status
+from typing import Tuple
+from collections import OrderedDict
+from fastapi import Request, status
 from starlette.middleware.base import BaseHTTPMiddleware
+from app.responses import ORJSONResponse
 
 logger = logging.getLogger(__name__)
 
+# Paths that are never rate limited (health checks and docs)
+_SKIP_PATHS = frozenset({"/", "/health", "/docs", "/redoc", "/openapi.json"})
+
 
 class RateLimiter:
     """
     Token bucket rate limiter.
     
-    Allows burst traffic while maintaining average rate limit.
+    Allows burst traffic while maintaining average rate limit. Buckets hold
+    integer micro-tokens refilled from a monotonic nanosecond clock, and
+    are kept in an LRU map capped at max_keys so unknown or attacker
+    supplied keys cannot grow memory without bound.
     """
     
-    def __init__(self, requests_per_minute: int = 60, burst_size: int = 10):
+    # Micro-tokens per token
+    SCALE = 1_000_000
+    
+    def __init__(self, requests_per_minute: int = 60, burst_size: int = 10, max_keys: int = 10000):
         """
         Initialize rate limiter.
         
         Args:
             requests_per_minute: Maximum requests per minute
             burst_size: Maximum burst size (tokens in bucket)
+            max_keys: Maximum number of buckets kept (least recently used are evicted)
         """
-        self.rate = requests_per_minute / 60.0  # Requests per second
+        self.requests_per_minute = requests_per_minute
         self.burst_size = burst_size
-        self.buckets: Dict[str, Tuple[float, float]] = defaultdict(lambda: (burst_size, time.time()))
+        self.capacity = burst_size * self.SCALE
+        self.max_keys = max_keys
+        # key -> [micro_tokens, last_update_ns], mutated in place
+        self.buckets: "OrderedDict[str, list]" = OrderedDict()
     
     def is_allowed(self, key: str) -> bool:
         """
@@ -41,21 +56,29 @@ class RateLimiter:
         Returns:
             True if request is allowed, False otherwise
         """
-        tokens, last_update = self.buckets[key]
-        now = time.time()
+        now = time.monotonic_ns()
+        bucket = self.buckets.get(key)
         
-        # Add tokens based on time elapsed
-        elapsed = now - last_update
-        tokens = min(self.burst_size, tokens + elapsed * self.rate)
+        if bucket is None:
+            bucket = [self.capacity, now]
+            self.buckets[key] = bucket
+            if len(self.buckets) > self.max_keys:
+                self.buckets.popitem(last=False)
+        else:
+            self.buckets.move_to_end(key)
+        
+        # Add tokens based on time elapsed (rpm/60 tokens/s == rpm/60000 micro-tokens/ns)
+        tokens = min(self.capacity, bucket[0] + (now - bucket[1]) * self.requests_per_minute // 60000)
+        bucket[1] = now
         
-        if tokens >= 1.0:
+        if tokens >= self.SCALE:
             # Allow request and consume token
-            self.buckets[key] = (tokens - 1.0, now)
+            bucket[0] = tokens - self.SCALE
             return True
-        else:
-            # Rate limit exceeded
-            self.buckets[key] = (tokens, now)
-            return False
+        
+        # Rate limit exceeded
+        bucket[0] = tokens
+        return False
     
     def get_retry_after(self, key: str) -> float:
         """
@@ -67,10 +90,95 @@ class RateLimiter:
         Returns:
             Seconds to wait
         """
-        tokens, _ = self.buckets[key]
-        if tokens >= 1.0:
+        bucket = self.buckets.get(key)
+        if bucket is None or bucket[0] >= self.SCALE:
             return 0.0
-        return (1.0 - tokens) / self.rate
+        return (self.SCALE - bucket[0]) * 60 / (self.requests_per_minute * self.SCALE)
+    
+    async def check(self, key: str) -> Tuple[bool, float]:
+        """
+        Check a request and report how long to wait if it is rejected.
+        
+        Args:
+            key: Identifier
+            
+        Returns:
+            Tuple of (allowed, retry_after_seconds)
+        """
+        if self.is_allowed(key):
+            return True, 0.0
+        return False, self.get_retry_after(key)
+
+
+class RedisRateLimiter:
+    """
+    Token bucket rate limiter stored in Redis.
+    
+    Same algorithm as RateLimiter, but the bucket lives in a Redis hash so
+    every API process enforces one shared limit. Each check is a single
+    EVALSHA of a Lua script that refills, consumes and writes back the
+    bucket atomically on the server. Idle buckets expire on their own.
+    """
+    
+    SCRIPT = """
+    local now = tonumber(ARGV[1])
+    local rate = tonumber(ARGV[2])
+    local burst = tonumber(ARGV[3])
+    
+    local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+    local tokens = tonumber(bucket[1]) or burst
+    local ts = tonumber(bucket[2]) or now
+    
+    tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+    
+    local allowed = 0
+    local retry_after = 0
+    if tokens >= 1 then
+        tokens = tokens - 1
+        allowed = 1
+    else
+        retry_after = math.ceil((1 - tokens) / rate)
+    end
+    
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+    redis.call('PEXPIRE', KEYS[1], ARGV[4])
+    return {allowed, retry_after}
+    """
+    
+    def __init__(self, redis_client, requests_per_minute: int = 60, burst_size: int = 10, key_prefix: str = "ratelimit:"):
+        """
+        Initialize rate limiter.
+        
+        Args:
+            redis_client: redis.asyncio client
+            requests_per_minute: Maximum requests per minute
+            burst_size: Maximum burst size (tokens in bucket)
+            key_prefix: Prefix for Redis bucket keys
+        """
+        self.rate = requests_per_minute / 60000.0  # Requests per millisecond
+        self.burst_size = burst_size
+        # Keep idle buckets for twice the time they take to refill completely
+        self.ttl_ms = int(burst_size / self.rate * 2)
+        self.key_prefix = key_prefix
+        # register_script uses EVALSHA and loads the script on first use
+        self._script = redis_client.register_script(self.SCRIPT)
+    
+    async def check(self, key: str) -> Tuple[bool, float]:
+        """
+        Check a request and report how long to wait if it is rejected.
+        
+        Args:
+            key: Identifier (e.g., API key or IP address)
+            
+        Returns:
+            Tuple of (allowed, retry_after_seconds)
+        """
+        now_ms = int(time.time() * 1000)
+        allowed, retry_after_ms = await self._script(
+            keys=[self.key_prefix + key],
+            args=[now_ms, self.rate, self.burst_size, self.ttl_ms]
+        )
+        return bool(allowed), retry_after_ms / 1000.0
 
 
 class RateLimitMiddleware(BaseHTTPMiddleware):
@@ -78,18 +186,24 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
     FastAPI middleware for rate limiting.
     """
     
-    def __init__(self, app, requests_per_minute: int = 60, burst_size: int = 10):
+    def __init__(self, app, requests_per_minute: int = 60, burst_size: int = 10, redis_client=None):
         """
         Initialize middleware.
         
         Args:
             app: FastAPI application
             requests_per_minute: Rate limit per API key
-            burst_size: Burst size
+            burst_size: Burst size (tokens in bucket)
+            redis_client: redis.asyncio client; if given, limits are shared
+                across processes via RedisRateLimiter
         """
         super().__init__(app)
-        self.limiter = RateLimiter(requests_per_minute, burst_size)
+        if redis_client is not None:
+            self.limiter = RedisRateLimiter(redis_client, requests_per_minute, burst_size)
+        else:
+            self.limiter = RateLimiter(requests_per_minute, burst_size)
         self.requests_per_minute = requests_per_minute
+        self.limit_header = str(requests_per_minute)
     
     async def dispatch(self, request: Request, call_next):
         """
@@ -100,27 +214,33 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
             call_next: Next middleware/handler
             
         Returns:
-            HTTP response
-            
-        Raises:
-            HTTPException: If rate limit exceeded
+            HTTP response (429 if rate limit exceeded)
         """
-        # Skip rate limiting for health check and docs
-        if request.url.path in ["/", "/health", "/docs", "/redoc", "/openapi.json"]:
+        # Skip rate limiting for health check and docs (raw scope path avoids building request.url)
+        if request.scope["path"] in _SKIP_PATHS:
             return await call_next(request)
         
         # Get API key from header
         api_key = request.headers.get("X-API-Key", "anonymous")
         
-        # Check rate limit
-        if not self.limiter.is_allowed(api_key):
-            retry_after = self.limiter.get_retry_after(api_key)
-            
+        # Check rate limit (fail open if the limiter backend is unavailable)
+        try:
+            allowed, retry_after = await self.limiter.check(api_key)
+        except Exception as e:
+            logger.warning(f"Rate limiter unavailable, allowing request: {str(e)}")
+            allowed, retry_after = True, 0.0
+        
+        if not allowed:
             logger.warning(f"Rate limit exceeded for key: {api_key[:8]}...")
             
-            raise HTTPException(
+            # Middleware runs outside FastAPI's exception handlers, so build
+            # the 429 here in the same shape as http_exception_handler
+            return ORJSONResponse(
                 status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                detail=f"Rate limit exceeded. Maximum {self.requests_per_minute} requests per minute.",
+                content={
+                    "error": f"Rate limit exceeded. Maximum {self.requests_per_minute} requests per minute.",
+                    "status_code": status.HTTP_429_TOO_MANY_REQUESTS
+                },
                 headers={"Retry-After": str(int(retry_after) + 1)}
             )
         
@@ -128,6 +248,6 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
         response = await call_next(request)
         
         # Add rate limit headers
-        response.headers["X-RateLimit-Limit"] = str(self.requests_per_minute)
+        response.headers["X-RateLimit-Limit"] = self.limit_header
         
         return response
@@ -0,0 +1,22 @@
+"""
+JSON response class encoded with orjson.
+"""
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+
+
+class ORJSONResponse(JSONResponse):
+    """
+    JSONResponse that encodes its content with orjson.
+    
+    Replaces fastapi.responses.ORJSONResponse, which FastAPI now deprecates
+    (a warning on every use). As the app's default_response_class it still
+    leaves FastAPI's own Pydantic fast path in place for routes with a
+    response_model; it only encodes the plain dicts returned elsewhere.
+    """
+    
+    def render(self, content: Any) -> bytes:
+        """Encode content as JSON bytes (non-string dict keys are allowed)."""
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
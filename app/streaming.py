@@ -3,82 +3,330 @@ Streaming utilities for real-time token generation.
 Supports Server-Sent Events (SSE) for streaming responses.
 """
 import asyncio
-import json
 import logging
-from typing import AsyncGenerator, Optional
-from celery.result import AsyncResult
+from typing import AsyncGenerator, List
+import orjson
+from celery import states
 from app.celery_app import celery_app
 
 logger = logging.getLogger(__name__)
 
+# Published on a task's token channel once generation has finished
+STREAM_END = "[END]"
+STREAM_END_BYTES = STREAM_END.encode()
 
-async def stream_task_progress(task_id: str, poll_interval: float = 0.5) -> AsyncGenerator[str, None]:
+
+def _frame(payload: bytes) -> bytes:
+    """Wrap an encoded JSON payload in an SSE data frame."""
+    return b"".join((b"data: ", payload, b"\n\n"))
+
+
+def _sse(data: dict) -> bytes:
     """
-    Stream task progress and result using Server-Sent Events.
+    Encode a dict as an SSE data frame.
+    
+    JSON escapes CR and LF inside strings, so user text can never break
+    the one-line data field.
+    """
+    return _frame(orjson.dumps(data))
+
+
+# Frames that never change, encoded once
+_TASK_QUEUED = _sse({"status": "queued", "message": "Task queued"})
+_WAITING = _sse({"status": "queued", "message": "Waiting in queue"})
+_PROCESSING = _sse({"status": "processing", "message": "Processing request"})
+_TASK_FAILED = _sse({"status": "error", "error_message": "Task failed", "error_type": "TaskFailure"})
+_DONE = b"data: [DONE]\n\n"
+_KEEP_ALIVE = b": keep-alive\n\n"
+
+
+def token_channel(task_id: str) -> str:
+    """
+    Redis Pub/Sub channel that a task publishes its generated tokens to.
+    
+    Each message is a JSON-encoded SSE payload, so the API can forward it
+    to clients without decoding or re-encoding it.
+    """
+    return f"task:{task_id}:stream"
+
+
+def token_payload(text: str) -> bytes:
+    """Encode a chunk of generated text for publishing on a token channel."""
+    return orjson.dumps({"status": "token", "token": text})
+
+
+def meta_key(task_id: str) -> bytes:
+    """
+    Redis key (and channel) holding a task's Celery state and result.
+    
+    The Redis result backend stores the task meta under this key and
+    PUBLISHes every stored state (STARTED, SUCCESS, ...) on a channel of
+    the same name, so subscribers wake up on transitions instead of
+    polling for them.
+    """
+    return celery_app.backend.get_key_for_task(task_id)
+
+
+async def read_task_meta(task_id: str, redis_client) -> dict:
+    """
+    Read a task's state and result straight from the Redis result backend.
+    
+    One async GET plus the backend's own decoding, so nothing blocks the
+    event loop or needs a thread.
     
     Args:
         task_id: Celery task ID
-        poll_interval: Seconds between status checks
-        
-    Yields:
-        SSE formatted messages with task status and progress
+        redis_client: redis.asyncio client (decode_responses=False)
+    
+    Returns:
+        Task meta dict with 'status' and 'result' keys
     """
-    result = AsyncResult(task_id, app=celery_app)
+    payload = await redis_client.get(meta_key(task_id))
+    if payload is None:
+        return {"status": states.PENDING, "result": None}
+    return celery_app.backend.decode_result(payload)
+
+
+async def wait_for_task_meta(task_id: str, redis_client, timeout: float) -> dict:
+    """
+    Wait for a task to finish, for at most timeout seconds.
     
-    # Send initial status
-    yield f"data: {json.dumps({'status': 'queued', 'message': 'Task queued'})}\n\n"
+    Subscribes to the task's result-backend channel and re-reads the meta
+    whenever a state is published, so the caller is answered as soon as
+    the result is stored rather than on its next poll.
     
-    while True:
-        # Check task state
-        if result.state == "PENDING":
-            yield f"data: {json.dumps({'status': 'queued', 'message': 'Waiting in queue'})}\n\n"
-        
-        elif result.state == "STARTED":
-            yield f"data: {json.dumps({'status': 'processing', 'message': 'Processing request'})}\n\n"
+    Args:
+        task_id: Celery task ID
+        redis_client: redis.asyncio client (decode_responses=False)
+        timeout: Maximum seconds to wait
+    
+    Returns:
+        Task meta dict; still unfinished if the timeout ran out
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    
+    pubsub = redis_client.pubsub()
+    await pubsub.subscribe(meta_key(task_id))
+    
+    try:
+        while True:
+            # Read after subscribing so a result stored in between is not missed
+            meta = await read_task_meta(task_id, redis_client)
+            remaining = deadline - loop.time()
+            if meta["status"] in states.READY_STATES or remaining <= 0:
+                return meta
+            await pubsub.get_message(timeout=remaining)
+    finally:
+        await pubsub.unsubscribe()
+        await pubsub.aclose()
+
+
+async def read_task_metas(task_ids: List[str], redis_client) -> List[dict]:
+    """
+    Read several tasks' state and result in one round trip.
+    
+    Each task's meta is a single key, so one MGET covers all of them.
+    
+    Args:
+        task_ids: Celery task IDs
+        redis_client: redis.asyncio client (decode_responses=False)
+    
+    Returns:
+        Task meta dicts in the order of task_ids
+    """
+    payloads = await redis_client.mget([meta_key(task_id) for task_id in task_ids])
+    return [
+        {"status": states.PENDING, "result": None} if payload is None else celery_app.backend.decode_result(payload)
+        for payload in payloads
+    ]
+
+
+async def wait_for_any_task_meta(task_ids: List[str], redis_client, timeout: float) -> List[dict]:
+    """
+    Wait until at least one of several tasks has finished, for at most timeout seconds.
+    
+    Like wait_for_task_meta, but subscribed to every task's result-backend
+    channel, and all metas are re-read (one MGET) whenever a state is
+    published.
+    
+    Args:
+        task_ids: Celery task IDs
+        redis_client: redis.asyncio client (decode_responses=False)
+        timeout: Maximum seconds to wait
+    
+    Returns:
+        Task meta dicts in the order of task_ids
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    
+    pubsub = redis_client.pubsub()
+    await pubsub.subscribe(*[meta_key(task_id) for task_id in task_ids])
+    
+    try:
+        # Read after subscribing so a result stored in between is not missed
+        metas = await read_task_metas(task_ids, redis_client)
+        remaining = deadline - loop.time()
         
-        elif result.state == "SUCCESS":
-            # Task completed - send final result
-            task_result = result.get()
-            
-            if task_result.get("status") == "completed":
-                # Send completion event
-                yield f"data: {json.dumps({'status': 'completed', 'result': task_result.get('result'), 'metrics': task_result.get('metrics')})}\n\n"
-            else:
-                # Send error event
-                yield f"data: {json.dumps({'status': 'error', 'error_message': task_result.get('error_message'), 'error_type': task_result.get('error_type')})}\n\n"
-            
-            # Send done signal
-            yield "data: [DONE]\n\n"
-            break
+        while remaining > 0 and not any(meta["status"] in states.READY_STATES for meta in metas):
+            message = await pubsub.get_message(timeout=remaining)
+            # Subscribe confirmations carry no news
+            if message is None or message["type"] == "message":
+                metas = await read_task_metas(task_ids, redis_client)
+            remaining = deadline - loop.time()
         
-        elif result.state == "FAILURE":
-            # Task failed
-            yield f"data: {json.dumps({'status': 'error', 'error_message': 'Task failed', 'error_type': 'TaskFailure'})}\n\n"
-            yield "data: [DONE]\n\n"
-            break
+        return metas
+    finally:
+        await pubsub.unsubscribe()
+        await pubsub.aclose()
+
+
+def _state_events(meta: dict) -> List[bytes]:
+    """
+    Build the SSE events for a task state.
+    
+    Args:
+        meta: Celery task meta (status and result)
+    
+    Returns:
+        SSE formatted messages; finished states end with [DONE]
+    """
+    state = meta["status"]
+    
+    if state == states.PENDING:
+        return [_WAITING]
+    
+    if state == states.STARTED:
+        return [_PROCESSING]
+    
+    if state == states.SUCCESS:
+        # Task completed - send final result
+        task_result = meta["result"]
         
+        if task_result.get("status") == "completed":
+            # Send completion event
+            event = _sse({"status": "completed", "result": task_result.get("result"), "metrics": task_result.get("metrics")})
         else:
-            # Unknown state
-            yield f"data: {json.dumps({'status': result.state.lower(), 'message': f'Task state: {result.state}'})}\n\n"
+            # Send error event
+            event = _sse({"status": "error", "error_message": task_result.get("error_message"), "error_type": task_result.get("error_type")})
         
-        # Wait before next check
-        await asyncio.sleep(poll_interval)
+        # Send done signal
+        return [event, _DONE]
+    
+    if state in states.READY_STATES:
+        # Task failed or was revoked
+        return [_TASK_FAILED, _DONE]
+    
+    # Unknown state
+    return [_sse({"status": state.lower(), "message": f"Task state: {state}"})]
 
 
-async def stream_tokens(task_id: str) -> AsyncGenerator[str, None]:
+async def _follow_task(
+    task_id: str,
+    redis_client,
+    forward_tokens: bool,
+    watchdog_interval: float
+) -> AsyncGenerator[bytes, None]:
     """
-    Stream generated tokens in real-time (if model supports streaming).
+    Yield SSE events as a task changes state, until it finishes.
     
-    Note: This is a placeholder for future implementation.
-    Current implementation streams the final result when complete.
+    Waits on the task's result-backend channel (and, if forward_tokens is
+    set, its token channel) rather than polling. The state is read once
+    after subscribing, on every state notification, and whenever nothing
+    arrives for watchdog_interval seconds, so a missed notification only
+    delays an event instead of hanging the stream.
     
     Args:
         task_id: Celery task ID
+        redis_client: redis.asyncio client (decode_responses=False)
+        forward_tokens: Also forward messages from the task's token channel
+        watchdog_interval: Seconds without messages before re-reading the state
+    
+    Yields:
+        SSE formatted messages, ending with the result and [DONE]
+    """
+    state_channel = meta_key(task_id)
+    channels = [state_channel, token_channel(task_id).encode()] if forward_tokens else [state_channel]
+    
+    pubsub = redis_client.pubsub()
+    await pubsub.subscribe(*channels)
+    
+    try:
+        last_state = None
+        check_state = True
+        message = None
         
+        while True:
+            if check_state:
+                meta = await read_task_meta(task_id, redis_client)
+                
+                if meta["status"] != last_state:
+                    last_state = meta["status"]
+                    for event in _state_events(meta):
+                        yield event
+                    if last_state in states.READY_STATES:
+                        return
+                elif message is None:
+                    # Keep idle connections (and proxies) from timing out
+                    yield _KEEP_ALIVE
+            
+            message = await pubsub.get_message(timeout=watchdog_interval)
+            
+            if message is not None and message["type"] != "message":
+                # Subscribe confirmations carry no news
+                check_state = False
+            elif message is None or message["channel"] == state_channel:
+                check_state = True
+            else:
+                check_state = False
+                # Token payloads are already JSON; frame them without decoding
+                if message["data"] != STREAM_END_BYTES:
+                    yield _frame(message["data"])
+    finally:
+        await pubsub.unsubscribe()
+        await pubsub.aclose()
+
+
+async def stream_task_progress(task_id: str, redis_client, watchdog_interval: float = 5.0) -> AsyncGenerator[bytes, None]:
+    """
+    Stream task progress and result using Server-Sent Events.
+    
+    Args:
+        task_id: Celery task ID
+        redis_client: redis.asyncio client (decode_responses=False)
+        watchdog_interval: Seconds without notifications before re-checking the task
+    
+    Yields:
+        SSE formatted messages with task status and progress
+    """
+    # Send initial status
+    yield _TASK_QUEUED
+    
+    async for event in _follow_task(task_id, redis_client, False, watchdog_interval):
+        yield event
+
+
+async def stream_tokens(task_id: str, redis_client, watchdog_interval: float = 5.0) -> AsyncGenerator[bytes, None]:
+    """
+    Stream generated tokens in real-time, then the final result.
+    
+    Tokens arrive over the task's Redis Pub/Sub channel (see token_channel)
+    and are forwarded as-is: {"status": "token", "token": "..."}. Tokens
+    generated before the client subscribed are not replayed, but the final
+    'completed' event always carries the full text. Backends that do not
+    publish tokens only send progress events.
+    
+    Args:
+        task_id: Celery task ID
+        redis_client: redis.asyncio client (decode_responses=False)
+        watchdog_interval: Seconds without messages before re-checking the task
+    
     Yields:
-        SSE formatted messages with generated tokens
+        SSE formatted token messages, followed by the final result
     """
-    # For now, use progress streaming
-    # Future: Implement actual token-by-token streaming with model.generate(streamer=...)
-    async for event in stream_task_progress(task_id):
+    # Send initial status
+    yield _TASK_QUEUED
+    
+    async for event in _follow_task(task_id, redis_client, True, watchdog_interval):
         yield event
@@ -1,20 +1,34 @@
 """
 Celery tasks for LLM inference with comprehensive logging and error handling.
 """
+import os
+import copy
 import time
 import logging
+import functools
 import traceback
+import importlib.util
 from pathlib import Path
-from typing import Dict, Any, Optional
-from datetime import datetime
+from typing import Dict, Any, Optional, Tuple
 
+# Let the Rust tokenizer use multiple threads (must be set before it is imported)
+os.environ.setdefault("TOKENIZERS_PARALLELISM", "true")
+
+# Grow CUDA allocations in place instead of carving new blocks for every new
+# sequence length (must be set before torch initializes CUDA)
+os.environ.setdefault("PYTORCH_CUDA_ALLOC_CONF", "expandable_segments:True,max_split_size_mb:256")
+
+import redis
 import torch
-from transformers import AutoModelForCausalLM, AutoTokenizer
+from transformers import AutoModelForCausalLM, AutoTokenizer, BitsAndBytesConfig, GenerationConfig, TextStreamer
 from celery import Task
 from celery.exceptions import SoftTimeLimitExceeded
+from celery.signals import worker_ready
 
-from app.celery_app import celery_app
+from app.celery_app import celery_app, forks_pool_processes
 from app.config import settings
+from app.log_writer import ERROR_LOG, REQUEST_BINARY_LOG, REQUEST_LOG, format_timestamp, log_writer, pack_request_record, sample_request_log
+from app.streaming import STREAM_END_BYTES, token_channel, token_payload
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -23,6 +37,34 @@ logger = logging.getLogger(__name__)
 _model = None
 _tokenizer = None
 _model_loaded = False
+_model_compiled = False
+_draft_model = None
+
+# Static KV-cache lengths; rounding up keeps compiled shapes (and CUDA graphs) reusable
+CACHE_LENGTH_BUCKETS = (64, 128, 256, 512, 1024, 2048)
+
+# Older transformers releases have no max_cache_len generation option and
+# reject it as an unused model kwarg, so TORCH_COMPILE is skipped there
+STATIC_CACHE_SIZING = hasattr(GenerationConfig(), "max_cache_len")
+
+# Sequence lengths run through the model at warm-up so the CUDA caching
+# allocator reserves the peak working set before real requests arrive
+WARMUP_LENGTHS = (128, 512, 2048)
+
+# Text request log lines (LOG_FORMAT=text): completed tasks report token
+# counts, failed ones an optional error message
+SUCCESS_LINE = (
+    "[{timestamp}] task_id={task_id} status={status} "
+    "prompt_tokens={prompt_tokens} completion_tokens={completion_tokens} tokens_per_sec={tokens_per_sec:.2f} "
+    "queue_wait={queue_wait:.2f}s processing_time={processing_time:.2f}s total_time={total_time:.2f}s\n"
+)
+ERROR_LINE = (
+    "[{timestamp}] task_id={task_id} status={status} "
+    "queue_wait={queue_wait:.2f}s processing_time={processing_time:.2f}s total_time={total_time:.2f}s{error}\n"
+)
+
+# Redis client for publishing streamed tokens (created on first use)
+_redis_client = None
 
 
 class ModelLoadError(Exception):
@@ -30,6 +72,63 @@ class ModelLoadError(Exception):
     pass
 
 
+def _pin_to_numa_node(node: int):
+    """
+    Restrict this worker process to the CPUs of one NUMA node.
+    
+    Memory binding is not available from Python; launch the worker under
+    `numactl --cpunodebind=N --membind=N` for that.
+    
+    Args:
+        node: NUMA node number
+    """
+    cpulist = Path(f"/sys/devices/system/node/node{node}/cpulist").read_text().strip()
+    cpus = set()
+    for part in cpulist.split(","):
+        first, _, last = part.partition("-")
+        cpus.update(range(int(first), int(last or first) + 1))
+    os.sched_setaffinity(0, cpus)
+    logger.info(f"Pinned worker to NUMA node {node} (CPUs {cpulist})")
+
+
+def get_redis_client() -> redis.Redis:
+    """Get or create the worker's Redis client for token publishing."""
+    global _redis_client
+    if _redis_client is None:
+        _redis_client = redis.Redis.from_url(settings.redis_url)
+    return _redis_client
+
+
+class RedisTokenStreamer(TextStreamer):
+    """
+    Publish decoded text to the task's Redis channel as it is generated.
+    
+    Messages are pre-encoded SSE payloads so /stream can forward them
+    unchanged. Publishing is best-effort: a Redis error stops streaming
+    for this task but never fails generation.
+    """
+    
+    def __init__(self, tokenizer, task_id: str):
+        super().__init__(tokenizer, skip_prompt=True, skip_special_tokens=True)
+        self.channel = token_channel(task_id)
+        self.enabled = True
+    
+    def _publish(self, message: bytes):
+        if not self.enabled:
+            return
+        try:
+            get_redis_client().publish(self.channel, message)
+        except Exception as e:
+            logger.warning(f"Token streaming disabled for {self.channel}: {str(e)}")
+            self.enabled = False
+    
+    def on_finalized_text(self, text: str, stream_end: bool = False):
+        if text:
+            self._publish(token_payload(text))
+        if stream_end:
+            self._publish(STREAM_END_BYTES)
+
+
 def get_model_and_tokenizer():
     """
     Load and cache the LLM model and tokenizer.
@@ -41,7 +140,7 @@ def get_model_and_tokenizer():
     Raises:
         ModelLoadError: If model fails to load
     """
-    global _model, _tokenizer, _model_loaded
+    global _model, _tokenizer, _model_loaded, _model_compiled, _draft_model
     
     if _model_loaded and _model is not None and _tokenizer is not None:
         return _model, _tokenizer
@@ -50,6 +149,9 @@ def get_model_and_tokenizer():
         logger.info(f"Loading model: {settings.model_name}")
         logger.info(f"Device: {settings.model_device}")
         
+        if settings.worker_numa_node is not None:
+            _pin_to_numa_node(settings.worker_numa_node)
+        
         # Determine device
         if settings.model_device == "cuda" and not torch.cuda.is_available():
             logger.warning("CUDA requested but not available, falling back to CPU")
@@ -61,8 +163,11 @@ def get_model_and_tokenizer():
         logger.info("Loading tokenizer...")
         _tokenizer = AutoTokenizer.from_pretrained(
             settings.model_name,
-            trust_remote_code=True
+            trust_remote_code=True,
+            use_fast=True
         )
+        if not _tokenizer.is_fast:
+            raise ModelLoadError(f"No fast (Rust) tokenizer available for {settings.model_name}")
         
         # Ensure tokenizer has pad token
         if _tokenizer.pad_token is None:
@@ -77,20 +182,70 @@ def get_model_and_tokenizer():
         
         # Configure device and quantization
         if device == "cuda":
-            if settings.use_quantization:
-                logger.info("Using 4-bit quantization")
-                load_kwargs["device_map"] = "auto"
-                load_kwargs["load_in_4bit"] = True
+            load_kwargs["device_map"] = "auto"
+            torch.backends.cuda.matmul.allow_tf32 = True
+            
+            # FlashAttention-2 needs Ampere (SM80) or newer; bf16 gets its best range on Hopper
+            major, _ = torch.cuda.get_device_capability()
+            compute_dtype = torch.bfloat16 if major >= 9 else torch.float16
+            if major >= 8 and importlib.util.find_spec("flash_attn") is not None:
+                load_kwargs["attn_implementation"] = "flash_attention_2"
             else:
-                load_kwargs["device_map"] = "auto"
+                load_kwargs["attn_implementation"] = "sdpa"
+            logger.info(f"Attention implementation: {load_kwargs['attn_implementation']}")
+            
+            quantization = settings.quantization
+            logger.info(f"Weight format: {quantization}")
+            if quantization == "nf4":
+                # Decode reads every weight once per token, so 4-bit weights cut that traffic ~4x
+                load_kwargs["quantization_config"] = BitsAndBytesConfig(
+                    load_in_4bit=True,
+                    bnb_4bit_quant_type="nf4",
+                    bnb_4bit_compute_dtype=compute_dtype,
+                    bnb_4bit_use_double_quant=True
+                )
+                load_kwargs["torch_dtype"] = compute_dtype
+            elif quantization == "int8":
+                load_kwargs["quantization_config"] = BitsAndBytesConfig(load_in_8bit=True)
                 load_kwargs["torch_dtype"] = torch.float16
+            elif quantization == "awq":
+                # AWQ checkpoints carry their own quantization_config; their kernels are fp16
+                load_kwargs["torch_dtype"] = torch.float16
+            elif quantization == "fp16":
+                load_kwargs["torch_dtype"] = compute_dtype
+            else:
+                raise ValueError(f"Unknown quantization mode: {quantization}")
         else:
             load_kwargs["device_map"] = "cpu"
         
         _model = AutoModelForCausalLM.from_pretrained(**load_kwargs)
         
-        # Set to eval mode
+        # Set to eval mode; the worker never trains, so drop autograd bookkeeping
+        # (every forward pass also runs under torch.inference_mode())
         _model.eval()
+        _model.requires_grad_(False)
+        
+        if device == "cuda" and settings.torch_compile and not STATIC_CACHE_SIZING:
+            logger.warning("TORCH_COMPILE needs a transformers release with max_cache_len support; running uncompiled")
+        elif device == "cuda" and settings.torch_compile:
+            # A static KV cache gives every decode step the same shapes, so the
+            # compiled forward can replay one captured CUDA graph per token
+            logger.info("Compiling model with static KV cache")
+            _model.generation_config.cache_implementation = "static"
+            _model.forward = torch.compile(_model.forward, mode="reduce-overhead", fullgraph=True, dynamic=False)
+            _model_compiled = True
+        
+        if settings.draft_model_name:
+            if _model_compiled:
+                logger.warning("DRAFT_MODEL_NAME is ignored with TORCH_COMPILE (static cache)")
+            else:
+                # Small model from the same family (shared tokenizer) that proposes
+                # tokens for the main model to verify in one forward pass
+                logger.info(f"Loading draft model: {settings.draft_model_name}")
+                load_kwargs["pretrained_model_name_or_path"] = settings.draft_model_name
+                _draft_model = AutoModelForCausalLM.from_pretrained(**load_kwargs)
+                _draft_model.eval()
+                _draft_model.requires_grad_(False)
         
         _model_loaded = True
         logger.info(f"Model loaded successfully on {device}")
@@ -109,6 +264,118 @@ def get_model_and_tokenizer():
         raise ModelLoadError(f"Failed to load model: {str(e)}")
 
 
+@functools.lru_cache(maxsize=1024)
+def _encode_prompt(prompt: str) -> Tuple[int, ...]:
+    """
+    Tokenize a prompt, caching the result for repeated prompts.
+    
+    A single prompt is never padded, so only the ids are kept; the
+    attention mask is all ones. Returns a plain tuple rather than a
+    tensor so the cache never pins device memory.
+    
+    Returns:
+        Token ids, truncated to MAX_PROMPT_TOKENS (or the tokenizer limit)
+    """
+    encoded = _tokenizer(
+        prompt,
+        truncation=True,
+        max_length=settings.max_prompt_tokens,
+        add_special_tokens=True,
+        return_attention_mask=False
+    )
+    return tuple(encoded["input_ids"])
+
+
+@functools.lru_cache(maxsize=64)
+def _make_gen_config(temperature: float, top_p: float, max_tokens: int, pad_id: Optional[int], eos_id: Optional[int]) -> GenerationConfig:
+    """
+    Build the sampling configuration for a parameter set, once.
+    
+    Starts from the model's own generation config so settings applied at
+    load time (static cache, special tokens) still apply. Callers round
+    temperature and top_p so near-identical requests share an entry.
+    """
+    config = copy.deepcopy(_model.generation_config)
+    config.update(
+        max_new_tokens=max_tokens,
+        temperature=temperature,
+        top_p=top_p,
+        do_sample=True,
+        pad_token_id=pad_id,
+        eos_token_id=eos_id
+    )
+    return config
+
+
+def _cache_length_bucket(length: int) -> int:
+    """Round a sequence length up to the nearest static cache bucket."""
+    for bucket in CACHE_LENGTH_BUCKETS:
+        if length <= bucket:
+            return bucket
+    return length
+
+
+def warm_up_model():
+    """
+    Load the model, run a short generation and pre-size GPU memory.
+    
+    Moves model loading (and, with TORCH_COMPILE, CUDA graph capture) out
+    of the first real request. On CUDA it also runs the model once per
+    WARMUP_LENGTHS entry so later requests reuse cached allocations.
+    Failures are logged and left for that request to report.
+    """
+    start_time = time.time()
+    try:
+        model, tokenizer = get_model_and_tokenizer()
+        inputs = tokenizer("Hello", return_tensors="pt").to(next(model.parameters()).device)
+        
+        generate_kwargs = {}
+        if _model_compiled:
+            generate_kwargs["max_cache_len"] = _cache_length_bucket(inputs["input_ids"].shape[1] + 8)
+        
+        with torch.inference_mode():
+            model.generate(
+                **inputs,
+                max_new_tokens=8,
+                do_sample=False,
+                pad_token_id=tokenizer.pad_token_id,
+                **generate_kwargs
+            )
+        
+        device = next(model.parameters()).device
+        if device.type == "cuda" and not _model_compiled:
+            # One forward pass per length reserves the allocator's peak working set
+            # (compiled models keep their own CUDA graph memory pool instead)
+            max_length = min(getattr(model.config, "max_position_embeddings", 2048), tokenizer.model_max_length)
+            for length in WARMUP_LENGTHS:
+                length = min(length, max_length)
+                with torch.inference_mode():
+                    model(input_ids=torch.full((1, length), tokenizer.pad_token_id, device=device))
+            logger.info(f"GPU memory reserved after warm-up: {torch.cuda.memory_reserved() / 1024**3:.2f}GB")
+        
+        logger.info(f"Model warmed up in {time.time() - start_time:.2f}s")
+    except Exception as e:
+        logger.warning(f"Model warm-up failed: {str(e)}")
+
+
+@worker_ready.connect
+def _warm_up_on_worker_ready(sender=None, **kwargs):
+    """
+    Pre-load the model when a worker starts with the transformers backend.
+    
+    Only solo and threads pools run tasks in the process that receives
+    worker_ready. Prefork children load the model on their first task
+    instead: worker_process_init must finish within
+    worker_proc_alive_timeout (4s by default), far less than a model load.
+    """
+    if settings.model_backend != "transformers" or not settings.model_warmup:
+        return
+    if forks_pool_processes(sender):
+        logger.info("Skipping model warm-up: prefork children load the model on their first task")
+        return
+    warm_up_model()
+
+
 def log_request_metrics(
     task_id: str,
     status: str,
@@ -117,7 +384,8 @@ def log_request_metrics(
     end_time: float,
     prompt_tokens: Optional[int] = None,
     completion_tokens: Optional[int] = None,
-    error_message: Optional[str] = None
+    error_message: Optional[str] = None,
+    backend: str = "transformers"
 ):
     """
     Log request metrics to llm_requests.log in human-readable format.
@@ -131,50 +399,44 @@ def log_request_metrics(
         prompt_tokens: Number of input tokens
         completion_tokens: Number of output tokens
         error_message: Error message if failed
+        backend: Backend that served the request (recorded in binary logs)
     """
-    log_dir = Path(settings.log_dir)
-    log_file = log_dir / "llm_requests.log"
+    if settings.log_format == "binary":
+        # Fixed-size record; skips all timestamp and string formatting
+        log_writer.write(REQUEST_BINARY_LOG, pack_request_record(
+            task_id, status, enqueue_time, start_time, end_time,
+            prompt_tokens, completion_tokens, error_message, backend
+        ))
+        return
     
-    # Calculate metrics
-    queue_wait = start_time - enqueue_time
     processing_time = end_time - start_time
-    total_time = end_time - enqueue_time
-    
-    # Format timestamp
-    timestamp = datetime.fromtimestamp(end_time).strftime('%Y-%m-%d %H:%M:%S')
-    
-    # Build log entry
-    log_parts = [
-        f"[{timestamp}]",
-        f"task_id={task_id}",
-        f"status={status}",
-    ]
-    
-    if prompt_tokens is not None:
-        log_parts.append(f"prompt_tokens={prompt_tokens}")
+    durations = {
+        "queue_wait": start_time - enqueue_time,
+        "processing_time": processing_time,
+        "total_time": end_time - enqueue_time,
+    }
     
     if completion_tokens is not None:
-        log_parts.append(f"completion_tokens={completion_tokens}")
-        
-        # Calculate tokens per second
-        if processing_time > 0:
-            tokens_per_sec = completion_tokens / processing_time
-            log_parts.append(f"tokens_per_sec={tokens_per_sec:.2f}")
-    
-    log_parts.extend([
-        f"queue_wait={queue_wait:.2f}s",
-        f"processing_time={processing_time:.2f}s",
-        f"total_time={total_time:.2f}s",
-    ])
-    
-    if error_message:
-        log_parts.append(f"error_message=\"{error_message}\"")
-    
-    log_entry = " ".join(log_parts) + "\n"
+        log_entry = SUCCESS_LINE.format(
+            timestamp=format_timestamp(end_time),
+            task_id=task_id,
+            status=status,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            tokens_per_sec=completion_tokens / processing_time if processing_time > 0 else 0,
+            **durations
+        )
+    else:
+        log_entry = ERROR_LINE.format(
+            timestamp=format_timestamp(end_time),
+            task_id=task_id,
+            status=status,
+            error=f" error_message=\"{error_message}\"" if error_message else "",
+            **durations
+        )
     
-    # Write to log file
-    with open(log_file, "a", encoding="utf-8") as f:
-        f.write(log_entry)
+    # Hand off to the background writer
+    log_writer.write(REQUEST_LOG, log_entry)
     
     logger.info(f"Request metrics logged: {task_id} - {status}")
 
@@ -187,10 +449,7 @@ def log_error_traceback(task_id: str, error: Exception):
         task_id: Unique task identifier
         error: Exception that occurred
     """
-    log_dir = Path(settings.log_dir)
-    error_log = log_dir / "errors.log"
-    
-    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    timestamp = format_timestamp(time.time())
     
     error_entry = (
         f"\n{'='*80}\n"
@@ -202,8 +461,7 @@ def log_error_traceback(task_id: str, error: Exception):
         f"{'='*80}\n"
     )
     
-    with open(error_log, "a", encoding="utf-8") as f:
-        f.write(error_entry)
+    log_writer.write(ERROR_LOG, error_entry)
     
     logger.error(f"Error traceback logged for task {task_id}")
 
@@ -274,11 +532,13 @@ def generate_text(
         
         # Tokenize input
         logger.info("Tokenizing input...")
-        inputs = tokenizer(prompt, return_tensors="pt", padding=True, truncation=True)
+        input_ids = torch.tensor([_encode_prompt(prompt)], device=next(model.parameters()).device)
         
-        # Move to device
-        device = next(model.parameters()).device
-        inputs = {k: v.to(device) for k, v in inputs.items()}
+        # Unpadded single prompt: every position is attended to
+        inputs = {
+            "input_ids": input_ids,
+            "attention_mask": torch.ones_like(input_ids),
+        }
         
         prompt_tokens = inputs["input_ids"].shape[1]
         logger.info(f"Prompt tokens: {prompt_tokens}")
@@ -287,28 +547,36 @@ def generate_text(
         logger.info("Generating text...")
         generation_start = time.time()
         
-        with torch.no_grad():
+        generation_config = _make_gen_config(
+            round(temperature, 2),
+            round(top_p, 2),
+            max_tokens,
+            tokenizer.pad_token_id,
+            tokenizer.eos_token_id
+        )
+        
+        generate_kwargs = {}
+        if _model_compiled:
+            # Size the static cache to a bucket so new lengths rarely recompile
+            generate_kwargs["max_cache_len"] = _cache_length_bucket(prompt_tokens + max_tokens)
+        if _draft_model is not None:
+            # Speculative decoding: same output distribution, fewer full-model steps
+            generate_kwargs["assistant_model"] = _draft_model
+            generate_kwargs["num_assistant_tokens"] = settings.num_assistant_tokens
+        
+        with torch.inference_mode():
             outputs = model.generate(
                 **inputs,
-                max_new_tokens=max_tokens,
-                temperature=temperature,
-                top_p=top_p,
-                do_sample=True,
-                pad_token_id=tokenizer.pad_token_id,
-                eos_token_id=tokenizer.eos_token_id,
+                generation_config=generation_config,
+                streamer=RedisTokenStreamer(tokenizer, task_id),
+                **generate_kwargs
             )
         
         generation_end = time.time()
         logger.info(f"Generation completed in {generation_end - generation_start:.2f}s")
         
-        # Decode output
-        generated_text = tokenizer.decode(outputs[0], skip_special_tokens=True)
-        
-        # Remove the prompt from output (only return generated part)
-        if generated_text.startswith(prompt):
-            result_text = generated_text[len(prompt):].strip()
-        else:
-            result_text = generated_text
+        # Decode only the generated tokens (outputs start with the prompt ids)
+        result_text = tokenizer.decode(outputs[0, prompt_tokens:], skip_special_tokens=True).strip()
         
         completion_tokens = outputs.shape[1] - prompt_tokens
         
@@ -323,16 +591,17 @@ def generate_text(
         logger.info(f"Task {task_id} completed successfully")
         logger.info(f"Generated {completion_tokens} tokens in {processing_time:.2f}s ({tokens_per_second:.2f} tokens/s)")
         
-        # Log metrics
-        log_request_metrics(
-            task_id=task_id,
-            status="success",
-            enqueue_time=enqueue_time,
-            start_time=start_time,
-            end_time=end_time,
-            prompt_tokens=prompt_tokens,
-            completion_tokens=completion_tokens
-        )
+        # Log metrics (successes may be sampled, see LOG_SAMPLE_RATE)
+        if sample_request_log(processing_time):
+            log_request_metrics(
+                task_id=task_id,
+                status="success",
+                enqueue_time=enqueue_time,
+                start_time=start_time,
+                end_time=end_time,
+                prompt_tokens=prompt_tokens,
+                completion_tokens=completion_tokens
+            )
         
         return {
             "status": "completed",
@@ -2,27 +2,81 @@
 Celery tasks for Ollama LLM inference.
 """
 import time
+import hashlib
 import logging
 import traceback
+import orjson
+import redis
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from typing import Dict, Any, Optional
-from datetime import datetime
-from pathlib import Path
 
 from celery import Task
 from celery.exceptions import SoftTimeLimitExceeded
+from celery.signals import worker_ready
 
 from app.celery_app import celery_app
 from app.config import settings
+from app.log_writer import ERROR_LOG, REQUEST_BINARY_LOG, REQUEST_LOG, format_timestamp, log_writer, pack_request_record, sample_request_log
+from app.streaming import STREAM_END_BYTES, token_channel, token_payload
 
 logger = logging.getLogger(__name__)
 
+# Text request log lines (LOG_FORMAT=text): completed tasks report token
+# counts, failed ones an optional error message
+SUCCESS_LINE = (
+    "[{timestamp}] task_id={task_id} backend=ollama model={model} status={status} "
+    "prompt_tokens={prompt_tokens} completion_tokens={completion_tokens} tokens_per_sec={tokens_per_sec:.2f} "
+    "queue_wait={queue_wait:.2f}s processing_time={processing_time:.2f}s total_time={total_time:.2f}s\n"
+)
+ERROR_LINE = (
+    "[{timestamp}] task_id={task_id} backend=ollama model={model} status={status} "
+    "queue_wait={queue_wait:.2f}s processing_time={processing_time:.2f}s total_time={total_time:.2f}s{error}\n"
+)
+
+# Keep-alive connections to Ollama, reused by every task in the worker.
+# Only connection failures and gateway errors are retried: a read timeout
+# means the model is still generating, and resending would start it again.
+_session = requests.Session()
+_session.mount("http://", HTTPAdapter(
+    pool_connections=16,
+    pool_maxsize=64,
+    max_retries=Retry(
+        total=3,
+        read=False,
+        backoff_factor=0.2,
+        status_forcelist=[502, 503, 504],
+        allowed_methods=frozenset({"GET", "POST"}),
+        raise_on_status=False
+    )
+))
+_session.mount("https://", _session.get_adapter("http://"))
+
+# Payloads are serialized with orjson and sent as raw bytes
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+# Generate endpoint and the request fields every call shares, built once
+_GENERATE_URL = f"{settings.ollama_base_url}/api/generate"
+_PAYLOAD_TEMPLATE = {"model": settings.ollama_model, "stream": True}
+
+# Redis client for publishing streamed tokens (created on first use)
+_redis_client = None
+
 
 class OllamaError(Exception):
     """Raised when Ollama API fails."""
     pass
 
 
+def get_redis_client() -> redis.Redis:
+    """Get or create the worker's Redis client for token publishing."""
+    global _redis_client
+    if _redis_client is None:
+        _redis_client = redis.Redis.from_url(settings.redis_url)
+    return _redis_client
+
+
 def log_request_metrics(
     task_id: str,
     status: str,
@@ -34,55 +88,50 @@ def log_request_metrics(
     error_message: Optional[str] = None
 ):
     """Log request metrics to llm_requests.log."""
-    log_dir = Path(settings.log_dir)
-    log_file = log_dir / "llm_requests.log"
+    if settings.log_format == "binary":
+        # Fixed-size record; skips all timestamp and string formatting
+        log_writer.write(REQUEST_BINARY_LOG, pack_request_record(
+            task_id, status, enqueue_time, start_time, end_time,
+            prompt_tokens, completion_tokens, error_message, backend="ollama"
+        ))
+        return
     
-    queue_wait = start_time - enqueue_time
     processing_time = end_time - start_time
-    total_time = end_time - enqueue_time
-    
-    timestamp = datetime.fromtimestamp(end_time).strftime('%Y-%m-%d %H:%M:%S')
-    
-    log_parts = [
-        f"[{timestamp}]",
-        f"task_id={task_id}",
-        f"backend=ollama",
-        f"model={settings.ollama_model}",
-        f"status={status}",
-    ]
-    
-    if prompt_tokens is not None:
-        log_parts.append(f"prompt_tokens={prompt_tokens}")
+    durations = {
+        "queue_wait": start_time - enqueue_time,
+        "processing_time": processing_time,
+        "total_time": end_time - enqueue_time,
+    }
     
     if completion_tokens is not None:
-        log_parts.append(f"completion_tokens={completion_tokens}")
-        if processing_time > 0:
-            tokens_per_sec = completion_tokens / processing_time
-            log_parts.append(f"tokens_per_sec={tokens_per_sec:.2f}")
-    
-    log_parts.extend([
-        f"queue_wait={queue_wait:.2f}s",
-        f"processing_time={processing_time:.2f}s",
-        f"total_time={total_time:.2f}s",
-    ])
-    
-    if error_message:
-        log_parts.append(f"error_message=\"{error_message}\"")
-    
-    log_entry = " ".join(log_parts) + "\n"
+        log_entry = SUCCESS_LINE.format(
+            timestamp=format_timestamp(end_time),
+            task_id=task_id,
+            model=settings.ollama_model,
+            status=status,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            tokens_per_sec=completion_tokens / processing_time if processing_time > 0 else 0,
+            **durations
+        )
+    else:
+        log_entry = ERROR_LINE.format(
+            timestamp=format_timestamp(end_time),
+            task_id=task_id,
+            model=settings.ollama_model,
+            status=status,
+            error=f" error_message=\"{error_message}\"" if error_message else "",
+            **durations
+        )
     
-    with open(log_file, "a", encoding="utf-8") as f:
-        f.write(log_entry)
+    log_writer.write(REQUEST_LOG, log_entry)
     
     logger.info(f"Request metrics logged: {task_id} - {status}")
 
 
 def log_error_traceback(task_id: str, error: Exception):
     """Log detailed error traceback to errors.log."""
-    log_dir = Path(settings.log_dir)
-    error_log = log_dir / "errors.log"
-    
-    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    timestamp = format_timestamp(time.time())
     
     error_entry = (
         f"\n{'='*80}\n"
@@ -94,26 +143,44 @@ def log_error_traceback(task_id: str, error: Exception):
         f"{'='*80}\n"
     )
     
-    with open(error_log, "a", encoding="utf-8") as f:
-        f.write(error_entry)
+    log_writer.write(ERROR_LOG, error_entry)
     
     logger.error(f"Error traceback logged for task {task_id}")
 
 
+def log_error_brief(task_id: str, error: Exception):
+    """
+    Log a one-line error entry to errors.log.
+    
+    For expected failures (Ollama unreachable, timeouts) whose traceback
+    adds nothing; formatting one walks every frame, which gets costly
+    exactly when Ollama is flapping and every task fails.
+    """
+    error_entry = f"[{format_timestamp(time.time())}] ERROR - Task {task_id} failed (Ollama): {type(error).__name__}: {str(error)}\n"
+    
+    log_writer.write(ERROR_LOG, error_entry)
+
+
 def call_ollama_api(
     prompt: str,
     max_tokens: int = 512,
     temperature: float = 0.7,
-    top_p: float = 0.9
+    top_p: float = 0.9,
+    task_id: Optional[str] = None
 ) -> Dict[str, Any]:
     """
     Call Ollama API to generate text.
     
+    The response is streamed: text is published to the task's token
+    channel as Ollama produces it, and leaving early (e.g. on the soft
+    time limit) closes the connection so Ollama stops generating.
+    
     Args:
         prompt: Input text prompt
         max_tokens: Maximum tokens to generate
         temperature: Sampling temperature
         top_p: Nucleus sampling parameter
+        task_id: Task whose token channel receives the text (None to skip)
         
     Returns:
         Dict with response and token counts
@@ -121,12 +188,11 @@ def call_ollama_api(
     Raises:
         OllamaError: If API call fails
     """
-    url = f"{settings.ollama_base_url}/api/generate"
+    url = _GENERATE_URL
     
     payload = {
-        "model": settings.ollama_model,
+        **_PAYLOAD_TEMPLATE,
         "prompt": prompt,
-        "stream": False,
         "options": {
             "num_predict": max_tokens,
             "temperature": temperature,
@@ -138,15 +204,42 @@ def call_ollama_api(
         logger.info(f"Calling Ollama API: {url}")
         logger.info(f"Model: {settings.ollama_model}")
         
-        response = requests.post(url, json=payload, timeout=settings.task_time_limit)
-        response.raise_for_status()
+        channel = token_channel(task_id) if task_id else None
+        response_parts = []
+        thinking_parts = []
+        data = {}
+        
+        with _session.post(url, data=orjson.dumps(payload), headers=_JSON_HEADERS, stream=True, timeout=settings.task_time_limit) as response:
+            response.raise_for_status()
+            
+            # One JSON object per line; the last one has done=true and the counts
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                data = orjson.loads(line)
+                
+                if data.get("error"):
+                    raise OllamaError(f"Ollama API error: {data['error']}")
+                
+                if data.get("thinking"):
+                    thinking_parts.append(data["thinking"])
+                
+                text = data.get("response")
+                if text:
+                    response_parts.append(text)
+                    if channel:
+                        channel = _publish(channel, token_payload(text))
+                
+                if data.get("done"):
+                    break
         
-        data = response.json()
+        if channel:
+            _publish(channel, STREAM_END_BYTES)
         
         # Handle thinking models (like qwen3) that return response in 'thinking' field
-        response_text = data.get("response", "")
-        if not response_text and data.get("thinking"):
-            response_text = data.get("thinking", "")
+        response_text = "".join(response_parts)
+        if not response_text and thinking_parts:
+            response_text = "".join(thinking_parts)
         
         return {
             "response": response_text,
@@ -155,6 +248,8 @@ def call_ollama_api(
             "total_duration": data.get("total_duration", 0) / 1e9,  # Convert to seconds
         }
         
+    except OllamaError:
+        raise
     except requests.exceptions.Timeout:
         raise OllamaError(f"Ollama API timeout after {settings.task_time_limit}s")
     except requests.exceptions.ConnectionError:
@@ -165,6 +260,86 @@ def call_ollama_api(
         raise OllamaError(f"Ollama API call failed: {str(e)}")
 
 
+def _publish(channel: str, message: bytes) -> Optional[str]:
+    """
+    Publish to a token channel, best-effort.
+    
+    Returns:
+        The channel, or None once publishing failed (streaming stops for the task)
+    """
+    try:
+        get_redis_client().publish(channel, message)
+        return channel
+    except Exception as e:
+        logger.warning(f"Token streaming disabled for {channel}: {str(e)}")
+        return None
+
+
+def _response_cache_key(prompt: str, max_tokens: int, temperature: float, top_p: float) -> Optional[str]:
+    """
+    Redis key under which a request's response is cached.
+    
+    Returns:
+        The key, or None when the cache is disabled or the request samples
+        too randomly for a stored answer to stand in for a new one
+    """
+    if settings.response_cache_ttl <= 0 or temperature > settings.response_cache_max_temperature:
+        return None
+    
+    request_key = f"{settings.ollama_model}|{max_tokens}|{temperature}|{top_p}|{prompt}"
+    return "llmcache:" + hashlib.blake2b(request_key.encode(), digest_size=16).hexdigest()
+
+
+def get_cached_response(cache_key: str) -> Optional[Dict[str, Any]]:
+    """Return a cached call_ollama_api() result, or None (also if Redis fails)."""
+    try:
+        cached = get_redis_client().get(cache_key)
+    except Exception as e:
+        logger.warning(f"Response cache lookup failed: {str(e)}")
+        return None
+    return orjson.loads(cached) if cached is not None else None
+
+
+def cache_response(cache_key: str, result: Dict[str, Any]):
+    """Store a call_ollama_api() result for RESPONSE_CACHE_TTL seconds (best-effort)."""
+    try:
+        get_redis_client().setex(cache_key, settings.response_cache_ttl, orjson.dumps(result))
+    except Exception as e:
+        logger.warning(f"Response cache store failed: {str(e)}")
+
+
+def warm_up_ollama():
+    """
+    Send a one-token request so Ollama loads the model before real traffic.
+    
+    Without this the first task after startup pays the full model load
+    time. Failures are logged and ignored; tasks will load it on demand.
+    """
+    url = _GENERATE_URL
+    payload = {
+        "model": settings.ollama_model,
+        "prompt": ".",
+        "stream": False,
+        "options": {"num_predict": 1}
+    }
+    
+    try:
+        logger.info(f"Warming up Ollama model: {settings.ollama_model}")
+        start_time = time.time()
+        response = _session.post(url, data=orjson.dumps(payload), headers=_JSON_HEADERS, timeout=settings.task_time_limit)
+        response.raise_for_status()
+        logger.info(f"Ollama model warmed up in {time.time() - start_time:.2f}s")
+    except Exception as e:
+        logger.warning(f"Ollama warm-up failed: {str(e)}")
+
+
+@worker_ready.connect
+def _warm_up_on_worker_ready(**kwargs):
+    """Pre-load the Ollama model when a worker starts with the Ollama backend."""
+    if settings.model_backend == "ollama" and settings.ollama_warmup:
+        warm_up_ollama()
+
+
 @celery_app.task(bind=True, name="app.tasks.ollama_inference.generate_text_ollama")
 def generate_text_ollama(
     self: Task,
@@ -189,6 +364,9 @@ def generate_text_ollama(
     """
     task_id = self.request.id
     start_time = time.time()
+    # Durations come from the monotonic clock; logged end times are start_time
+    # plus the monotonic duration so a wall-clock step cannot skew them
+    start_ns = time.monotonic_ns()
     
     if enqueue_time is None:
         enqueue_time = start_time
@@ -197,20 +375,30 @@ def generate_text_ollama(
     logger.info(f"Prompt length: {len(prompt)} characters")
     
     try:
-        # Call Ollama API
-        result = call_ollama_api(
-            prompt=prompt,
-            max_tokens=max_tokens,
-            temperature=temperature,
-            top_p=top_p
-        )
+        # Identical deterministic requests reuse the stored response
+        cache_key = _response_cache_key(prompt, max_tokens, temperature, top_p)
+        result = get_cached_response(cache_key) if cache_key else None
+        cache_hit = result is not None
         
-        end_time = time.time()
+        if cache_hit:
+            logger.info(f"Task {task_id} served from the response cache")
+        else:
+            # Call Ollama API
+            result = call_ollama_api(
+                prompt=prompt,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                top_p=top_p,
+                task_id=task_id
+            )
+            if cache_key:
+                cache_response(cache_key, result)
         
-        # Calculate metrics
+        # Calculate metrics (end_time is derived so logged durations match them)
         queue_wait_time = start_time - enqueue_time
-        processing_time = end_time - start_time
-        total_time = end_time - enqueue_time
+        processing_time = (time.monotonic_ns() - start_ns) / 1e9
+        end_time = start_time + processing_time
+        total_time = queue_wait_time + processing_time
         
         prompt_tokens = result["prompt_tokens"]
         completion_tokens = result["completion_tokens"]
@@ -219,16 +407,17 @@ def generate_text_ollama(
         logger.info(f"Task {task_id} completed successfully")
         logger.info(f"Generated {completion_tokens} tokens in {processing_time:.2f}s ({tokens_per_second:.2f} tokens/s)")
         
-        # Log metrics
-        log_request_metrics(
-            task_id=task_id,
-            status="success",
-            enqueue_time=enqueue_time,
-            start_time=start_time,
-            end_time=end_time,
-            prompt_tokens=prompt_tokens,
-            completion_tokens=completion_tokens
-        )
+        # Log metrics (successes may be sampled, see LOG_SAMPLE_RATE)
+        if sample_request_log(processing_time):
+            log_request_metrics(
+                task_id=task_id,
+                status="success",
+                enqueue_time=enqueue_time,
+                start_time=start_time,
+                end_time=end_time,
+                prompt_tokens=prompt_tokens,
+                completion_tokens=completion_tokens
+            )
         
         return {
             "status": "completed",
@@ -240,16 +429,18 @@ def generate_text_ollama(
                 "total_time": total_time,
                 "prompt_tokens": prompt_tokens,
                 "completion_tokens": completion_tokens,
-                "tokens_per_second": tokens_per_second
+                "tokens_per_second": tokens_per_second,
+                "cache_hit": cache_hit
             }
         }
         
-    except SoftTimeLimitExceeded:
-        end_time = time.time()
+    except SoftTimeLimitExceeded as e:
+        end_time = start_time + (time.monotonic_ns() - start_ns) / 1e9
         error_msg = f"Task exceeded time limit of {settings.task_time_limit}s"
         
         logger.error(f"Task {task_id} timed out")
         
+        log_error_brief(task_id, e)
         log_request_metrics(
             task_id=task_id,
             status="error",
@@ -267,12 +458,12 @@ def generate_text_ollama(
         }
         
     except OllamaError as e:
-        end_time = time.time()
+        end_time = start_time + (time.monotonic_ns() - start_ns) / 1e9
         error_msg = str(e)
         
         logger.error(f"Task {task_id} failed: {error_msg}")
         
-        log_error_traceback(task_id, e)
+        log_error_brief(task_id, e)
         log_request_metrics(
             task_id=task_id,
             status="error",
@@ -290,7 +481,7 @@ def generate_text_ollama(
         }
         
     except Exception as e:
-        end_time = time.time()
+        end_time = start_time + (time.monotonic_ns() - start_ns) / 1e9
         error_msg = str(e)
         error_type = type(e).__name__
         
@@ -324,10 +515,10 @@ def health_check_ollama() -> Dict[str, Any]:
     """
     try:
         url = f"{settings.ollama_base_url}/api/tags"
-        response = requests.get(url, timeout=5)
+        response = _session.get(url, timeout=5)
         response.raise_for_status()
         
-        models = response.json().get("models", [])
+        models = orjson.loads(response.content).get("models", [])
         model_names = [m.get("name") for m in models]
         
         return {
@@ -0,0 +1,303 @@
+"""
+Celery tasks for vLLM inference with continuous batching.
+
+Each worker process owns one resident vLLM engine running on a background
+event loop. Tasks only submit their prompt to that engine and wait, so
+when the worker runs with a thread pool (--pool=threads --concurrency=N)
+concurrent requests join the same running decode batch instead of
+queueing behind each other.
+"""
+import time
+import asyncio
+import logging
+import threading
+import concurrent.futures
+from typing import Dict, Any, Optional, Tuple
+
+import redis.asyncio as aioredis
+from celery import Task
+from celery.signals import worker_ready
+
+from app.celery_app import celery_app, forks_pool_processes
+from app.config import settings
+from app.log_writer import sample_request_log
+from app.streaming import STREAM_END_BYTES, token_channel, token_payload
+from app.tasks.inference import log_request_metrics, log_error_traceback
+
+try:
+    from vllm import AsyncEngineArgs, AsyncLLMEngine, SamplingParams
+except ImportError:  # vLLM is optional; only needed for MODEL_BACKEND=vllm
+    AsyncLLMEngine = None
+
+logger = logging.getLogger(__name__)
+
+# Resident engine and the event loop it runs on (created once per worker)
+_engine = None
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_engine_lock = threading.Lock()
+
+# Async Redis client for token publishing; only used on the engine's loop
+_redis_client = aioredis.Redis.from_url(settings.redis_url)
+
+
+class EngineLoadError(Exception):
+    """Raised when the vLLM engine fails to start."""
+    pass
+
+
+def get_engine():
+    """
+    Start the vLLM engine and its event loop thread on first use.
+    
+    Returns:
+        Tuple of (engine, loop)
+    
+    Raises:
+        EngineLoadError: If vLLM is not installed or the engine fails to start
+    """
+    global _engine, _loop
+    
+    with _engine_lock:
+        if _engine is not None:
+            return _engine, _loop
+        
+        if AsyncLLMEngine is None:
+            raise EngineLoadError("vLLM is not installed (pip install vllm)")
+        
+        try:
+            logger.info(f"Starting vLLM engine: {settings.model_name}")
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="vllm-engine", daemon=True).start()
+            
+            engine_args = AsyncEngineArgs(
+                model=settings.model_name,
+                trust_remote_code=True,
+                max_num_seqs=settings.vllm_max_num_seqs,
+                max_num_batched_tokens=settings.vllm_max_num_batched_tokens,
+            )
+            
+            async def _start():
+                return AsyncLLMEngine.from_engine_args(engine_args)
+            
+            _engine = asyncio.run_coroutine_threadsafe(_start(), loop).result()
+            _loop = loop
+            logger.info("vLLM engine started")
+            return _engine, _loop
+        
+        except Exception as e:
+            logger.error(f"Failed to start vLLM engine: {str(e)}")
+            raise EngineLoadError(f"Failed to start vLLM engine: {str(e)}")
+
+
+async def _generate(
+    engine,
+    request_id: str,
+    prompt: str,
+    max_tokens: int,
+    temperature: float,
+    top_p: float
+) -> Tuple[str, int, int]:
+    """
+    Run one request through the engine, publishing text as it is generated.
+    
+    Returns:
+        Tuple of (text, prompt_tokens, completion_tokens)
+    """
+    sampling_params = SamplingParams(max_tokens=max_tokens, temperature=temperature, top_p=top_p)
+    channel = token_channel(request_id)
+    publish = True
+    sent = 0
+    final = None
+    
+    async for output in engine.generate(prompt, sampling_params, request_id):
+        final = output
+        text = output.outputs[0].text
+        
+        # Outputs are cumulative; forward only the new text (best-effort)
+        if publish and len(text) > sent:
+            try:
+                await _redis_client.publish(channel, token_payload(text[sent:]))
+            except Exception as e:
+                logger.warning(f"Token streaming disabled for {channel}: {str(e)}")
+                publish = False
+            sent = len(text)
+    
+    if publish:
+        try:
+            await _redis_client.publish(channel, STREAM_END_BYTES)
+        except Exception:
+            pass
+    
+    completion = final.outputs[0]
+    return completion.text, len(final.prompt_token_ids), len(completion.token_ids)
+
+
+def warm_up_engine():
+    """Start the engine before real traffic; failures are left for tasks to report."""
+    start_time = time.time()
+    try:
+        get_engine()
+        logger.info(f"vLLM engine warmed up in {time.time() - start_time:.2f}s")
+    except Exception as e:
+        logger.warning(f"vLLM warm-up failed: {str(e)}")
+
+
+@worker_ready.connect
+def _warm_up_on_worker_ready(sender=None, **kwargs):
+    """Start the vLLM engine when a solo or threads worker starts with the vllm backend."""
+    if settings.model_backend != "vllm" or not settings.model_warmup:
+        return
+    if forks_pool_processes(sender):
+        # The main process never runs a task; each child starts its own engine lazily
+        logger.info("Skipping vLLM warm-up: prefork children start the engine on their first task")
+        return
+    warm_up_engine()
+
+
+@celery_app.task(bind=True, name="app.tasks.vllm_inference.generate_text_vllm")
+def generate_text_vllm(
+    self: Task,
+    prompt: str,
+    max_tokens: int = 512,
+    temperature: float = 0.7,
+    top_p: float = 0.9,
+    enqueue_time: Optional[float] = None
+) -> Dict[str, Any]:
+    """
+    Generate text using the worker's continuously batched vLLM engine.
+    
+    Args:
+        prompt: Input text prompt
+        max_tokens: Maximum tokens to generate
+        temperature: Sampling temperature
+        top_p: Nucleus sampling parameter
+        enqueue_time: When the task was enqueued (for metrics)
+    
+    Returns:
+        Dict with status, result, and metrics
+    """
+    task_id = self.request.id
+    start_time = time.time()
+    
+    if enqueue_time is None:
+        enqueue_time = start_time
+    
+    logger.info(f"Starting vLLM task {task_id}")
+    logger.info(f"Prompt length: {len(prompt)} characters")
+    
+    future = None
+    
+    try:
+        engine, loop = get_engine()
+        
+        # Join the engine's running batch and block this task until it finishes
+        future = asyncio.run_coroutine_threadsafe(
+            _generate(engine, task_id, prompt, max_tokens, temperature, top_p),
+            loop
+        )
+        result_text, prompt_tokens, completion_tokens = future.result(timeout=settings.task_time_limit - 10)
+        
+        end_time = time.time()
+        
+        # Calculate metrics
+        queue_wait_time = start_time - enqueue_time
+        processing_time = end_time - start_time
+        total_time = end_time - enqueue_time
+        tokens_per_second = completion_tokens / processing_time if processing_time > 0 else 0
+        
+        logger.info(f"Task {task_id} completed successfully")
+        logger.info(f"Generated {completion_tokens} tokens in {processing_time:.2f}s ({tokens_per_second:.2f} tokens/s)")
+        
+        # Log metrics (successes may be sampled, see LOG_SAMPLE_RATE)
+        if sample_request_log(processing_time):
+            log_request_metrics(
+                task_id=task_id,
+                status="success",
+                enqueue_time=enqueue_time,
+                start_time=start_time,
+                end_time=end_time,
+                prompt_tokens=prompt_tokens,
+                completion_tokens=completion_tokens,
+                backend="vllm"
+            )
+        
+        return {
+            "status": "completed",
+            "task_id": task_id,
+            "result": result_text,
+            "metrics": {
+                "queue_wait_time": queue_wait_time,
+                "processing_time": processing_time,
+                "total_time": total_time,
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "tokens_per_second": tokens_per_second
+            }
+        }
+    
+    except concurrent.futures.TimeoutError:
+        end_time = time.time()
+        error_msg = f"Task exceeded time limit of {settings.task_time_limit}s"
+        
+        logger.error(f"Task {task_id} timed out")
+        
+        # Free the request's slot in the running batch
+        future.cancel()
+        asyncio.run_coroutine_threadsafe(_engine.abort(task_id), _loop)
+        
+        log_request_metrics(
+            task_id=task_id,
+            status="error",
+            enqueue_time=enqueue_time,
+            start_time=start_time,
+            end_time=end_time,
+            error_message=error_msg,
+            backend="vllm"
+        )
+        
+        return {
+            "status": "error",
+            "task_id": task_id,
+            "error_message": error_msg,
+            "error_type": "TimeoutError"
+        }
+    
+    except Exception as e:
+        end_time = time.time()
+        error_msg = str(e)
+        error_type = type(e).__name__
+        
+        logger.error(f"Task {task_id} failed with {error_type}: {error_msg}")
+        
+        log_error_traceback(task_id, e)
+        log_request_metrics(
+            task_id=task_id,
+            status="error",
+            enqueue_time=enqueue_time,
+            start_time=start_time,
+            end_time=end_time,
+            error_message=error_msg,
+            backend="vllm"
+        )
+        
+        return {
+            "status": "error",
+            "task_id": task_id,
+            "error_message": error_msg,
+            "error_type": error_type
+        }
+
+
+@celery_app.task(name="app.tasks.vllm_inference.health_check_vllm")
+def health_check_vllm() -> Dict[str, Any]:
+    """
+    Health check task to verify the worker's vLLM engine is running.
+    
+    Returns:
+        Dict with health status
+    """
+    return {
+        "status": "healthy",
+        "model_loaded": _engine is not None,
+        "timestamp": time.time()
+    }
@@ -2,33 +2,83 @@
 Simple Python client for testing the LLM Inference System.
 """
 import requests
+import httpx
+import orjson
 import time
 import sys
-from typing import Optional
+import asyncio
+import importlib.util
+from typing import Callable, List, Optional
+
+# Fallback polling (servers without long-poll support) starts this fast and
+# backs off by POLL_BACKOFF per unchanged status, up to poll_interval
+MIN_POLL_INTERVAL = 0.1
+POLL_BACKOFF = 1.5
+
+
+def check_prompt_length(
+    prompt: str,
+    max_tokens: int,
+    count_tokens: Optional[Callable[[str], int]],
+    context_window: Optional[int]
+):
+    """
+    Reject a request locally if it cannot fit the model's context window.
+    
+    Saves a round trip (and a queue slot) for prompts the server would
+    only truncate. Does nothing unless both count_tokens and
+    context_window are set.
+    
+    Raises:
+        ValueError: If prompt tokens plus max_tokens exceed context_window
+    """
+    if count_tokens is None or context_window is None:
+        return
+    prompt_tokens = count_tokens(prompt)
+    if prompt_tokens + max_tokens > context_window:
+        raise ValueError(
+            f"Prompt ({prompt_tokens} tokens) plus max_tokens ({max_tokens}) "
+            f"exceeds the {context_window}-token context window"
+        )
 
 
 class LLMClient:
     """Client for interacting with LLM Inference System API."""
     
-    def __init__(self, base_url: str, api_key: str):
+    def __init__(
+        self,
+        base_url: str,
+        api_key: str,
+        count_tokens: Optional[Callable[[str], int]] = None,
+        context_window: Optional[int] = None
+    ):
         """
         Initialize client.
         
         Args:
             base_url: Base URL of the API (e.g., http://localhost:8000)
             api_key: API key for authentication
+            count_tokens: Optional local token counter for the served model, e.g.
+                lambda text: len(tokenizer.encode(text)) with its Hugging Face tokenizer
+            context_window: Model context length; with count_tokens, oversized
+                requests fail locally instead of being submitted
         """
         self.base_url = base_url.rstrip('/')
+        self.count_tokens = count_tokens
+        self.context_window = context_window
         self.headers = {
             "X-API-Key": api_key,
             "Content-Type": "application/json"
         }
+        
+        # One connection pool for every call this client makes
+        self._session = requests.Session()
     
     def health_check(self) -> dict:
         """Check API health status."""
-        response = requests.get(f"{self.base_url}/health")
+        response = self._session.get(f"{self.base_url}/health")
         response.raise_for_status()
-        return response.json()
+        return orjson.loads(response.content)
     
     def submit_request(
         self,
@@ -50,7 +100,12 @@ class LLMClient:
             
         Returns:
             task_id for tracking the request
+            
+        Raises:
+            ValueError: If the request cannot fit the context window (see count_tokens)
         """
+        check_prompt_length(prompt, max_tokens, self.count_tokens, self.context_window)
+        
         payload = {
             "prompt": prompt,
             "max_tokens": max_tokens,
@@ -61,33 +116,41 @@ class LLMClient:
         if user_id:
             payload["user_id"] = user_id
         
-        response = requests.post(
+        response = self._session.post(
             f"{self.base_url}/generate",
             headers=self.headers,
-            json=payload
+            data=orjson.dumps(payload)
         )
         response.raise_for_status()
         
-        data = response.json()
+        data = orjson.loads(response.content)
         return data["task_id"]
     
     def get_status(self, task_id: str) -> dict:
         """Get task status."""
-        response = requests.get(
+        response = self._session.get(
             f"{self.base_url}/status/{task_id}",
             headers=self.headers
         )
         response.raise_for_status()
-        return response.json()
+        return orjson.loads(response.content)
     
-    def get_result(self, task_id: str) -> dict:
-        """Get task result."""
-        response = requests.get(
+    def get_result(self, task_id: str, wait: float = 0) -> dict:
+        """
+        Get task result.
+        
+        Args:
+            task_id: Task identifier
+            wait: Seconds the server may hold the request until the task finishes
+        """
+        response = self._session.get(
             f"{self.base_url}/result/{task_id}",
-            headers=self.headers
+            headers=self.headers,
+            params={"wait": wait} if wait else None,
+            timeout=wait + 10 if wait else None
         )
         response.raise_for_status()
-        return response.json()
+        return orjson.loads(response.content)
     
     def wait_for_result(
         self,
@@ -99,9 +162,13 @@ class LLMClient:
         """
         Wait for task to complete and return result.
         
+        Uses the server's long poll (one request per 30s of waiting). Against
+        servers that answer immediately it falls back to polling, starting at
+        MIN_POLL_INTERVAL and backing off while the status stays the same.
+        
         Args:
             task_id: Task identifier
-            poll_interval: Seconds between status checks
+            poll_interval: Longest gap between status checks without long-poll support
             timeout: Maximum seconds to wait
             verbose: Print status updates
             
@@ -112,6 +179,8 @@ class LLMClient:
             TimeoutError: If task doesn't complete within timeout
         """
         start_time = time.time()
+        interval = MIN_POLL_INTERVAL
+        last_status = None
         
         while True:
             elapsed = time.time() - start_time
@@ -119,7 +188,9 @@ class LLMClient:
             if elapsed > timeout:
                 raise TimeoutError(f"Task {task_id} did not complete within {timeout}s")
             
-            result = self.get_result(task_id)
+            wait = min(timeout - elapsed, 30.0)
+            request_start = time.time()
+            result = self.get_result(task_id, wait=wait)
             status = result.get("status")
             
             if status == "completed":
@@ -133,7 +204,11 @@ class LLMClient:
             else:
                 if verbose:
                     print(f"⏳ Status: {status}... waiting ({elapsed:.1f}s elapsed)", end='\r')
-                time.sleep(poll_interval)
+                # Older servers ignore wait and answer straight away
+                if time.time() - request_start < wait:
+                    interval = MIN_POLL_INTERVAL if status != last_status else min(poll_interval, interval * POLL_BACKOFF)
+                    last_status = status
+                    time.sleep(interval)
     
     def generate(
         self,
@@ -181,6 +256,192 @@ class LLMClient:
             return {"task_id": task_id, "status": "queued"}
 
 
+class AsyncLLMClient:
+    """
+    asyncio client for the LLM Inference System API.
+    
+    All requests share one connection pool, so a single event loop can
+    keep thousands of tasks in flight without a thread per request.
+    
+    Example:
+        async with AsyncLLMClient("http://localhost:8000", "dev-key-12345") as client:
+            results = await client.gather_generate(["Hello", "Hi there"])
+    """
+    
+    def __init__(
+        self,
+        base_url: str,
+        api_key: str,
+        count_tokens: Optional[Callable[[str], int]] = None,
+        context_window: Optional[int] = None
+    ):
+        """
+        Initialize client.
+        
+        Args:
+            base_url: Base URL of the API (e.g., http://localhost:8000)
+            api_key: API key for authentication
+            count_tokens: Optional local token counter for the served model, e.g.
+                lambda text: len(tokenizer.encode(text)) with its Hugging Face tokenizer
+            context_window: Model context length; with count_tokens, oversized
+                requests fail locally instead of being submitted
+        """
+        self.base_url = base_url.rstrip('/')
+        self.count_tokens = count_tokens
+        self.context_window = context_window
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            headers={"X-API-Key": api_key},
+            limits=httpx.Limits(max_keepalive_connections=64, max_connections=128),
+            # HTTP/2 needs the optional h2 package (pip install httpx[http2])
+            http2=importlib.util.find_spec("h2") is not None
+        )
+    
+    async def __aenter__(self) -> "AsyncLLMClient":
+        return self
+    
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+    
+    async def aclose(self):
+        """Close the connection pool."""
+        await self._client.aclose()
+    
+    async def health_check(self) -> dict:
+        """Check API health status."""
+        response = await self._client.get("/health")
+        response.raise_for_status()
+        return orjson.loads(response.content)
+    
+    async def submit_request(
+        self,
+        prompt: str,
+        max_tokens: int = 512,
+        temperature: float = 0.7,
+        top_p: float = 0.9,
+        user_id: Optional[str] = None
+    ) -> str:
+        """
+        Submit a generation request.
+        
+        Returns:
+            task_id for tracking the request
+            
+        Raises:
+            ValueError: If the request cannot fit the context window (see count_tokens)
+        """
+        check_prompt_length(prompt, max_tokens, self.count_tokens, self.context_window)
+        
+        payload = {
+            "prompt": prompt,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            "top_p": top_p
+        }
+        
+        if user_id:
+            payload["user_id"] = user_id
+        
+        response = await self._client.post(
+            "/generate",
+            content=orjson.dumps(payload),
+            headers={"Content-Type": "application/json"}
+        )
+        response.raise_for_status()
+        return orjson.loads(response.content)["task_id"]
+    
+    async def get_status(self, task_id: str) -> dict:
+        """Get task status."""
+        response = await self._client.get(f"/status/{task_id}")
+        response.raise_for_status()
+        return orjson.loads(response.content)
+    
+    async def get_result(self, task_id: str, wait: float = 0) -> dict:
+        """
+        Get task result.
+        
+        Args:
+            task_id: Task identifier
+            wait: Seconds the server may hold the request until the task finishes
+        """
+        response = await self._client.get(
+            f"/result/{task_id}",
+            params={"wait": wait} if wait else None,
+            timeout=wait + 10 if wait else httpx.USE_CLIENT_DEFAULT
+        )
+        response.raise_for_status()
+        return orjson.loads(response.content)
+    
+    async def wait_for_result(
+        self,
+        task_id: str,
+        poll_interval: float = 2.0,
+        timeout: float = 300.0
+    ) -> dict:
+        """
+        Wait for task to complete and return result (see LLMClient.wait_for_result).
+        
+        Raises:
+            TimeoutError: If task doesn't complete within timeout
+        """
+        loop = asyncio.get_running_loop()
+        start_time = loop.time()
+        interval = MIN_POLL_INTERVAL
+        last_status = None
+        
+        while True:
+            elapsed = loop.time() - start_time
+            
+            if elapsed > timeout:
+                raise TimeoutError(f"Task {task_id} did not complete within {timeout}s")
+            
+            wait = min(timeout - elapsed, 30.0)
+            request_start = loop.time()
+            result = await self.get_result(task_id, wait=wait)
+            
+            status = result.get("status")
+            
+            if status in ("completed", "error"):
+                return result
+            
+            # Older servers ignore wait and answer straight away
+            if loop.time() - request_start < wait:
+                interval = MIN_POLL_INTERVAL if status != last_status else min(poll_interval, interval * POLL_BACKOFF)
+                last_status = status
+                await asyncio.sleep(interval)
+    
+    async def generate(
+        self,
+        prompt: str,
+        max_tokens: int = 512,
+        temperature: float = 0.7,
+        top_p: float = 0.9,
+        user_id: Optional[str] = None
+    ) -> dict:
+        """Submit a request and wait for its result."""
+        task_id = await self.submit_request(
+            prompt=prompt,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            top_p=top_p,
+            user_id=user_id
+        )
+        return await self.wait_for_result(task_id)
+    
+    async def gather_generate(self, prompts: List[str], **kwargs) -> List[dict]:
+        """
+        Run several prompts concurrently.
+        
+        Args:
+            prompts: Input prompts
+            **kwargs: Generation parameters passed to generate()
+            
+        Returns:
+            Result dictionaries in the same order as prompts
+        """
+        return await asyncio.gather(*(self.generate(prompt, **kwargs) for prompt in prompts))
+
+
 def main():
     """Example usage."""
     # Configuration
@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+"""
+Print a binary request log (LOG_FORMAT=binary) in the llm_requests.log text format.
+
+Usage: python decode_log.py [logs/llm_requests.bin]
+"""
+import sys
+import os
+import mmap
+from datetime import datetime
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.log_writer import iter_request_records
+
+
+def format_record(record: dict) -> str:
+    """Render one record the way the text log writes it."""
+    processing_time = record["end_time"] - record["start_time"]
+    
+    parts = [
+        f"[{datetime.fromtimestamp(record['end_time']).strftime('%Y-%m-%d %H:%M:%S')}]",
+        f"task_id={record['task_id']}",
+    ]
+    
+    if record["backend"] != "transformers":
+        parts.append(f"backend={record['backend']}")
+    
+    parts.append(f"status={record['status']}")
+    
+    if record["status"] == "success":
+        parts.append(f"prompt_tokens={record['prompt_tokens']}")
+        parts.append(f"completion_tokens={record['completion_tokens']}")
+        if processing_time > 0:
+            parts.append(f"tokens_per_sec={record['completion_tokens'] / processing_time:.2f}")
+    
+    parts.extend([
+        f"queue_wait={record['start_time'] - record['enqueue_time']:.2f}s",
+        f"processing_time={processing_time:.2f}s",
+        f"total_time={record['end_time'] - record['enqueue_time']:.2f}s",
+    ])
+    
+    if record["error_message"]:
+        parts.append(f"error_message=\"{record['error_message']}\"")
+    
+    return " ".join(parts)
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else os.path.join("logs", "llm_requests.bin")
+    
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            for record in iter_request_records(data):
+                print(format_record(record))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,28 @@
 """
 Full API Flow Test Script
 Tests all endpoints: health, generate, status, result
+
+Usage:
+    python full_api_test.py                      # Smoke test (one request)
+    python full_api_test.py --load 100 --rate 5  # Open-loop load test
+    python full_api_test.py --load 100 --rate 2 --keys key-a,key-b,key-c,key-d
+
+The server rate-limits each API key to 60 requests/minute (burst 10), and
+result polls count too, so a single key caps a load test at well under
+1 request/s. Pass several keys from the server's API_KEYS with --keys (one
+key per 0.5 requests/s is a safe ratio) or raise the limit; requests the
+limiter rejects are reported as their own "rate_limited" outcome.
 """
+import argparse
 import requests
 import time
 import sys
+from concurrent.futures import ThreadPoolExecutor
 
 # Configuration
 BASE_URL = "http://localhost:8000"
 API_KEY = "test-key-123"  # From .env file
+RATE_LIMIT_PER_MINUTE = 60  # Per-key limit set on RateLimitMiddleware in app/main.py
 
 def print_separator(title=""):
     print("\n" + "=" * 60)
@@ -99,6 +113,8 @@ def test_result(task_id, max_wait=120):
     
     start_time = time.time()
     poll_count = 0
+    interval = 0.1  # Fallback polling backs off from 100ms to 2s
+    last_status = None
     
     while True:
         elapsed = time.time() - start_time
@@ -107,10 +123,14 @@ def test_result(task_id, max_wait=120):
             return None
         
         try:
+            # Long poll: the server replies as soon as the task finishes
+            wait = min(max_wait - elapsed, 30)
+            request_start = time.time()
             response = requests.get(
                 f"{BASE_URL}/result/{task_id}",
                 headers=headers,
-                timeout=10
+                params={"wait": wait},
+                timeout=wait + 10
             )
             response.raise_for_status()
             data = response.json()
@@ -125,8 +145,11 @@ def test_result(task_id, max_wait=120):
             elif status == "error":
                 print(f"\n✗ Task failed: {data.get('error_message')}")
                 return data
-            else:
-                time.sleep(2)  # Poll every 2 seconds
+            elif time.time() - request_start < wait:
+                # Server without long-poll support: poll fast, slowing down while nothing changes
+                interval = 0.1 if status != last_status else min(2.0, interval * 1.5)
+                last_status = status
+                time.sleep(interval)
                 
         except Exception as e:
             print(f"\n✗ Error polling: {e}")
@@ -174,6 +197,94 @@ def test_metrics():
         print(f"  Metrics not available: {e}")
         return False
 
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list"""
+    return sorted_values[min(len(sorted_values) - 1, int(round(p / 100 * (len(sorted_values) - 1))))]
+
+def retry_after_seconds(response, default=1.0):
+    """Seconds a 429 response asks the client to wait before retrying"""
+    try:
+        return float(response.headers.get("Retry-After", default))
+    except ValueError:
+        return default
+
+def run_load(n, rate_per_sec, max_wait=300, max_tokens=64, api_keys=(API_KEY,)):
+    """
+    Open-loop load test: submit n requests at a fixed arrival rate,
+    regardless of how fast earlier ones finish, and report latency
+    percentiles (measured from each request's scheduled arrival).
+    
+    Requests rotate through api_keys so the per-key rate limit does not
+    cap the arrival rate; a submission rejected with 429 counts as
+    "rate_limited", and a rejected poll waits out its Retry-After.
+    """
+    print_separator(f"LOAD TEST: {n} requests at {rate_per_sec}/s with {len(api_keys)} API key(s)")
+    per_key_rate = rate_per_sec * 60 / len(api_keys)
+    if per_key_rate > RATE_LIMIT_PER_MINUTE / 2:
+        print(f"  ⚠ {per_key_rate:.0f} submissions/min per key (plus polls) against a limit of "
+              f"{RATE_LIMIT_PER_MINUTE}/min; pass more --keys or expect rate_limited outcomes")
+    session = requests.Session()
+    prompt = "Write a short poem about artificial intelligence and the future of technology."
+    
+    def one_request(scheduled, api_key):
+        headers = {"X-API-Key": api_key}
+        try:
+            response = session.post(
+                f"{BASE_URL}/generate",
+                headers=headers,
+                json={"prompt": prompt, "max_tokens": max_tokens},
+                timeout=10
+            )
+            if response.status_code == 429:
+                return "rate_limited", None
+            response.raise_for_status()
+            task_id = response.json()["task_id"]
+            
+            while True:
+                wait = min(scheduled + max_wait - time.perf_counter(), 30)
+                if wait <= 0:
+                    return "timeout", None
+                request_start = time.perf_counter()
+                response = session.get(
+                    f"{BASE_URL}/result/{task_id}",
+                    headers=headers,
+                    params={"wait": wait},
+                    timeout=wait + 10
+                )
+                if response.status_code == 429:
+                    time.sleep(min(retry_after_seconds(response), max(wait, 0)))
+                    continue
+                data = response.json()
+                if data.get("status") in ("completed", "error"):
+                    return data["status"], time.perf_counter() - scheduled
+                if time.perf_counter() - request_start < wait:
+                    time.sleep(0.5)  # Server without long-poll support
+        except Exception as e:
+            return f"failed ({type(e).__name__})", None
+    
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=min(n, 64)) as pool:
+        futures = []
+        for i in range(n):
+            scheduled = t0 + i / rate_per_sec
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            futures.append(pool.submit(one_request, scheduled, api_keys[i % len(api_keys)]))
+        results = [f.result() for f in futures]
+    elapsed = time.perf_counter() - t0
+    
+    outcomes = {}
+    for outcome, _ in results:
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+    latencies = sorted(latency for outcome, latency in results if outcome == "completed")
+    
+    print(f"  Outcomes:   {outcomes}")
+    print(f"  Throughput: {len(latencies) / elapsed:.2f} completed requests/s over {elapsed:.1f}s")
+    if latencies:
+        print(f"  Latency:    p50={percentile(latencies, 50):.2f}s  p95={percentile(latencies, 95):.2f}s  p99={percentile(latencies, 99):.2f}s  max={latencies[-1]:.2f}s")
+    return results
+
 def main():
     """Run the full API flow test"""
     print("\n" + "🚀 " * 20)
@@ -214,8 +325,18 @@ def main():
     print("✓ All API endpoints tested successfully!\n")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--load", type=int, metavar="N", help="Run an open-loop load test with N requests instead of the smoke test")
+    parser.add_argument("--rate", type=float, default=2.0, help="Requests per second for --load (default: 2)")
+    parser.add_argument("--keys", default=API_KEY, help="Comma-separated API keys that --load rotates through (default: the single API_KEY)")
+    args = parser.parse_args()
+    
     try:
-        main()
+        if args.load:
+            keys = tuple(key.strip() for key in args.keys.split(",") if key.strip()) or (API_KEY,)
+            run_load(args.load, args.rate, api_keys=keys)
+        else:
+            main()
     except KeyboardInterrupt:
         print("\n\n⚠️ Test interrupted by user")
         sys.exit(0)
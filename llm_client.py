@@ -25,13 +25,46 @@ Usage:
     # Streaming
     for chunk in llm.stream("Write a poem about coding"):
         print(chunk, end="", flush=True)
+    
+    # Concurrent calls from asyncio (needs httpx)
+    answers = await asyncio.gather(*[llm.achat(q) for q in questions])
+    await llm.aclose()
 """
 
+import os
+import time
+import asyncio
+import socket
+import hashlib
+import functools
+import itertools
+import threading
+import urllib.parse
+import importlib.util
+import concurrent.futures
 import requests
-import json
-from typing import Optional, Dict, Any, Generator, List, Union
+import orjson
+from collections import OrderedDict, deque
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import Optional, Dict, Any, AsyncGenerator, Callable, Deque, Generator, List, Sequence, Tuple, Union
 from dataclasses import dataclass, field
 
+try:
+    import httpx
+except ImportError:  # httpx is optional; only needed for the async methods
+    httpx = None
+
+try:
+    import uvloop
+except ImportError:  # uvloop is optional (and not available on Windows)
+    uvloop = None
+
+try:
+    import msgspec
+except ImportError:  # msgspec is optional; responses are decoded with orjson without it
+    msgspec = None
+
 
 # ============================================================================
 # CONFIGURATION - Edit these defaults for your setup
@@ -43,14 +76,38 @@ DEFAULT_TEMPERATURE = 0.7
 DEFAULT_MAX_TOKENS = 2048
 DEFAULT_TOP_P = 0.9
 DEFAULT_TIMEOUT = 120  # seconds
+DEFAULT_KEEP_ALIVE = "30m"  # how long Ollama keeps the model (and its prompt cache) loaded
+ASYNC_MAX_CONNECTIONS = 64  # concurrent requests from the async methods
+STREAM_CHUNK_SIZE = 8192  # bytes read at a time from streamed responses
+CACHE_TTL = 3600  # seconds a cached response is reused (see LLMCache)
+CACHE_MAX_SIZE = 1024  # responses kept by the in-memory cache
+DEFAULT_EMBED_MODEL = "sentence-transformers/all-MiniLM-L6-v2"  # for SemanticCache
+SEMANTIC_CACHE_MAX_SIZE = 10000  # responses kept by SemanticCache
 
 
 # ============================================================================
 # RESPONSE CLASSES
 # ============================================================================
 
-@dataclass
-class Usage:
+# Usage and LLMResponse are built for every call and should be treated as
+# read-only. With msgspec installed they are frozen Structs: no per-instance
+# __dict__ and no GC tracking (they only hold strings, numbers and a Usage,
+# so they cannot form reference cycles), which makes them several times
+# cheaper to build. Without it they stay plain dataclasses, since a frozen
+# dataclass is slower to construct than a mutable one.
+if msgspec is not None:
+    class _Record(msgspec.Struct, frozen=True, gc=False):
+        """Internal: Base class for immutable response records."""
+    
+    def _record(cls):
+        return cls
+else:
+    _Record = object
+    _record = dataclass
+
+
+@_record
+class Usage(_Record):
     """Token usage statistics."""
     prompt_tokens: int = 0
     completion_tokens: int = 0
@@ -64,8 +121,8 @@ class Message:
     content: str
 
 
-@dataclass
-class LLMResponse:
+@_record
+class LLMResponse(_Record):
     """Response from LLM generation."""
     content: str
     model: str
@@ -104,6 +161,309 @@ class TimeoutError(LLMError):
     pass
 
 
+# Exception and message per Ollama error status; other statuses raise LLMError
+_STATUS_ERRORS = {
+    404: (ModelNotFoundError, "Model '{model}' not found. Run: ollama pull {model}"),
+}
+_DEFAULT_STATUS_ERROR = (LLMError, "API error: {status} - {text}")
+
+# Transport failures of requests (blocking calls) and httpx (async calls)
+_CONNECT_ERRORS = (requests.exceptions.ConnectionError,) + ((httpx.ConnectError,) if httpx else ())
+_TIMEOUT_ERRORS = (requests.exceptions.Timeout,) + ((httpx.TimeoutException,) if httpx else ())
+
+
+if msgspec is not None:
+    class _OllamaResponse(msgspec.Struct):
+        """Fields of a non-streaming Ollama response used to build an LLMResponse."""
+        message: Dict[str, Any] = {}
+        response: str = ""
+        prompt_eval_count: int = 0
+        eval_count: int = 0
+        done: bool = True
+        total_duration: float = 0
+    
+    _response_decoder = msgspec.json.Decoder(_OllamaResponse)
+
+
+def _decode_response(content: bytes) -> Dict[str, Any]:
+    """
+    Decode a non-streaming Ollama response body.
+    
+    With msgspec installed only the _OllamaResponse fields are built;
+    everything else, notably the token context /api/generate returns
+    (one int per prompt and output token), is skipped while parsing
+    instead of being turned into a Python list.
+    """
+    if msgspec is not None:
+        try:
+            return msgspec.structs.asdict(_response_decoder.decode(content))
+        except msgspec.ValidationError:
+            pass  # unexpected field types; fall back to a plain decode
+    return orjson.loads(content)
+
+
+def _pop_frames(buf: bytearray) -> List[bytes]:
+    """
+    Remove the complete NDJSON lines from the front of a stream buffer.
+    
+    Streamed bytes are split on b"\\n" as-is, so each line goes to
+    orjson.loads without being decoded to str first; a trailing partial
+    line stays in buf until the rest of it arrives.
+    """
+    end = buf.rfind(b"\n")
+    if end == -1:
+        return []
+    frames = bytes(buf[:end]).split(b"\n")
+    del buf[:end + 1]
+    return frames
+
+
+# ============================================================================
+# RESPONSE CACHE - Exact-match reuse of deterministic calls
+# ============================================================================
+#
+# Only calls at or below the cache's max_temperature (default: temperature=0,
+# whose output is deterministic) are cached. Streaming calls are never cached.
+
+# Response fields kept in the cache (Ollama's /api/generate also returns the
+# full token context, which is not needed to rebuild an LLMResponse)
+_CACHED_FIELDS = ("message", "response", "prompt_eval_count", "eval_count", "done", "total_duration")
+
+
+class MemoryCacheBackend:
+    """In-process LRU cache backend with per-entry expiry."""
+    
+    def __init__(self, max_size: int = CACHE_MAX_SIZE):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+    
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+    
+    def set(self, key: str, value: Dict[str, Any], ttl: float):
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+
+class RedisCacheBackend:
+    """
+    Cache backend shared through Redis, e.g. by several processes.
+    
+    Example:
+        cache = LLMCache(RedisCacheBackend(redis.Redis()))
+    """
+    
+    def __init__(self, client, prefix: str = "llmcache:"):
+        """
+        Args:
+            client: redis.Redis client (blocking; also used by the async methods)
+            prefix: Prefix for the cache keys
+        """
+        self.client = client
+        self.prefix = prefix
+    
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        value = self.client.get(self.prefix + key)
+        return orjson.loads(value) if value is not None else None
+    
+    def set(self, key: str, value: Dict[str, Any], ttl: float):
+        self.client.set(self.prefix + key, orjson.dumps(value), ex=int(ttl))
+
+
+class LLMCache:
+    """
+    Exact-match response cache for LLM clients.
+    
+    Example:
+        llm = LLM(temperature=0, cache=LLMCache())
+        llm.chat("What is Python?")  # calls Ollama
+        llm.chat("What is Python?")  # served from the cache
+        print(llm.cache.stats)
+    
+    Args:
+        backend: Object with get(key) and set(key, value, ttl); defaults to
+            an in-memory MemoryCacheBackend
+        ttl: Seconds a cached response is reused
+        max_temperature: Highest temperature whose responses are cached
+    """
+    
+    def __init__(self, backend=None, ttl: float = CACHE_TTL, max_temperature: float = 0.0):
+        self.backend = backend if backend is not None else MemoryCacheBackend()
+        self.ttl = ttl
+        self.max_temperature = max_temperature
+        self.hits = 0
+        self.misses = 0
+    
+    @property
+    def stats(self) -> Dict[str, int]:
+        """Cache hits and misses so far."""
+        return {"hits": self.hits, "misses": self.misses}
+    
+    @staticmethod
+    def key(url: str, payload: Dict[str, Any]) -> str:
+        """Cache key for a request: the endpoint plus its model, input and options."""
+        return hashlib.sha256(url.encode() + orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)).hexdigest()
+    
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        value = self.backend.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+    
+    def set(self, key: str, data: Dict[str, Any]):
+        self.backend.set(key, {k: data[k] for k in _CACHED_FIELDS if k in data}, self.ttl)
+
+
+class SemanticCache:
+    """
+    Response cache that also matches paraphrases of earlier questions.
+    
+    Single-turn chat messages are embedded with a sentence-transformers
+    model and looked up in a FAISS inner-product index, so "What is the
+    capital of France?" can be answered with the stored response to "Tell
+    me France's capital". Matches are only reused for the same model,
+    system prompt and options. Checked after the exact-match LLMCache.
+    Needs sentence-transformers and faiss-cpu.
+    
+    Example:
+        llm = LLM(semantic_cache=SemanticCache(threshold=0.92))
+    
+    Args:
+        embed_model: SentenceTransformer instance or model name
+        threshold: Minimum cosine similarity for a match
+        ttl: Seconds a cached response is reused
+        max_size: Most responses kept; the oldest half is dropped when full
+    """
+    
+    # Nearest neighbours checked per lookup (the best may be another scope)
+    CANDIDATES = 8
+    
+    def __init__(
+        self,
+        embed_model: Union[str, Any] = DEFAULT_EMBED_MODEL,
+        threshold: float = 0.92,
+        ttl: float = CACHE_TTL,
+        max_size: int = SEMANTIC_CACHE_MAX_SIZE,
+    ):
+        try:
+            import faiss
+        except ImportError:
+            raise LLMError("SemanticCache needs faiss: pip install faiss-cpu sentence-transformers")
+        
+        if isinstance(embed_model, str):
+            try:
+                from sentence_transformers import SentenceTransformer
+            except ImportError:
+                raise LLMError("SemanticCache needs sentence-transformers: pip install sentence-transformers")
+            embed_model = SentenceTransformer(embed_model)
+        
+        self._faiss = faiss
+        self.embed_model = embed_model
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._index = faiss.IndexFlatIP(embed_model.get_sentence_embedding_dimension())
+        # (scope, expiry epoch, response) per index row
+        self._entries: List[Tuple[str, float, Dict[str, Any]]] = []
+        self._lock = threading.Lock()
+    
+    @property
+    def stats(self) -> Dict[str, int]:
+        """Cache hits and misses so far."""
+        return {"hits": self.hits, "misses": self.misses}
+    
+    @staticmethod
+    def _query(payload: Dict[str, Any]) -> Optional[Tuple[str, str]]:
+        """Scope and text of a single-turn chat request, or None for other requests."""
+        messages = payload["messages"]
+        if messages[-1]["role"] != "user" or len(messages) > 2 or (len(messages) == 2 and messages[0]["role"] != "system"):
+            return None
+        scope = {
+            "model": payload["model"],
+            "system": messages[0]["content"] if len(messages) == 2 else None,
+            "options": payload["options"],
+        }
+        return hashlib.sha256(orjson.dumps(scope, option=orjson.OPT_SORT_KEYS)).hexdigest(), messages[-1]["content"]
+    
+    def match(self, payload: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], Optional[Tuple]]:
+        """
+        Look up a chat request.
+        
+        Returns:
+            Tuple of (cached response or None, handle to pass to add() after
+            a miss; None if the request is not cacheable)
+        """
+        query = self._query(payload)
+        if query is None:
+            return None, None
+        scope, text = query
+        
+        vector = self.embed_model.encode([text], normalize_embeddings=True).astype("float32")
+        
+        with self._lock:
+            if self._index.ntotal:
+                scores, rows = self._index.search(vector, min(self.CANDIDATES, self._index.ntotal))
+                now = time.time()
+                # Results are sorted by similarity
+                for score, row in zip(scores[0], rows[0]):
+                    if score < self.threshold:
+                        break
+                    entry_scope, expires, data = self._entries[row]
+                    if entry_scope == scope and expires >= now:
+                        self.hits += 1
+                        return data, None
+            self.misses += 1
+        
+        return None, (scope, vector)
+    
+    def add(self, handle: Tuple, data: Dict[str, Any]):
+        """Store the response to a request that match() missed."""
+        scope, vector = handle
+        with self._lock:
+            if len(self._entries) >= self.max_size:
+                self._evict()
+            self._index.add(vector)
+            self._entries.append((scope, time.time() + self.ttl, {k: data[k] for k in _CACHED_FIELDS if k in data}))
+    
+    def _evict(self):
+        """Drop expired entries and keep at most the newest half of the rest."""
+        now = time.time()
+        keep = [i for i, entry in enumerate(self._entries) if entry[1] >= now][-(self.max_size // 2):]
+        vectors = self._index.reconstruct_n(0, self._index.ntotal)[keep]
+        self._index.reset()
+        if keep:
+            self._index.add(vectors)
+        self._entries = [self._entries[i] for i in keep]
+    
+    def save(self, path: str):
+        """Write the index and responses to path.index and path.json."""
+        with self._lock:
+            self._faiss.write_index(self._index, f"{path}.index")
+            with open(f"{path}.json", "wb") as f:
+                f.write(orjson.dumps(self._entries))
+    
+    def load(self, path: str):
+        """Replace the cache contents with those written by save()."""
+        with self._lock:
+            self._index = self._faiss.read_index(f"{path}.index")
+            with open(f"{path}.json", "rb") as f:
+                self._entries = [tuple(entry) for entry in orjson.loads(f.read())]
+
+
 # ============================================================================
 # MAIN LLM CLIENT CLASS
 # ============================================================================
@@ -118,6 +478,13 @@ class LLM:
         print(response.content)
     """
     
+    # No per-instance __dict__; every attribute is listed here
+    __slots__ = (
+        "model", "temperature", "max_tokens", "top_p", "timeout", "keep_alive",
+        "http2", "cache", "semantic_cache", "_base_url", "_address", "_chat_url", "_gen_url", "_tags_url",
+        "_system_prompt", "_system_msg", "_conversation_history", "_session", "_aclient",
+    )
+    
     def __init__(
         self,
         model: str = DEFAULT_MODEL,
@@ -127,6 +494,11 @@ class LLM:
         max_tokens: int = DEFAULT_MAX_TOKENS,
         top_p: float = DEFAULT_TOP_P,
         timeout: int = DEFAULT_TIMEOUT,
+        keep_alive: Optional[str] = DEFAULT_KEEP_ALIVE,
+        http2: Optional[bool] = None,
+        cache: Optional[LLMCache] = None,
+        semantic_cache: Optional[SemanticCache] = None,
+        max_history: int = 0,
     ):
         """
         Initialize LLM client.
@@ -139,7 +511,24 @@ class LLM:
             max_tokens: Maximum tokens to generate
             top_p: Nucleus sampling parameter
             timeout: Request timeout in seconds
+            keep_alive: How long Ollama keeps the model loaded after a request
+                (e.g. "30m", "-1" for ever); None uses the server default
+            http2: Multiplex the async methods' concurrent requests over one
+                HTTP/2 connection to https servers; None enables it when the
+                h2 package is installed
+            cache: Reuse responses to repeated deterministic calls (see LLMCache)
+            semantic_cache: Reuse responses to paraphrased questions (see SemanticCache)
+            max_history: Remember the last max_history messages of chat() and
+                achat() calls made without context, and send them with the
+                next such call; 0 keeps every call independent. Whole
+                user/assistant turns are kept, so an odd value rounds down
+        
+        Raises:
+            ValueError: If max_history is 1 (too short for one turn)
         """
+        if max_history == 1:
+            raise ValueError("max_history must be 0 or at least 2 (one user/assistant turn)")
+        
         self.model = model
         self.base_url = base_url.rstrip("/")
         self.system_prompt = system_prompt
@@ -147,7 +536,90 @@ class LLM:
         self.max_tokens = max_tokens
         self.top_p = top_p
         self.timeout = timeout
-        self._conversation_history: List[Message] = []
+        self.keep_alive = keep_alive
+        self.http2 = http2
+        self.cache = cache
+        self.semantic_cache = semantic_cache
+        # (user, assistant) turns, oldest falling off first, so a pair is never
+        # split and the history never starts with an assistant message
+        self._conversation_history: Optional[Deque[Tuple[Dict[str, str], Dict[str, str]]]] = (
+            deque(maxlen=max_history // 2) if max_history > 0 else None
+        )
+        
+        # Reuse connections to Ollama across calls; bodies are orjson-encoded bytes.
+        # Only connection failures and gateway errors are retried: a read timeout
+        # means the model is still generating, and resending would start it again.
+        # No socket options are needed for streaming: urllib3 already enables
+        # TCP_NODELAY, and so does Ollama's (Go) side, which is the one writing
+        # the small token frames, so none are held back by Nagle's algorithm.
+        # Receive buffers are left to the kernel's autotuning, which a fixed
+        # SO_RCVBUF would switch off.
+        self._session = requests.Session()
+        self._session.headers["Content-Type"] = "application/json"
+        self._session.mount("http://", HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=32,
+            max_retries=Retry(
+                total=2,
+                read=False,
+                backoff_factor=0.1,
+                status_forcelist=[502, 503, 504],
+                allowed_methods=frozenset({"GET", "POST"}),
+                raise_on_status=False
+            )
+        ))
+        self._session.mount("https://", self._session.get_adapter("http://"))
+        
+        # Created on the first async call (see _get_async_client)
+        self._aclient = None
+    
+    def close(self):
+        """Close the pooled connections to Ollama."""
+        self._session.close()
+    
+    @property
+    def base_url(self) -> str:
+        """Ollama server URL."""
+        return self._base_url
+    
+    @base_url.setter
+    def base_url(self, value: str):
+        self._base_url = value
+        # Endpoint URLs, built once instead of on every request
+        self._chat_url = f"{value}/api/chat"
+        self._gen_url = f"{value}/api/generate"
+        self._tags_url = f"{value}/api/tags"
+        
+        parts = urllib.parse.urlsplit(value)
+        self._address = (parts.hostname, parts.port or (443 if parts.scheme == "https" else 80))
+    
+    @property
+    def system_prompt(self) -> Optional[str]:
+        """Default system prompt for all requests."""
+        return self._system_prompt
+    
+    @system_prompt.setter
+    def system_prompt(self, value: Optional[str]):
+        self._system_prompt = value
+        # Built once and sent as-is on every call, so the start of every
+        # prompt is byte-identical and Ollama can reuse its cached prefix
+        self._system_msg = {"role": "system", "content": value.strip()} if value else None
+    
+    @property
+    def history(self) -> Tuple[Dict[str, str], ...]:
+        """Messages remembered for the next chat() call (see max_history)."""
+        return tuple(itertools.chain.from_iterable(self._conversation_history or ()))
+    
+    def clear_history(self):
+        """Forget the remembered conversation."""
+        if self._conversation_history is not None:
+            self._conversation_history.clear()
+    
+    def __enter__(self) -> "LLM":
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
     
     def chat(
         self,
@@ -157,41 +629,40 @@ class LLM:
         max_tokens: Optional[int] = None,
         top_p: Optional[float] = None,
         context: Optional[List[Dict[str, str]]] = None,
+        keep_alive: Optional[str] = None,
     ) -> LLMResponse:
         """
         Send a chat message and get a response.
         
+        Ollama reuses the work done on a prompt prefix it has just seen, so
+        in multi-turn chats append new turns to context rather than editing
+        earlier ones: each call then only pays for the newest messages.
+        
         Args:
             message: User message
             system: System prompt (overrides default)
             temperature: Override default temperature
             max_tokens: Override default max_tokens
             top_p: Override default top_p
-            context: Previous conversation context [{"role": "user/assistant", "content": "..."}]
+            context: Previous conversation context [{"role": "user/assistant", "content": "..."}];
+                defaults to the remembered history when max_history is set
+            keep_alive: Override default keep_alive
             
         Returns:
             LLMResponse with content and usage stats
         """
-        messages = []
+        history = self._conversation_history if context is None else None
+        messages = self._build_messages(message, system, context if history is None else self.history)
         
-        # Add system prompt
-        sys_prompt = system or self.system_prompt
-        if sys_prompt:
-            messages.append({"role": "system", "content": sys_prompt})
-        
-        # Add context if provided
-        if context:
-            messages.extend(context)
-        
-        # Add current message
-        messages.append({"role": "user", "content": message})
-        
-        return self._call_chat_api(
+        response = self._call_chat_api(
             messages=messages,
-            temperature=temperature or self.temperature,
-            max_tokens=max_tokens or self.max_tokens,
-            top_p=top_p or self.top_p,
+            options=self._resolve(temperature, max_tokens, top_p),
+            keep_alive=keep_alive or self.keep_alive,
         )
+        
+        if history is not None:
+            history.append((messages[-1], {"role": "assistant", "content": response.content}))
+        return response
     
     def generate(
         self,
@@ -214,9 +685,7 @@ class LLM:
         """
         return self._call_generate_api(
             prompt=prompt,
-            temperature=temperature or self.temperature,
-            max_tokens=max_tokens or self.max_tokens,
-            top_p=top_p or self.top_p,
+            options=self._resolve(temperature, max_tokens, top_p),
         )
     
     def stream(
@@ -238,157 +707,527 @@ class LLM:
         Yields:
             String chunks as they arrive
         """
-        messages = []
+        for data in self._stream_frames(message, system, temperature, max_tokens):
+            if "message" in data and "content" in data["message"]:
+                yield data["message"]["content"]
+    
+    def collect(
+        self,
+        message: str,
+        system: Optional[str] = None,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        on_chunk: Optional[Callable[[str], None]] = None,
+    ) -> LLMResponse:
+        """
+        Stream a chat response and return it whole.
         
-        sys_prompt = system or self.system_prompt
-        if sys_prompt:
-            messages.append({"role": "system", "content": sys_prompt})
+        Chunks are joined once at the end rather than concatenated as
+        they arrive, and the usage stats from the final frame are kept.
         
-        messages.append({"role": "user", "content": message})
+        Example:
+            response = llm.collect("Tell me a story", on_chunk=lambda c: print(c, end=""))
+        
+        Args:
+            message: User message
+            system: System prompt
+            temperature: Override default temperature
+            max_tokens: Override default max_tokens
+            on_chunk: Called with each chunk as it arrives (e.g. to display it)
+            
+        Returns:
+            LLMResponse with content and usage stats
+        """
+        parts = []
+        data = {}
+        
+        for data in self._stream_frames(message, system, temperature, max_tokens):
+            content = data.get("message", {}).get("content")
+            if content:
+                parts.append(content)
+                if on_chunk is not None:
+                    on_chunk(content)
+        
+        # The last frame (done=true) carries the token counts and duration
+        return self._to_response(data, "".join(parts))
+    
+    def _stream_frames(
+        self,
+        message: str,
+        system: Optional[str],
+        temperature: Optional[float],
+        max_tokens: Optional[int],
+    ) -> Generator[Dict[str, Any], None, None]:
+        """Internal: Stream a chat request, yielding each decoded frame."""
+        messages = self._build_messages(message, system)
         
-        url = f"{self.base_url}/api/chat"
         payload = {
             "model": self.model,
             "messages": messages,
             "stream": True,
-            "options": {
-                "num_predict": max_tokens or self.max_tokens,
-                "temperature": temperature or self.temperature,
-            }
+            "keep_alive": self.keep_alive,
+            "options": self._resolve(temperature, max_tokens),
         }
         
         try:
-            with requests.post(url, json=payload, stream=True, timeout=self.timeout) as response:
-                response.raise_for_status()
-                for line in response.iter_lines():
-                    if line:
-                        data = json.loads(line)
-                        if "message" in data and "content" in data["message"]:
-                            yield data["message"]["content"]
-        except requests.exceptions.ConnectionError:
-            raise ConnectionError(f"Cannot connect to Ollama at {self.base_url}. Is Ollama running?")
-        except requests.exceptions.Timeout:
-            raise TimeoutError(f"Request timed out after {self.timeout}s")
+            with self._session.post(self._chat_url, data=orjson.dumps(payload), stream=True, timeout=self.timeout) as response:
+                if response.status_code >= 400:
+                    raise self._api_error(response.status_code, response.text)
+                # Per-chunk lookups bound to locals once, outside the loop
+                buf = bytearray()
+                extend = buf.extend
+                pop_frames = _pop_frames
+                loads = orjson.loads
+                for chunk in response.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+                    extend(chunk)
+                    for frame in pop_frames(buf):
+                        if frame:
+                            yield loads(frame)
+        except requests.exceptions.RequestException as e:
+            raise self._transport_error(e) from e
+    
+    def _build_messages(
+        self,
+        message: str,
+        system: Optional[str] = None,
+        context: Optional[Sequence[Dict[str, str]]] = None,
+    ) -> List[Dict[str, str]]:
+        """Internal: Build the chat messages for a user message."""
+        messages = []
+        
+        # Add system prompt (surrounding whitespace dropped, so the prefix stays stable)
+        sys_msg = {"role": "system", "content": system.strip()} if system else self._system_msg
+        if sys_msg:
+            messages.append(sys_msg)
+        
+        # Add context if provided
+        if context:
+            messages.extend(context)
+        
+        # Add current message
+        messages.append({"role": "user", "content": message})
+        
+        return messages
+    
+    def _resolve(
+        self,
+        temperature: Optional[float],
+        max_tokens: Optional[int] = None,
+        top_p: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """
+        Internal: Ollama options for a call, filling unset values from the defaults.
+        
+        Only None means unset, so temperature=0.0 is sent as given.
+        """
+        return {
+            "num_predict": max_tokens if max_tokens is not None else self.max_tokens,
+            "temperature": temperature if temperature is not None else self.temperature,
+            "top_p": top_p if top_p is not None else self.top_p,
+        }
+    
+    def _to_response(self, data: Dict[str, Any], content: str) -> LLMResponse:
+        """Internal: Build an LLMResponse from a decoded Ollama response."""
+        usage = Usage(
+            prompt_tokens=data.get("prompt_eval_count", 0),
+            completion_tokens=data.get("eval_count", 0),
+            total_tokens=data.get("prompt_eval_count", 0) + data.get("eval_count", 0),
+        )
+        
+        return LLMResponse(
+            content=content,
+            model=self.model,
+            usage=usage,
+            done=data.get("done", True),
+            total_duration=data.get("total_duration", 0) / 1e9,
+        )
+    
+    def _api_error(self, status_code: int, text: str) -> LLMError:
+        """Internal: Exception for an error status from Ollama."""
+        cls, message = _STATUS_ERRORS.get(status_code, _DEFAULT_STATUS_ERROR)
+        return cls(message.format(model=self.model, status=status_code, text=text))
+    
+    def _transport_error(self, e: Exception) -> LLMError:
+        """Internal: Exception for a request that got no response from Ollama."""
+        if isinstance(e, _CONNECT_ERRORS):
+            return ConnectionError(f"Cannot connect to Ollama at {self.base_url}. Is Ollama running?")
+        if isinstance(e, _TIMEOUT_ERRORS):
+            return TimeoutError(f"Request timed out after {self.timeout}s")
+        return LLMError(f"Request to Ollama failed: {e}")
     
     def _call_chat_api(
         self,
         messages: List[Dict[str, str]],
-        temperature: float,
-        max_tokens: int,
-        top_p: float,
+        options: Dict[str, Any],
+        keep_alive: Optional[str],
     ) -> LLMResponse:
         """Internal: Call Ollama chat API."""
-        url = f"{self.base_url}/api/chat"
-        
         payload = {
             "model": self.model,
             "messages": messages,
             "stream": False,
-            "options": {
-                "num_predict": max_tokens,
-                "temperature": temperature,
-                "top_p": top_p,
-            }
+            "keep_alive": keep_alive,
+            "options": options,
         }
         
-        try:
-            response = requests.post(url, json=payload, timeout=self.timeout)
-            response.raise_for_status()
-            data = response.json()
-            
-            content = data.get("message", {}).get("content", "")
-            
-            usage = Usage(
-                prompt_tokens=data.get("prompt_eval_count", 0),
-                completion_tokens=data.get("eval_count", 0),
-                total_tokens=data.get("prompt_eval_count", 0) + data.get("eval_count", 0),
-            )
-            
-            return LLMResponse(
-                content=content,
-                model=self.model,
-                usage=usage,
-                done=data.get("done", True),
-                total_duration=data.get("total_duration", 0) / 1e9,
-            )
-            
-        except requests.exceptions.ConnectionError:
-            raise ConnectionError(f"Cannot connect to Ollama at {self.base_url}. Is Ollama running?")
-        except requests.exceptions.Timeout:
-            raise TimeoutError(f"Request timed out after {self.timeout}s")
-        except requests.exceptions.HTTPError as e:
-            if e.response.status_code == 404:
-                raise ModelNotFoundError(f"Model '{self.model}' not found. Run: ollama pull {self.model}")
-            raise LLMError(f"API error: {e.response.status_code} - {e.response.text}")
+        data = self._post(self._chat_url, payload)
+        return self._to_response(data, data.get("message", {}).get("content", ""))
     
     def _call_generate_api(
         self,
         prompt: str,
-        temperature: float,
-        max_tokens: int,
-        top_p: float,
+        options: Dict[str, Any],
     ) -> LLMResponse:
         """Internal: Call Ollama generate API."""
-        url = f"{self.base_url}/api/generate"
-        
         payload = {
             "model": self.model,
             "prompt": prompt,
             "stream": False,
-            "options": {
-                "num_predict": max_tokens,
-                "temperature": temperature,
-                "top_p": top_p,
-            }
+            "keep_alive": self.keep_alive,
+            "options": options,
         }
         
+        data = self._post(self._gen_url, payload)
+        return self._to_response(data, data.get("response", ""))
+    
+    def _cache_lookup(self, url: str, payload: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], Tuple]:
+        """
+        Internal: Look a request up in the exact-match, then the semantic cache.
+        
+        Returns:
+            Tuple of (cached response or None, handle for _cache_store)
+        """
+        key = None
+        if self.cache is not None and payload["options"]["temperature"] <= self.cache.max_temperature:
+            key = self.cache.key(url, payload)
+            data = self.cache.get(key)
+            if data is not None:
+                return data, (None, None)
+        
+        semantic = None
+        if self.semantic_cache is not None and url == self._chat_url:
+            data, semantic = self.semantic_cache.match(payload)
+            if data is not None:
+                return data, (None, None)
+        
+        return None, (key, semantic)
+    
+    def _cache_store(self, handle: Tuple, data: Dict[str, Any]):
+        """Internal: Store a response in the caches that missed it."""
+        key, semantic = handle
+        if key is not None:
+            self.cache.set(key, data)
+        if semantic is not None:
+            self.semantic_cache.add(semantic, data)
+    
+    def _post(self, url: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Internal: POST a non-streaming request and decode the response."""
+        data, handle = self._cache_lookup(url, payload)
+        if data is not None:
+            return data
+        
         try:
-            response = requests.post(url, json=payload, timeout=self.timeout)
-            response.raise_for_status()
-            data = response.json()
-            
-            content = data.get("response", "")
-            
-            usage = Usage(
-                prompt_tokens=data.get("prompt_eval_count", 0),
-                completion_tokens=data.get("eval_count", 0),
-                total_tokens=data.get("prompt_eval_count", 0) + data.get("eval_count", 0),
-            )
-            
-            return LLMResponse(
-                content=content,
-                model=self.model,
-                usage=usage,
-                done=data.get("done", True),
-                total_duration=data.get("total_duration", 0) / 1e9,
-            )
-            
-        except requests.exceptions.ConnectionError:
-            raise ConnectionError(f"Cannot connect to Ollama at {self.base_url}. Is Ollama running?")
-        except requests.exceptions.Timeout:
-            raise TimeoutError(f"Request timed out after {self.timeout}s")
-        except requests.exceptions.HTTPError as e:
-            if e.response.status_code == 404:
-                raise ModelNotFoundError(f"Model '{self.model}' not found. Run: ollama pull {self.model}")
-            raise LLMError(f"API error: {e.response.status_code} - {e.response.text}")
+            response = self._session.post(url, data=orjson.dumps(payload), timeout=self.timeout)
+        except requests.exceptions.RequestException as e:
+            raise self._transport_error(e) from e
+        
+        if response.status_code >= 400:
+            raise self._api_error(response.status_code, response.text)
+        data = _decode_response(response.content)
+        
+        self._cache_store(handle, data)
+        return data
     
     def list_models(self) -> List[str]:
         """List available models on the Ollama server."""
         try:
-            response = requests.get(f"{self.base_url}/api/tags", timeout=10)
+            response = self._session.get(self._tags_url, timeout=10)
             response.raise_for_status()
-            models = response.json().get("models", [])
+            models = orjson.loads(response.content).get("models", [])
             return [m.get("name") for m in models]
         except Exception as e:
             raise LLMError(f"Failed to list models: {e}")
     
     def is_available(self) -> bool:
-        """Check if Ollama server is available."""
+        """
+        Check if Ollama server is available.
+        
+        A bare TCP connect is tried first, so a stopped server is reported
+        at once rather than after the session's connection retries; the
+        API is only asked (over the pooled connection) if the port answers.
+        """
         try:
-            response = requests.get(f"{self.base_url}/api/tags", timeout=5)
+            with socket.create_connection(self._address, timeout=1):
+                pass
+        except OSError:
+            return False
+        
+        try:
+            response = self._session.get(self._tags_url, timeout=5)
             return response.status_code == 200
-        except:
+        except requests.exceptions.RequestException:
             return False
+    
+    # ------------------------------------------------------------------------
+    # Async API - same calls for asyncio code, so many requests can be in
+    # flight at once over one connection pool. Needs httpx (pip install httpx).
+    # ------------------------------------------------------------------------
+    
+    def _get_async_client(self) -> "httpx.AsyncClient":
+        """Internal: Create the shared async client on first use."""
+        if self._aclient is None:
+            if httpx is None:
+                raise LLMError("The async methods need httpx: pip install httpx")
+            
+            # HTTP/2 needs the optional h2 package (pip install httpx[http2])
+            has_h2 = importlib.util.find_spec("h2") is not None
+            if self.http2 and not has_h2:
+                raise LLMError("http2=True needs the h2 package: pip install httpx[http2]")
+            
+            self._aclient = httpx.AsyncClient(
+                headers={"Content-Type": "application/json"},
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=ASYNC_MAX_CONNECTIONS, max_keepalive_connections=ASYNC_MAX_CONNECTIONS // 2),
+                http2=has_h2 if self.http2 is None else self.http2,
+            )
+        return self._aclient
+    
+    async def aclose(self):
+        """Close the async connection pool (call before the event loop ends)."""
+        if self._aclient is not None:
+            await self._aclient.aclose()
+            self._aclient = None
+    
+    async def achat(
+        self,
+        message: str,
+        system: Optional[str] = None,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        top_p: Optional[float] = None,
+        context: Optional[List[Dict[str, str]]] = None,
+        keep_alive: Optional[str] = None,
+    ) -> LLMResponse:
+        """
+        Async version of chat().
+        
+        Example:
+            responses = await asyncio.gather(*[llm.achat(q) for q in questions])
+        """
+        history = self._conversation_history if context is None else None
+        messages = self._build_messages(message, system, context if history is None else self.history)
+        
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            "stream": False,
+            "keep_alive": keep_alive or self.keep_alive,
+            "options": self._resolve(temperature, max_tokens, top_p),
+        }
+        
+        data = await self._apost(self._chat_url, payload)
+        response = self._to_response(data, data.get("message", {}).get("content", ""))
+        
+        if history is not None:
+            history.append((messages[-1], {"role": "assistant", "content": response.content}))
+        return response
+    
+    async def agenerate(
+        self,
+        prompt: str,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        top_p: Optional[float] = None,
+    ) -> LLMResponse:
+        """Async version of generate()."""
+        payload = {
+            "model": self.model,
+            "prompt": prompt,
+            "stream": False,
+            "keep_alive": self.keep_alive,
+            "options": self._resolve(temperature, max_tokens, top_p),
+        }
+        
+        data = await self._apost(self._gen_url, payload)
+        return self._to_response(data, data.get("response", ""))
+    
+    async def astream(
+        self,
+        message: str,
+        system: Optional[str] = None,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+    ) -> AsyncGenerator[str, None]:
+        """
+        Async version of stream().
+        
+        Example:
+            async for chunk in llm.astream("Tell me a story"):
+                print(chunk, end="", flush=True)
+        """
+        payload = {
+            "model": self.model,
+            "messages": self._build_messages(message, system),
+            "stream": True,
+            "keep_alive": self.keep_alive,
+            "options": self._resolve(temperature, max_tokens),
+        }
+        
+        client = self._get_async_client()
+        
+        try:
+            async with client.stream("POST", self._chat_url, content=orjson.dumps(payload)) as response:
+                if response.status_code >= 400:
+                    await response.aread()
+                    raise self._api_error(response.status_code, response.text)
+                # Per-chunk lookups bound to locals once, outside the loop
+                buf = bytearray()
+                extend = buf.extend
+                pop_frames = _pop_frames
+                loads = orjson.loads
+                async for chunk in response.aiter_bytes():
+                    extend(chunk)
+                    for frame in pop_frames(buf):
+                        if frame:
+                            data = loads(frame)
+                            if "message" in data and "content" in data["message"]:
+                                yield data["message"]["content"]
+        except httpx.TransportError as e:
+            raise self._transport_error(e) from e
+    
+    async def _apost(self, url: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Internal: POST a non-streaming request and decode the response."""
+        data, handle = self._cache_lookup(url, payload)
+        if data is not None:
+            return data
+        
+        client = self._get_async_client()
+        
+        try:
+            response = await client.post(url, content=orjson.dumps(payload))
+        except httpx.TransportError as e:
+            raise self._transport_error(e) from e
+        
+        if response.status_code >= 400:
+            raise self._api_error(response.status_code, response.text)
+        data = _decode_response(response.content)
+        
+        self._cache_store(handle, data)
+        return data
+
+
+# ============================================================================
+# BATCHING CLIENT - Coalesce calls from many threads
+# ============================================================================
+
+class BatchingLLM:
+    """
+    Send chat calls from many threads to Ollama in batches.
+    
+    Calls arriving within max_wait of the first (up to max_batch of them)
+    are sent together over the client's async connection pool, so an
+    Ollama server running with OLLAMA_NUM_PARALLEL decodes them in one
+    batch instead of one by one as they trickle in. Meant for thread-pool
+    servers where every request thread makes one blocking call.
+    
+    Example:
+        batcher = BatchingLLM(LLM(system_prompt="You are helpful"))
+        response = batcher.chat("Hello!")  # from any number of threads
+        batcher.close()
+    
+    Args:
+        llm: Client whose async methods send the batches; they run on the
+            batcher's own event loop from then on
+        max_batch: Most calls sent together
+        max_wait: Seconds to wait for more calls after the first
+    """
+    
+    def __init__(self, llm: Optional[LLM] = None, max_batch: int = 16, max_wait: float = 0.02):
+        self.llm = llm if llm is not None else LLM()
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._sending = set()
+        
+        # The batcher's loop is private, so it can use uvloop without touching
+        # the event loop policy of the application importing this module
+        self._loop = uvloop.new_event_loop() if uvloop is not None else asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, name="llm-batcher", daemon=True).start()
+        self._queue = asyncio.run_coroutine_threadsafe(self._start(), self._loop).result()
+    
+    async def _start(self) -> "asyncio.Queue":
+        queue = asyncio.Queue()
+        self._consumer = asyncio.get_running_loop().create_task(self._run(queue))
+        return queue
+    
+    def chat(self, message: str, **kwargs) -> LLMResponse:
+        """Blocking chat(); takes the same arguments as LLM.chat()."""
+        return self._submit(message, kwargs).result()
+    
+    async def achat(self, message: str, **kwargs) -> LLMResponse:
+        """chat() for asyncio code running on any event loop."""
+        return await asyncio.wrap_future(self._submit(message, kwargs))
+    
+    def _submit(self, message: str, kwargs: Dict[str, Any]) -> concurrent.futures.Future:
+        future = concurrent.futures.Future()
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, (message, kwargs, future))
+        return future
+    
+    async def _run(self, queue: "asyncio.Queue"):
+        """Collect calls into batches and send each without waiting for the last."""
+        loop = asyncio.get_running_loop()
+        
+        while True:
+            batch = [await queue.get()]
+            deadline = loop.time() + self.max_wait
+            
+            while len(batch) < self.max_batch:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            
+            task = loop.create_task(self._send(batch))
+            self._sending.add(task)
+            task.add_done_callback(self._sending.discard)
+    
+    async def _send(self, batch: List[Tuple[str, Dict[str, Any], concurrent.futures.Future]]):
+        # Drop calls cancelled while queued (an achat() caller that was
+        # cancelled cancels its future); the rest can no longer be cancelled
+        batch = [call for call in batch if call[2].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        
+        results = await asyncio.gather(
+            *[self.llm.achat(message, **kwargs) for message, kwargs, _ in batch],
+            return_exceptions=True
+        )
+        for (_, _, future), result in zip(batch, results):
+            # One caller's future must never keep the rest of the batch waiting
+            try:
+                if isinstance(result, BaseException):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+            except concurrent.futures.InvalidStateError:
+                pass
+    
+    def close(self):
+        """Stop the batcher's event loop and close its connections."""
+        asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+    
+    async def _shutdown(self):
+        self._consumer.cancel()
+        await self.llm.aclose()
+    
+    def __enter__(self) -> "BatchingLLM":
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
 
 
 # ============================================================================
@@ -397,14 +1236,46 @@ class LLM:
 
 # Default client instance (lazy loaded)
 _default_client: Optional[LLM] = None
+_default_lock = threading.Lock()
 
 
 def _get_default_client() -> LLM:
-    """Get or create default client."""
+    """
+    Get or create default client.
+    
+    Threads calling chat()/generate() at the same time all get the same
+    client, and so share one connection pool.
+    """
     global _default_client
-    if _default_client is None:
-        _default_client = LLM()
-    return _default_client
+    client = _default_client
+    if client is None:
+        with _default_lock:
+            if _default_client is None:
+                _default_client = LLM()
+            client = _default_client
+    return client
+
+
+@functools.lru_cache(maxsize=32)
+def _get_model_client(model: str, temperature: float = DEFAULT_TEMPERATURE, max_tokens: int = DEFAULT_MAX_TOKENS) -> LLM:
+    """
+    Get or create a client for a non-default model.
+    
+    Kept between calls so repeated chat(..., model=...) calls reuse one
+    connection pool instead of building a new client every time.
+    """
+    return LLM(model=model, temperature=temperature, max_tokens=max_tokens)
+
+
+def _warm_default_client():
+    """Create the default client and open its first connection to Ollama."""
+    _get_default_client().is_available()
+
+
+# LLM_EAGER_INIT=1: prepare the default client in the background at import,
+# so a short script's first chat() does not also pay for connection setup
+if os.getenv("LLM_EAGER_INIT", "").lower() in ("1", "true", "yes"):
+    threading.Thread(target=_warm_default_client, name="llm-warmup", daemon=True).start()
 
 
 def chat(
@@ -422,7 +1293,7 @@ def chat(
         response = chat("Explain this code", system="You are a code reviewer")
     """
     if model:
-        client = LLM(model=model, temperature=temperature, max_tokens=max_tokens)
+        client = _get_model_client(model, temperature, max_tokens)
     else:
         client = _get_default_client()
     
@@ -443,7 +1314,7 @@ def generate(
         response = generate("Complete this: The quick brown fox")
     """
     if model:
-        client = LLM(model=model, temperature=temperature, max_tokens=max_tokens)
+        client = _get_model_client(model, temperature, max_tokens)
     else:
         client = _get_default_client()
     
@@ -464,7 +1335,7 @@ def stream_chat(
             print(chunk, end="", flush=True)
     """
     if model:
-        client = LLM(model=model)
+        client = _get_model_client(model)
     else:
         client = _get_default_client()
     
@@ -8,6 +8,8 @@ Copy this file to your other projects and modify as needed.
 # SETUP: Copy llm_client.py to your project, or add this to your path
 # ============================================================================
 
+import asyncio
+
 from llm_client import LLM, chat, generate, stream_chat, create_coder, create_assistant
 
 
@@ -214,7 +216,30 @@ def example_custom_prompts():
 
 
 # ============================================================================
-# EXAMPLE 9: Integration Pattern for Your Projects
+# EXAMPLE 9: Concurrent Calls with asyncio
+# ============================================================================
+
+async def example_async():
+    """Run several prompts at once (needs httpx)."""
+    
+    llm = LLM()
+    
+    questions = [
+        "What is a list comprehension?",
+        "What is a decorator?",
+        "What is a generator?",
+    ]
+    
+    # All requests are in flight together over one connection pool
+    responses = await asyncio.gather(*[llm.achat(q) for q in questions])
+    for question, response in zip(questions, responses):
+        print(f"{question}\n{response.content}\n")
+    
+    await llm.aclose()
+
+
+# ============================================================================
+# EXAMPLE 10: Integration Pattern for Your Projects
 # ============================================================================
 
 # This is how you'd typically integrate in a real project:
@@ -0,0 +1,72 @@
+"""
+Shared pytest fixtures.
+"""
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+
+try:
+    import fakeredis
+except ImportError:  # fakeredis is optional; without it every test uses the real Redis
+    fakeredis = None
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--no-cache-id",
+        action="store_true",
+        help="Queue fresh tasks instead of reusing task_ids cached by an earlier run"
+    )
+
+
+@pytest.fixture(scope="session")
+def client():
+    """
+    Test client that runs the app's lifespan once for the whole session.
+    
+    Starlette's TestClient is an httpx.Client whose transport calls the
+    ASGI app in-process, so requests never open a socket.
+    """
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture(scope="session")
+def run_async(client):
+    """
+    Run an async function on the app's event loop and return its result.
+    
+    The app's Redis pool belongs to the loop its lifespan started on, so
+    async test code runs there rather than on a loop of its own.
+    """
+    return client.portal.call
+
+
+@pytest.fixture(scope="session")
+def async_client(run_async):
+    """httpx.AsyncClient calling the app in-process, for concurrent requests."""
+    async def _open():
+        return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://testserver")
+    
+    test_client = run_async(_open)
+    yield test_client
+    run_async(test_client.aclose)
+
+
+@pytest.fixture(autouse=True)
+def fake_redis(request, monkeypatch):
+    """
+    Swap the API's Redis client for an in-memory one in tests not marked integration.
+    
+    Those tests only hit auth, validation and /health, so they run without
+    a Redis server; integration tests keep the real client, which shares
+    state with the Celery broker and result backend.
+    """
+    if fakeredis is None or request.node.get_closest_marker("integration"):
+        yield None
+        return
+    
+    fake = fakeredis.aioredis.FakeRedis()
+    monkeypatch.setattr("app.main.redis_client", fake)
+    yield fake
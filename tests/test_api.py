@@ -1,58 +1,166 @@
 """
 Tests for API endpoints.
 """
-import pytest
-from fastapi.testclient import TestClient
-from app.main import app
+import math
+import time
+import uuid
+import asyncio
+from types import MappingProxyType
 
-client = TestClient(app)
+import orjson
+import pytest
+from celery import states
+from app.celery_app import celery_app
+from app.config import settings
+from app.models import ResultResponse
 
 # Test API key
 TEST_API_KEY = "dev-key-12345"
 
+# Shared by every authenticated request; read-only so no test can alter it for the others
+AUTH_HEADERS = MappingProxyType({"X-API-Key": TEST_API_KEY})
 
-def test_root():
-    """Test root endpoint."""
-    response = client.get("/")
-    assert response.status_code == 200
-    data = response.json()
-    assert "message" in data
-    assert "version" in data
+# Minimal valid /generate body (json.dumps cannot encode a MappingProxyType)
+DEFAULT_PAYLOAD = {"prompt": "Test prompt"}
 
+# DEFAULT_PAYLOAD encoded once, for tests that send it many times
+DEFAULT_PAYLOAD_BYTES = orjson.dumps(DEFAULT_PAYLOAD)
+JSON_HEADERS = MappingProxyType({"Content-Type": "application/json"})
 
-def test_health():
-    """Test health check endpoint."""
-    response = client.get("/health")
-    assert response.status_code == 200
-    data = response.json()
-    assert "status" in data
-    assert "redis_connected" in data
 
+# Tests that take a queued task of their own (see submitted_task_id)
+TASK_CONSUMERS = ("test_status_endpoint", "test_result_endpoint")
+
+# pytest cache entry: {"submitted_at": epoch seconds, "task_ids": {test: task_id}}
+TASK_CACHE_KEY = "llm/task_ids"
+
+# RateLimitMiddleware settings in app/main.py
+RATE_LIMIT_PER_MINUTE = 60
+RATE_LIMIT_BURST = 10
+
+
+@pytest.fixture
+def own_key_headers(monkeypatch):
+    """
+    Auth headers for a throwaway API key, valid for one test only.
+    
+    Each key has its own rate-limit bucket, so a test using this does not
+    spend TEST_API_KEY's burst, which the other tests share.
+    """
+    api_key = f"test-{uuid.uuid4()}"
+    monkeypatch.setitem(settings.__dict__, "api_keys_bytes", settings.api_keys_bytes | {api_key.encode()})
+    return MappingProxyType({"X-API-Key": api_key})
+
+
+def poll_while_storing(async_client, run_async, url, params, task_id, headers=AUTH_HEADERS):
+    """
+    Start a long poll, then store a completed result for task_id while it waits.
+    
+    Args:
+        async_client: In-process AsyncClient on the app's loop
+        run_async: Runs a coroutine function on that loop
+        url: Long-polling endpoint to request
+        params: Query parameters, including wait
+        task_id: Task whose result is stored (and forgotten afterwards)
+        headers: Auth headers for the poll
+        
+    Returns:
+        Tuple of (response, seconds from starting the poll to its response)
+    """
+    payload = {"status": "completed", "task_id": task_id, "result": "Generated text", "metrics": None}
+    
+    async def poll_and_store():
+        poll = asyncio.ensure_future(async_client.get(url, params=params, headers=headers))
+        await asyncio.sleep(0.2)  # Let the request start waiting first
+        await asyncio.to_thread(celery_app.backend.store_result, task_id, payload, states.SUCCESS)
+        return await poll
+    
+    start_time = time.monotonic()
+    try:
+        response = run_async(poll_and_store)
+    finally:
+        celery_app.backend.forget(task_id)
+    return response, time.monotonic() - start_time
 
-def test_generate_without_api_key():
-    """Test that generate endpoint requires API key."""
+
+@pytest.fixture(scope="module")
+def submitted_task_ids(client, pytestconfig):
+    """
+    Queue one task per test in TASK_CONSUMERS with a single batch call.
+    
+    The task_ids are kept in pytest's cache and reused by later runs for as
+    long as their results may still be in the backend (result_expires), so
+    re-running the suite does not queue new generations for the workers.
+    Pass --no-cache-id to always queue fresh tasks.
+    """
+    cache = getattr(pytestconfig, "cache", None)  # None with -p no:cacheprovider
+    
+    if cache is not None and not pytestconfig.getoption("no_cache_id"):
+        cached = cache.get(TASK_CACHE_KEY, None)
+        if (
+            cached
+            and set(cached["task_ids"]) == set(TASK_CONSUMERS)
+            and time.time() - cached["submitted_at"] < celery_app.conf.result_expires
+        ):
+            return cached["task_ids"]
+    
     response = client.post(
-        "/generate",
-        json={"prompt": "Test prompt"}
+        "/generate/batch",
+        headers=AUTH_HEADERS,
+        json={"requests": [DEFAULT_PAYLOAD] * len(TASK_CONSUMERS)}
     )
-    assert response.status_code == 403  # Forbidden without API key
+    assert response.status_code == 202
+    task_ids = dict(zip(TASK_CONSUMERS, response.json()["task_ids"]))
+    
+    if cache is not None:
+        cache.set(TASK_CACHE_KEY, {"submitted_at": time.time(), "task_ids": task_ids})
+    return task_ids
+
+
+@pytest.fixture
+def submitted_task_id(request, submitted_task_ids):
+    """task_id queued for the requesting test."""
+    return submitted_task_ids[request.node.originalname]
 
 
-def test_generate_with_invalid_api_key():
-    """Test that invalid API key is rejected."""
+def test_root_and_health(async_client, run_async):
+    """Test root and health check endpoints (requested concurrently)."""
+    async def fetch_both():
+        return await asyncio.gather(async_client.get("/"), async_client.get("/health"))
+    
+    root_response, health_response = run_async(fetch_both)
+    
+    assert root_response.status_code == 200
+    data = root_response.json()
+    assert "message" in data
+    assert "version" in data
+    
+    assert health_response.status_code == 200
+    data = health_response.json()
+    assert "status" in data
+    assert "redis_connected" in data
+
+
+@pytest.mark.parametrize("headers,expected_status", [
+    ({}, 403),  # Forbidden without API key
+    ({"X-API-Key": "invalid-key"}, 401),  # Unauthorized
+], ids=["missing-key", "invalid-key"])
+def test_generate_auth(client, headers, expected_status):
+    """Test that generate endpoint rejects missing and invalid API keys."""
     response = client.post(
         "/generate",
-        headers={"X-API-Key": "invalid-key"},
-        json={"prompt": "Test prompt"}
+        headers={**headers, **JSON_HEADERS},
+        content=DEFAULT_PAYLOAD_BYTES
     )
-    assert response.status_code == 401  # Unauthorized
+    assert response.status_code == expected_status
 
 
-def test_generate_with_valid_api_key():
+@pytest.mark.integration
+def test_generate_with_valid_api_key(client):
     """Test successful task submission."""
     response = client.post(
         "/generate",
-        headers={"X-API-Key": TEST_API_KEY},
+        headers=AUTH_HEADERS,
         json={
             "prompt": "Test prompt",
             "max_tokens": 50
@@ -64,11 +172,38 @@ def test_generate_with_valid_api_key():
     assert "task_id" in data
 
 
-def test_generate_with_invalid_prompt():
+@pytest.mark.integration
+def test_generate_concurrent(async_client, run_async, own_key_headers):
+    """Test many concurrent submissions through auth, rate limiting and enqueueing."""
+    # A key of its own, so this burst does not use up TEST_API_KEY's rate limit
+    headers = {**own_key_headers, **JSON_HEADERS}
+    
+    async def submit_all(count, concurrency):
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def submit():
+            async with semaphore:
+                return await async_client.post("/generate", headers=headers, content=DEFAULT_PAYLOAD_BYTES)
+        
+        return await asyncio.gather(*(submit() for _ in range(count)))
+    
+    started = time.perf_counter()
+    responses = run_async(submit_all, 200, 50)
+    elapsed = time.perf_counter() - started
+    
+    accepted = [r for r in responses if r.status_code == 202]
+    assert all(r.status_code in (202, 429) for r in responses)
+    # One burst of tokens, plus whatever the bucket refilled while the test ran
+    refilled = math.ceil(elapsed * RATE_LIMIT_PER_MINUTE / 60)
+    assert RATE_LIMIT_BURST <= len(accepted) <= RATE_LIMIT_BURST + refilled
+    assert len({r.json()["task_id"] for r in accepted}) == len(accepted)
+
+
+def test_generate_with_invalid_prompt(client):
     """Test that empty prompt is rejected."""
     response = client.post(
         "/generate",
-        headers={"X-API-Key": TEST_API_KEY},
+        headers=AUTH_HEADERS,
         json={
             "prompt": "",  # Empty prompt
             "max_tokens": 50
@@ -77,40 +212,107 @@ def test_generate_with_invalid_prompt():
     assert response.status_code == 422  # Validation error
 
 
-def test_status_endpoint():
+@pytest.mark.integration
+def test_status_endpoint(client, submitted_task_id):
     """Test status endpoint."""
-    # First submit a task
-    response = client.post(
-        "/generate",
-        headers={"X-API-Key": TEST_API_KEY},
-        json={"prompt": "Test prompt"}
-    )
-    task_id = response.json()["task_id"]
-    
-    # Check status
     response = client.get(
-        f"/status/{task_id}",
-        headers={"X-API-Key": TEST_API_KEY}
+        f"/status/{submitted_task_id}",
+        headers=AUTH_HEADERS
     )
     assert response.status_code == 200
     data = response.json()
     assert "status" in data
-    assert data["task_id"] == task_id
+    assert data["task_id"] == submitted_task_id
 
 
-def test_result_endpoint():
+@pytest.mark.integration
+def test_result_endpoint(client, submitted_task_id):
     """Test result endpoint."""
-    # First submit a task
-    response = client.post(
-        "/generate",
-        headers={"X-API-Key": TEST_API_KEY},
-        json={"prompt": "Test prompt"}
-    )
-    task_id = response.json()["task_id"]
-    
     # Try to get result (may be pending)
     response = client.get(
-        f"/result/{task_id}",
-        headers={"X-API-Key": TEST_API_KEY}
+        f"/result/{submitted_task_id}",
+        headers=AUTH_HEADERS
     )
     assert response.status_code in [200, 202]  # OK or Accepted (if still processing)
+
+
+@pytest.mark.integration
+def test_result_long_poll(async_client, run_async):
+    """Test that /result with wait answers as soon as the task's result is stored."""
+    task_id = f"long-poll-{uuid.uuid4()}"
+    response, elapsed = poll_while_storing(async_client, run_async, f"/result/{task_id}", {"wait": 10}, task_id)
+    
+    assert response.status_code == 200
+    assert response.json()["result"] == "Generated text"
+    assert elapsed < 5  # Woken by the result, not the wait timeout
+
+
+@pytest.mark.integration
+def test_status_batch_long_poll(async_client, run_async, own_key_headers):
+    """Test that /status/batch reports every task in order and wakes when one finishes."""
+    task_ids = [f"status-batch-{uuid.uuid4()}" for _ in range(10)]
+    finished_id = task_ids[3]
+    response, elapsed = poll_while_storing(
+        async_client, run_async, "/status/batch", {"ids": ",".join(task_ids), "wait": 10}, finished_id,
+        headers=own_key_headers
+    )
+    
+    assert response.status_code == 200
+    statuses = response.json()["statuses"]
+    assert [s["task_id"] for s in statuses] == task_ids
+    assert [s["status"] for s in statuses] == ["queued"] * 3 + ["completed"] + ["queued"] * 6
+    assert elapsed < 5  # Woken by the result, not the wait timeout
+
+
+@pytest.mark.parametrize("ids", [" , ", ",".join(f"task-{i}" for i in range(101))], ids=["empty", "over-100"])
+def test_status_batch_rejects_id_count(client, ids, own_key_headers):
+    """Test that /status/batch needs between 1 and 100 task IDs."""
+    response = client.get("/status/batch", params={"ids": ids}, headers=own_key_headers)
+    assert response.status_code == 422
+
+
+@pytest.mark.integration
+def test_generate_batch_with_valid_api_key(client):
+    """Test batch submission returns one task_id per request."""
+    response = client.post(
+        "/generate/batch",
+        headers=AUTH_HEADERS,
+        json={"requests": [{"prompt": "First prompt"}, {"prompt": "Second prompt"}]}
+    )
+    assert response.status_code == 202  # Accepted
+    data = response.json()
+    assert data["status"] == "queued"
+    assert "group_id" in data
+    assert len(data["task_ids"]) == 2
+
+
+def test_generate_batch_with_empty_batch(client):
+    """Test that an empty batch is rejected."""
+    response = client.post(
+        "/generate/batch",
+        headers=AUTH_HEADERS,
+        json={"requests": []}
+    )
+    assert response.status_code == 422  # Validation error
+
+
+def test_result_payload_roundtrip():
+    """Test a task result survives the result serializer and validates as ResultResponse."""
+    payload = {
+        "status": "completed",
+        "task_id": "abc-123",
+        "result": "Generated text",
+        "metrics": {
+            "queue_wait_time": 0.5,
+            "processing_time": 1.25,
+            "total_time": 1.75,
+            "prompt_tokens": 4,
+            "completion_tokens": 32,
+            "tokens_per_second": 25.6
+        }
+    }
+    assert celery_app.conf.result_serializer == "msgpack"
+    
+    decoded = celery_app.backend.decode(celery_app.backend.encode(payload))
+    assert decoded == payload
+    assert ResultResponse(**decoded).metrics.completion_tokens == 32